@@ -1,6 +1,17 @@
 import pandas as pd
 import numpy as np
 import os
+import re
+import sys
+import json
+import hashlib
+
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pa_csv
+except ImportError:
+    pa = None  # bez pyarrow: kawałki przez pd.read_csv(chunksize=...) i parsowanie przez .str
 
 # --- KONFIGURACJA ŚCIEŻEK ---
 # Ustalanie ścieżek względem lokalizacji tego skryptu
@@ -11,87 +22,180 @@ DATA_DIR = os.path.join(PROJECT_ROOT,'Hacknation', 'my-react-app', 'public', 'da
 PATH_FINANCE = os.path.join(DATA_DIR, 'wsk_fin.csv')
 PATH_BANKRUPTCY = os.path.join(DATA_DIR, 'krz_pkd.csv')
 PATH_OUTPUT_HARD = os.path.join(DATA_DIR, 'processed', 'hard_datav2.csv')
+PATH_HARD_STATE = os.path.join(DATA_DIR, 'processed', 'hard_datav2.state.json')
+PATH_BANKRUPTCY_MONTHLY = os.path.join(DATA_DIR, 'processed', 'bankruptcy_monthly.csv')
+
+# Tryb przyrostowy: hashe plików źródłowych i konfiguracji w PATH_HARD_STATE. Bez zmian -> koniec
+# po policzeniu hashy (bez parsowania GUS/KRZ); każda zmiana -> pełne przeliczenie, bo rollup PKD
+# i dynamika r/r i tak wymagają całej tabeli. Wymuszenie przeliczenia: main_prepare(incremental=False).
+INCREMENTAL = True
+KEY_COLUMNS = ['Year', 'PKD_Level', 'PKD_Code']
+# Wersja przetwarzania zapisywana w stanie - podbić przy zmianie parsowania, agregacji PKD albo cech
+# (wtedy, jak przy zmianie listy branż czy INDICATOR_KEYWORDS, następuje pełne przeliczenie)
+HARD_DATA_VERSION = 3
+
+# Tryb oszczędzania pamięci (--lean) i hierarchia PKD wspólne z modelami
+sys.path.insert(0, os.path.join(os.path.dirname(SCRIPT_DIR), 'models'))
+import memory_budget
+import industries
+
+# Lista branż z konfiguracji (models/industries.yaml); kody zostają pełne, agregaty na wszystkich poziomach PKD
+KEY_INDUSTRIES = industries.KEY_INDUSTRIES
+
+# --- SMART MAPOWANIE ---
+# Klucz to fragment tekstu (małymi literami), którego szukamy w nazwie wskaźnika GUS. Wartość to nasza nazwa kolumny.
+# Pasuje kilka -> wygrywa pierwszy na liście. Kolejne wskaźniki z katalogu GUS = kolejne pozycje
+# (klasyfikowana jest każda różna etykieta raz, więc koszt nie rośnie z liczbą wierszy).
+INDICATOR_KEYWORDS = {
+    'przychody ogółem': 'Revenue',
+    'wynik finansowy netto': 'Profit',
+    'liczba jednostek': 'Company_Count',
+    'zobowiązania krótkoterminowe': 'Short_Term_Liabilities',
+    'kapitał obrotowy': 'NWC',
+    'aktywa obrotowe': 'Current_Assets', # Może nie istnieć
+    'przeciętne zatrudnienie': 'Employment' # Może nie istnieć
+}
+
+def compile_indicator_matcher(keywords=INDICATOR_KEYWORDS):
+    """Jeden wzorzec dla wszystkich fragmentów: numer grupy = pierwszy pasujący w kolejności słownika."""
+    alternatives = '|'.join(f'(?=.*?({re.escape(key)}))' for key in keywords)
+    return re.compile(f'^(?:{alternatives})', re.DOTALL)
+
+INDICATOR_MATCHER = compile_indicator_matcher()
+INDICATOR_TARGETS = list(INDICATOR_KEYWORDS.values())
+
+def map_indicator(val):
+    """Nazwa wskaźnika GUS -> nasza kolumna (None = nierozpoznany)."""
+    match = INDICATOR_MATCHER.match(str(val).lower())
+    return INDICATOR_TARGETS[match.lastindex - 1] if match else None
+
+def classify_indicators(labels, cache):
+    """
+    Etykiety wskaźników -> nasze kolumny (None = nierozpoznany) przez kody kategorii:
+    map_indicator liczone raz na różną etykietę (cache wspólny dla wszystkich kawałków pliku).
+    """
+    labels = labels.astype('category')
+    categories = list(labels.cat.categories) + [np.nan]  # kod -1 = pusta etykieta
+    for label in categories:
+        if label not in cache:
+            cache[label] = map_indicator(label)
+    targets = np.array([cache[label] for label in categories], dtype=object)
+    return pd.Series(targets[labels.cat.codes.to_numpy()], index=labels.index)
+
+# Rozmiar kawałka pliku GUS - pamięć zależy od kawałka, nie całego zrzutu (bajty dla pyarrow, wiersze dla pandas)
+FINANCE_BLOCK_BYTES = 8 << 20
+FINANCE_CHUNK_ROWS = 50_000
+
+# Liczba po usunięciu spacji tysięcznych i zamianie przecinka na kropkę; reszta (bd, #N/D, nd, -) to brak danych
+NUMBER_PATTERN = r'^[+-]?(\d+\.?\d*|\.\d+)([eE][+-]?\d+)?$'
+POLISH_NUMBER_TABLE = str.maketrans({'\xa0': None, ' ': None, ',': '.'})
+
+def finance_columns(path):
+    """Separator (';' albo ',') i nazwy kolumn z nagłówka pliku GUS - bez wczytywania danych."""
+    with open(path, encoding='utf-8') as f:
+        header_line = f.readline()
+    sep = ';' if ';' in header_line else ','
+    return sep, pd.read_csv(path, sep=sep, nrows=0).columns
+
+def parse_polish_numbers(values):
+    """
+    Polskie liczby ("1 234,56": spacje tysięczne, przecinek dziesiętny) -> float dla całego bloku naraz.
+    Znaczniki braku danych (bd, #N/D, nd, -) i nieczytelne wpisy -> 0.0, puste komórki zostają NaN.
+    """
+    cells = pd.Series(np.asarray(values, dtype=object).ravel())
+    numbers = pd.to_numeric(cells.str.translate(POLISH_NUMBER_TABLE), errors='coerce')
+    numbers = numbers.mask(cells.notna() & numbers.isna(), 0.0)
+    return numbers.to_numpy(dtype=float).reshape(np.shape(values))
+
+def parse_polish_numbers_arrow(column):
+    """Jak parse_polish_numbers, dla kolumny tekstowej pyarrow (operacje w C++, bez pętli Pythona)."""
+    text = pc.replace_substring(column, '\xa0', '')
+    text = pc.replace_substring(text, ' ', '')
+    text = pc.replace_substring(text, ',', '.')
+    numbers = pc.if_else(pc.match_substring_regex(text, NUMBER_PATTERN), text, '0')
+    return pc.cast(numbers, pa.float64()).to_numpy(zero_copy_only=False)
+
+def finance_chunks(path, sep, pkd_col, wsk_col, year_cols):
+    """
+    Strumień pliku GUS (tylko potrzebne kolumny) z filtrem PKD i wskaźników w pętli kawałków.
+    Zwraca kolejno (cyfry kodu PKD, wskaźnik, liczby [wiersze x lata]) dla działów z listy branż
+    i rozpoznanych wskaźników - liczby parsowane tylko dla nich.
+    """
+    usecols = [pkd_col, wsk_col] + year_cols
+    divisions = industries.divisions_in_scope(KEY_INDUSTRIES)
+    cache = {}
+    if pa is not None:
+        reader = pa_csv.open_csv(
+            path,
+            read_options=pa_csv.ReadOptions(block_size=FINANCE_BLOCK_BYTES),
+            parse_options=pa_csv.ParseOptions(delimiter=sep),
+            convert_options=pa_csv.ConvertOptions(
+                include_columns=usecols, column_types={c: pa.string() for c in usecols}, strings_can_be_null=True
+            ),
+        )
+        for batch in reader:
+            # Filtrowanie PKD (dział = pierwsze 2 cyfry pełnego kodu)
+            pkd = pc.replace_substring_regex(batch.column(pkd_col), r'\D', '')
+            if divisions is not None:
+                keep = pc.is_in(pc.utf8_slice_codeunits(pkd, 0, 2), value_set=pa.array(divisions))
+                batch, pkd = batch.filter(keep), pkd.filter(keep)
+
+            # Kodowanie słownikowe: etykiety przychodzą już jako kategoria
+            indicator = classify_indicators(batch.column(wsk_col).dictionary_encode().to_pandas(), cache)
+            known = pa.array(indicator.notna().to_numpy())
+            batch = batch.filter(known)
+            numbers = np.column_stack([parse_polish_numbers_arrow(batch.column(c)) for c in year_cols])
+            yield pkd.filter(known).to_pandas(), indicator.dropna(), numbers
+        return
 
-# Lista branż (PKD 2-cyfrowe)
-KEY_INDUSTRIES = [
-    '01', '10', '16', '23', '24', '29', '31', '35', 
-    '41', '68', '46', '47', '49', '55', '62'
-]
+    for chunk in pd.read_csv(path, sep=sep, dtype=str, usecols=usecols, chunksize=FINANCE_CHUNK_ROWS):
+        # Filtrowanie PKD (dział = pierwsze 2 cyfry pełnego kodu)
+        pkd = chunk[pkd_col].str.replace(r'\D', '', regex=True)
+        keep = pkd.notna() if divisions is None else pkd.str[:2].isin(divisions)
+        indicator = classify_indicators(chunk.loc[keep, wsk_col], cache).dropna()
+        yield pkd[indicator.index], indicator, parse_polish_numbers(chunk.loc[indicator.index, year_cols])
 
 def process_finance_data():
     """Wczytuje i czyści dane finansowe z GUS"""
     print("⏳ Przetwarzanie danych finansowych (Smart Mapping)...")
     
     try:
-        # Próba wczytania z różnymi separatorami
-        try:
-            df = pd.read_csv(PATH_FINANCE, sep=';', dtype=str)
-        except:
-            df = pd.read_csv(PATH_FINANCE, sep=',', dtype=str)
+        sep, header = finance_columns(PATH_FINANCE)
             
         # Czyszczenie nazw kolumn (usuwamy spacje na początku/końcu)
-        df.columns = [c.strip() for c in df.columns]
+        names = {c.strip(): c for c in header}
         
         # Inteligentne szukanie kolumny z kodem PKD i Wskaźnikiem
-        pkd_col = next((c for c in df.columns if 'PKD' in c), None)
-        wsk_col = next((c for c in df.columns if 'SKAZNIK' in c or 'ska' in c.lower()), None)
+        pkd_col = next((c for c in names if 'PKD' in c), None)
+        wsk_col = next((c for c in names if 'SKAZNIK' in c or 'ska' in c.lower()), None)
         
         if not pkd_col or not wsk_col:
-            print(f"❌ BŁĄD: Nie znaleziono kolumn PKD/Wskaźnik. Dostępne: {df.columns}")
+            print(f"❌ BŁĄD: Nie znaleziono kolumn PKD/Wskaźnik. Dostępne: {list(names)}")
             return pd.DataFrame()
-            
-        # Ujednolicenie nazw
-        df = df.rename(columns={pkd_col: 'PKD', wsk_col: 'WSKAZNIK'})
-        
-        # Filtrowanie PKD (pierwsze 2 cyfry)
-        df['PKD_Main'] = df['PKD'].str.replace(r'\D', '', regex=True).str[:2]
-        df = df[df['PKD_Main'].isin(KEY_INDUSTRIES)].copy()
-
-        # Funkcja do czyszczenia polskich liczb (np. "1 234,56")
-        def clean_currency(x):
-            if isinstance(x, str):
-                x = x.replace('\xa0', '').replace(' ', '') # Usuń spacje tysięczne
-                if x.lower() in ['bd', '#n/d', '', 'nan', 'nd', '-']: return 0.0
-                x = x.replace(',', '.') # Zamień przecinek na kropkę
-                try: return float(x)
-                except: return 0.0
-            return float(x) if x else 0.0
 
         # Znajdź kolumny z latami (wszystkie > 2000)
-        year_cols = [c for c in df.columns if c.strip().isdigit() and int(c.strip()) > 2000]
-        
-        for col in year_cols:
-            df[col] = df[col].apply(clean_currency)
-
-        # --- SMART MAPOWANIE ---
-        # Klucz to fragment tekstu, którego szukamy. Wartość to nasza nazwa kolumny.
-        keyword_map = {
-            'przychody ogółem': 'Revenue',
-            'wynik finansowy netto': 'Profit',
-            'liczba jednostek': 'Company_Count',
-            'zobowiązania krótkoterminowe': 'Short_Term_Liabilities',
-            'kapitał obrotowy': 'NWC',
-            'aktywa obrotowe': 'Current_Assets', # Może nie istnieć
-            'przeciętne zatrudnienie': 'Employment' # Może nie istnieć
-        }
-
-        def map_indicator(val):
-            val_lower = str(val).lower()
-            for key, target in keyword_map.items():
-                if key in val_lower:
-                    return target
-            return None
+        year_cols = [c for c in names if c.isdigit() and int(c) > 2000]
 
-        df['WSKAZNIK_EN'] = df['WSKAZNIK'].apply(map_indicator)
-        
-        # Zostawiamy tylko rozpoznane wiersze
-        df = df.dropna(subset=['WSKAZNIK_EN']).copy()
+        # Strumień kawałków: tylko potrzebne kolumny; zostawiamy kluczowe branże i rozpoznane wiersze
+        parts = []
+        for pkd, indicator, numbers in finance_chunks(
+            PATH_FINANCE, sep, names[pkd_col], names[wsk_col], [names[c] for c in year_cols]
+        ):
+            part = pd.DataFrame(numbers, columns=year_cols)
+            part.insert(0, 'WSKAZNIK_EN', indicator.to_numpy())
+            part.insert(0, 'PKD', pkd.to_numpy())
+            parts.append(part)
+
+        df = pd.concat(parts, ignore_index=True)
+
+        # Sekcje, działy, grupy i klasy jednym grupowaniem po kodach liści + zwijanie w górę hierarchii
+        df = industries.rollup(df, 'PKD', ['WSKAZNIK_EN'], year_cols, KEY_INDUSTRIES)
 
         # Pivot (Zamiana wierszy na kolumny)
-        df_melted = df.melt(id_vars=['PKD_Main', 'WSKAZNIK_EN'], value_vars=year_cols, var_name='Year', value_name='Value')
+        df_melted = df.melt(id_vars=['PKD_Level', 'PKD_Code', 'WSKAZNIK_EN'], value_vars=year_cols, var_name='Year', value_name='Value')
         
         df_fin = df_melted.pivot_table(
-            index=['Year', 'PKD_Main'],
+            index=['Year', 'PKD_Level', 'PKD_Code'],
             columns='WSKAZNIK_EN',
             values='Value',
             aggfunc='sum'
@@ -101,7 +205,7 @@ def process_finance_data():
         df_fin['Date'] = pd.to_datetime(df_fin['Year'] + '-01-01')
 
         # Uzupełnij brakujące kolumny zerami
-        for target_col in keyword_map.values():
+        for target_col in dict.fromkeys(INDICATOR_TARGETS):
             if target_col not in df_fin.columns:
                 df_fin[target_col] = 0.0
         
@@ -111,115 +215,245 @@ def process_finance_data():
         print(f"❌ Błąd w process_finance_data: {e}")
         return pd.DataFrame()
 
+# Rejestr KRZ (surowy eksport: jedno postępowanie na wiersz) czytany strumieniowo - pamięć zależy od kawałka
+# i liczby par (okres, kod PKD), nie od liczby postępowań. Zagregowany plik (rok;pkd;liczba) działa tak samo.
+BANKRUPTCY_CHUNK_ROWS = 200_000
+# Fragmenty nazwy kolumny z identyfikatorem postępowania (deduplikacja między kawałkami)
+CASE_ID_HINTS = ('sygnatura', 'sygn', 'id_sprawy', 'nr_sprawy', 'id_postepowania')
+# Formaty dat w eksportach KRZ (ISO i polski zapis dzienny)
+BANKRUPTCY_DATE_FORMATS = ['%Y-%m-%d', '%d.%m.%Y', '%Y-%m-%d %H:%M:%S']
+
+def new_case_ids(ids, seen):
+    """
+    Maska pierwszych wystąpień postępowań (w kawałku i względem wcześniejszych kawałków) + nowy zbiór widzianych.
+    Widziane trzymane jako posortowane hashe uint64 (8 bajtów na postępowanie); wiersze bez identyfikatora zostają.
+    """
+    known = ids.notna().to_numpy()
+    hashes = pd.util.hash_array(ids[known].to_numpy(dtype=object))
+    pos = np.minimum(np.searchsorted(seen, hashes), max(len(seen) - 1, 0))
+    already = seen[pos] == hashes if len(seen) else np.zeros(len(hashes), dtype=bool)
+    fresh = ~pd.Series(hashes).duplicated().to_numpy() & ~already
+    keep = ~known
+    keep[known] = fresh
+    return keep, np.sort(np.concatenate([seen, hashes[fresh]]))
+
+def bankruptcy_periods(dates):
+    """
+    Okres postępowania jako liczba: RRRRMM z pełnej daty, RRRR00 gdy w pliku jest sam rok (NaN = nieczytelna data).
+    Parsowana jest każda różna data raz (w rejestrze tysiące dat na miliony postępowań).
+    """
+    codes, uniques = pd.factorize(dates)
+    text = pd.Series(uniques, dtype=object).str.strip()
+    years = text.str.fullmatch(r'\d{4}').fillna(False)
+    parsed = pd.Series(pd.NaT, index=text.index, dtype='datetime64[ns]')
+    # Znane formaty wektorowo; format='mixed' (parser per wiersz) tylko dla reszty
+    for fmt in BANKRUPTCY_DATE_FORMATS + ['mixed']:
+        todo = parsed.isna() & text.notna() & ~years
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(text[todo], errors='coerce', format=fmt, dayfirst=True)
+    period = (parsed.dt.year * 100 + parsed.dt.month).mask(years, pd.to_numeric(text.where(years), errors='coerce') * 100)
+    return pd.Series(np.append(period.to_numpy(dtype=float), np.nan)[codes], index=dates.index)  # kod -1 = pusta data
+
+def period_label(period):
+    """RRRRMM -> '2021-03', RRRR00 -> '2021'."""
+    year, month = divmod(int(period), 100)
+    return f"{year}-{month:02d}" if month else str(year)
+
 def process_bankruptcy_data():
-    """Wczytuje dane o upadłościach"""
+    """
+    Wczytuje dane o upadłościach (strumieniowo, z deduplikacją postępowań po sygnaturze).
+    Zwraca Period ('2021' albo '2021-03'), PKD_Level, PKD_Code, Liczba_Upadlosci.
+    """
     print("⏳ Przetwarzanie danych o upadłościach...")
     if not os.path.exists(PATH_BANKRUPTCY):
         print("⚠️ Brak pliku upadłości.")
         return None
         
     try:
-        # Wczytanie z separatorem ;
-        df = pd.read_csv(PATH_BANKRUPTCY, sep=';')
+        # Normalizacja nazw kolumn na małe litery (sam nagłówek, dane czytane kawałkami)
+        header = pd.read_csv(PATH_BANKRUPTCY, sep=';', nrows=0).columns
+        names = {c.lower().strip(): c for c in header}
         
-        # Normalizacja nazw kolumn na małe litery
-        df.columns = [c.lower().strip() for c in df.columns]
-        
-        pkd_col = next((c for c in df.columns if 'pkd' in c), None)
-        year_col = next((c for c in df.columns if 'rok' in c or 'data' in c), None)
-        val_col = next((c for c in df.columns if 'liczba' in c or 'upad' in c), None)
+        pkd_col = next((c for c in names if 'pkd' in c), None)
+        date_col = next((c for c in names if 'rok' in c or 'data' in c), None)
+        val_col = next((c for c in names if ('liczba' in c or 'upad' in c) and c not in (pkd_col, date_col)), None)
+        id_col = next((c for c in names if any(hint in c for hint in CASE_ID_HINTS)), None)
 
-        if not pkd_col or not year_col or not val_col:
+        if not pkd_col or not date_col:
             print("❌ Nie rozpoznano kolumn w pliku upadłości.")
             return None
 
-        # Czyszczenie PKD
-        df['PKD_Main'] = df[pkd_col].astype(str).str[:2]
-        df = df[df['PKD_Main'].isin(KEY_INDUSTRIES)].copy()
-        
-        # Rok jako string
-        df['Year'] = df[year_col].astype(str)
-        
-        # Agregacja
-        df_grouped = df.groupby(['Year', 'PKD_Main'])[val_col].sum().reset_index()
-        df_grouped.rename(columns={val_col: 'Liczba_Upadlosci'}, inplace=True)
-        
-        return df_grouped
+        # Liczniki (okres, pełny kod) dodawane kawałek po kawałku; bez kolumny liczby każdy wiersz = 1 postępowanie
+        totals, seen = None, np.empty(0, dtype='uint64')
+        usecols = [names[c] for c in (pkd_col, date_col, val_col, id_col) if c]
+        for chunk in pd.read_csv(PATH_BANKRUPTCY, sep=';', dtype=str, usecols=usecols, chunksize=BANKRUPTCY_CHUNK_ROWS):
+            if id_col:
+                keep, seen = new_case_ids(chunk[names[id_col]], seen)
+                chunk = chunk[keep]
+            part = pd.DataFrame({
+                'Period': bankruptcy_periods(chunk[names[date_col]]),
+                'PKD': chunk[names[pkd_col]],
+                'Liczba_Upadlosci': pd.to_numeric(chunk[names[val_col]], errors='coerce') if val_col else 1,
+            })
+            part = part.groupby(['Period', 'PKD'])['Liczba_Upadlosci'].sum()
+            totals = part if totals is None else totals.add(part, fill_value=0)
+
+        if totals is None or totals.empty:
+            print("⚠️ Pusty plik upadłości.")
+            return None
+
+        # Etykiety okresów liczone dla unikalnych wartości; agregacja na wszystkich poziomach PKD z pełnego kodu
+        # (postępowanie z kodem '10' liczy się do działu 10 i sekcji C, z '10.11' także do grupy i klasy)
+        totals = totals.reset_index()
+        labels = {p: period_label(p) for p in totals['Period'].unique()}
+        totals['Period'] = totals['Period'].map(labels)
+        return industries.rollup(totals, 'PKD', ['Period'], ['Liczba_Upadlosci'], KEY_INDUSTRIES, events=True)
         
     except Exception as e:
         print(f"⚠️ Błąd odczytu upadłości: {e}")
         return None
 
-def main_prepare():
-    try:
-        # Stwórz folder wyjściowy
-        if not os.path.exists(os.path.dirname(PATH_OUTPUT_HARD)):
-            os.makedirs(os.path.dirname(PATH_OUTPUT_HARD))
+def split_bankruptcies(df_bankr):
+    """
+    Liczniki okresowe -> roczne (Year, do hard_datav2) i miesięczne (Date; None, gdy rejestr ma same lata).
+    Miesięczne trafiają do data_architect, gdzie zastępują interpolowany roczny Bankruptcy_Rate.
+    """
+    period = df_bankr['Period']
+    yearly = df_bankr.assign(Year=period.str[:4]).groupby(KEY_COLUMNS)['Liczba_Upadlosci'].sum().reset_index()
+    has_month = period.str.len() > 4
+    if not has_month.any():
+        return yearly, None
+    monthly = df_bankr[has_month].drop(columns='Period')
+    monthly.insert(0, 'Date', pd.to_datetime(period[has_month] + '-01'))
+    return yearly, monthly.sort_values(['PKD_Code', 'Date'])
+
+def file_fingerprint(path):
+    """Hash zawartości pliku źródłowego (None = brak pliku)."""
+    if not os.path.exists(path):
+        return None
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()[:16]
+
+def source_fingerprints():
+    return {os.path.basename(path): file_fingerprint(path) for path in (PATH_FINANCE, PATH_BANKRUPTCY)}
+
+def config_fingerprint():
+    """Hash konfiguracji wpływającej na wynik: lista branż, słownik wskaźników GUS, wersja przetwarzania."""
+    config = [HARD_DATA_VERSION, sorted(KEY_INDUSTRIES), list(INDICATOR_KEYWORDS.items())]
+    return hashlib.sha256(json.dumps(config, ensure_ascii=False).encode('utf-8')).hexdigest()[:16]
 
-        # 1. Pobierz Finanse
+def load_hard_state():
+    if not os.path.exists(PATH_HARD_STATE):
+        return None
+    with open(PATH_HARD_STATE, encoding='utf-8') as f:
+        return json.load(f)
+
+def save_hard_state(sources, config):
+    """Stan trybu przyrostowego: hashe plików źródłowych i konfiguracji, z których powstał PATH_OUTPUT_HARD."""
+    with open(PATH_HARD_STATE, 'w', encoding='utf-8') as f:
+        json.dump({'sources': sources, 'config': config}, f)
+
+def load_sources():
+    """Finanse GUS + upadłości KRZ -> surowa tabela (Year, PKD_Level, PKD_Code, wskaźniki). None = brak danych."""
+    # 1. Pobierz Finanse
+    with memory_budget.stage('finanse'):
         df_fin = process_finance_data()
-        if df_fin.empty: return
+    if df_fin.empty: return None
 
-        # 2. Pobierz Upadłości
+    # 2. Pobierz Upadłości
+    with memory_budget.stage('upadłości'):
         df_bankr = process_bankruptcy_data()
+    if df_bankr is not None:
+        df_bankr, df_monthly = split_bankruptcies(df_bankr)
+        if df_monthly is not None:
+            df_monthly.to_csv(PATH_BANKRUPTCY_MONTHLY, index=False)
+            print(f"📅 Upadłości miesięczne: {PATH_BANKRUPTCY_MONTHLY}")
+        elif os.path.exists(PATH_BANKRUPTCY_MONTHLY):
+            os.remove(PATH_BANKRUPTCY_MONTHLY)  # rejestr bez dat dziennych - nieaktualny plik miesięczny
 
-        # 3. Łączenie
-        if df_bankr is not None:
-            df_hard = pd.merge(df_fin, df_bankr, on=['Year', 'PKD_Main'], how='left')
-            df_hard['Liczba_Upadlosci'] = df_hard['Liczba_Upadlosci'].fillna(0)
-        else:
-            df_hard = df_fin
-            df_hard['Liczba_Upadlosci'] = 0
+    # 3. Łączenie
+    if df_bankr is not None:
+        df_hard = pd.merge(df_fin, df_bankr, on=KEY_COLUMNS, how='left')
+        df_hard['Liczba_Upadlosci'] = df_hard['Liczba_Upadlosci'].fillna(0)
+    else:
+        df_hard = df_fin
+        df_hard['Liczba_Upadlosci'] = 0
 
-        df_hard.rename(columns={'PKD_Main': 'PKD_Code'}, inplace=True)
+    # Sortowanie jest kluczowe dla funkcji shift()
+    return df_hard.sort_values(by=['PKD_Code', 'Date']).reset_index(drop=True)
 
-        # --- OBLICZENIA I NAPRAWA DANYCH (Feature Engineering) ---
-        
-        # A. Naprawa Aktywów Obrotowych (gdy brak w pliku, ale jest NWC)
-        # Jeśli Current_Assets są puste (suma bliska 0), wyliczamy je: Assets = NWC + Liabilities
-        if df_hard['Current_Assets'].sum() <= 10.0:
-            print("💡 Brak 'Aktywa obrotowe' w pliku. Wyliczam z: NWC + Zobowiązania.")
-            df_hard['Current_Assets'] = df_hard['NWC'] + df_hard['Short_Term_Liabilities']
-
-        # B. Płynność (Liquidity)
-        # Zabezpieczenie: jeśli Liabilities=0, dajemy bezpieczną wartość (np. 2.0)
-        df_hard['Liquidity_Ratio'] = np.where(
-            df_hard['Short_Term_Liabilities'] > 0,
-            df_hard['Current_Assets'] / df_hard['Short_Term_Liabilities'],
-            2.0 
-        )
+def engineer_features(df_hard):
+    """Wskaźniki pochodne na pełnej tabeli (posortowanej po PKD_Code, Date)."""
+    # A. Naprawa Aktywów Obrotowych (gdy brak w pliku, ale jest NWC)
+    # Jeśli Current_Assets są puste (suma bliska 0), wyliczamy je: Assets = NWC + Liabilities
+    if df_hard['Current_Assets'].sum() <= 10.0:
+        print("💡 Brak 'Aktywa obrotowe' w pliku. Wyliczam z: NWC + Zobowiązania.")
+        df_hard['Current_Assets'] = df_hard['NWC'] + df_hard['Short_Term_Liabilities']
 
-        # C. Wskaźnik Upadłości (Bankruptcy Rate)
-        df_hard['Bankruptcy_Rate'] = np.where(
-            df_hard['Company_Count'] > 0,
-            df_hard['Liczba_Upadlosci'] / df_hard['Company_Count'],
-            0.0
-        )
+    # B. Płynność (Liquidity)
+    # Zabezpieczenie: jeśli Liabilities=0, dajemy bezpieczną wartość (np. 2.0)
+    df_hard['Liquidity_Ratio'] = np.where(
+        df_hard['Short_Term_Liabilities'] > 0,
+        df_hard['Current_Assets'] / df_hard['Short_Term_Liabilities'],
+        2.0 
+    )
 
-        # D. Dynamika Rozwoju (Employment/Company Growth)
-        # Sortowanie jest kluczowe dla funkcji shift()
-        df_hard = df_hard.sort_values(by=['PKD_Code', 'Date'])
-        
-        # Jeśli nie ma danych o zatrudnieniu, używamy liczby firm
-        target_col = 'Employment'
-        if df_hard['Employment'].sum() <= 10.0:
-            print("💡 Brak danych o zatrudnieniu. Używam 'Liczba jednostek' do dynamiki.")
-            target_col = 'Company_Count'
-
-        # Obliczanie zmiany rok do roku
-        df_hard['Prev_Val'] = df_hard.groupby('PKD_Code')[target_col].shift(1)
-        
-        df_hard['Employment_Dynamics'] = np.where(
-            (df_hard['Prev_Val'] > 0),
-            (df_hard[target_col] - df_hard['Prev_Val']) / df_hard['Prev_Val'],
-            0.0
-        )
-        
-        # Sprzątanie
-        df_hard = df_hard.drop(columns=['Prev_Val'])
+    # C. Wskaźnik Upadłości (Bankruptcy Rate)
+    df_hard['Bankruptcy_Rate'] = np.where(
+        df_hard['Company_Count'] > 0,
+        df_hard['Liczba_Upadlosci'] / df_hard['Company_Count'],
+        0.0
+    )
+
+    # D. Dynamika Rozwoju (Employment/Company Growth)
+    # Jeśli nie ma danych o zatrudnieniu, używamy liczby firm
+    target_col = 'Employment'
+    if df_hard['Employment'].sum() <= 10.0:
+        print("💡 Brak danych o zatrudnieniu. Używam 'Liczba jednostek' do dynamiki.")
+        target_col = 'Company_Count'
+
+    # Obliczanie zmiany rok do roku
+    df_hard['Prev_Val'] = df_hard.groupby('PKD_Code')[target_col].shift(1)
+    
+    df_hard['Employment_Dynamics'] = np.where(
+        (df_hard['Prev_Val'] > 0),
+        (df_hard[target_col] - df_hard['Prev_Val']) / df_hard['Prev_Val'],
+        0.0
+    )
+    
+    # Sprzątanie
+    return df_hard.drop(columns=['Prev_Val'])
+
+def main_prepare(incremental=INCREMENTAL):
+    try:
+        # Stwórz folder wyjściowy
+        if not os.path.exists(os.path.dirname(PATH_OUTPUT_HARD)):
+            os.makedirs(os.path.dirname(PATH_OUTPUT_HARD))
+
+        # Tryb przyrostowy: niezmienione pliki źródłowe i konfiguracja -> nic do zrobienia
+        sources, config = source_fingerprints(), config_fingerprint()
+        state = load_hard_state() if incremental and os.path.exists(PATH_OUTPUT_HARD) else None
+        if state is not None and state.get('config') != config:
+            print("🔁 Zmiana konfiguracji (lista branż / wskaźniki GUS / wersja przetwarzania) - pełne przeliczenie.")
+            state = None
+        if state is not None and state['sources'] == sources:
+            print(f"✅ Hard Data aktualne - pliki źródłowe i konfiguracja bez zmian ({PATH_OUTPUT_HARD}).")
+            return
+
+        df_hard = load_sources()
+        if df_hard is None: return
+
+        # --- OBLICZENIA I NAPRAWA DANYCH (Feature Engineering) ---
+        df_hard = engineer_features(memory_budget.compact(df_hard))
 
         # Zapis
-        df_hard.to_csv(PATH_OUTPUT_HARD, index=False)
+        with memory_budget.stage('zapis'):
+            df_hard.to_csv(PATH_OUTPUT_HARD, index=False)
+            save_hard_state(sources, config)
         print(f"✅ Hard Data Przetworzone! Wynik: {PATH_OUTPUT_HARD}")
         
         # Podgląd kontrolny (ostatnie 5 wierszy)
@@ -232,4 +466,5 @@ def main_prepare():
         traceback.print_exc()
 
 if __name__ == "__main__":
-    main_prepare()
\ No newline at end of file
+    memory_budget.configure()
+    main_prepare()
@@ -2,6 +2,7 @@ import pandas as pd
 import requests
 import os
 import io
+import re
 import numpy as np
 from datetime import datetime, timedelta
 from concurrent.futures import ThreadPoolExecutor
@@ -89,9 +90,41 @@ def generate_interest_rates():
 
 # -------------------- Funkcje GDELT --------------------
 
-def fetch_gdelt_for_pkd(pkd_code, keywords, date_range):
+def compile_keyword_matcher(pkd_keywords):
+    """
+    Jeden wzorzec dla słów kluczowych wszystkich branż: lookahead na każdej pozycji tekstu, więc trafienia
+    mogą się nakładać; przy wspólnym początku wygrywa najdłuższe słowo, a słowo zawarte w dłuższym
+    dziedziczy jego branże - wynik jak any(k in x) osobno dla każdej branży.
+    Zwraca (wzorzec, słowo -> krotka kodów PKD, kod PKD -> pozycja w pkd_keywords).
+    """
+    owners = {}
+    for pkd, keywords in pkd_keywords.items():
+        for k in keywords:
+            owners.setdefault(k.lower(), []).append(pkd)
+    order = list(pkd_keywords)
+    codes = {
+        k: tuple(sorted({pkd for other, pkds in owners.items() if other in k for pkd in pkds}, key=order.index))
+        for k in owners
+    }
+    alternatives = '|'.join(re.escape(k) for k in sorted(owners, key=len, reverse=True))
+    return re.compile(f'(?=({alternatives}))'), codes, {pkd: i for i, pkd in enumerate(order)}
+
+def match_pkd(themes, matcher):
+    """
+    Wszystkie branże każdego rekordu w jednym przejściu po tekście -> Series Kod_PKD
+    (indeks = indeks rekordu, powtórzony dla rekordu pasującego do kilku branż).
+    Kolejność jak przy osobnym przebiegu na branżę: branża, potem rekordy.
+    """
+    pattern, codes, rank = matcher
+    found = themes.fillna("").str.lower().str.findall(pattern).explode().dropna()
+    pkd = found.map(codes).explode()
+    pkd = pkd[~pd.MultiIndex.from_arrays([pkd.index, pkd.to_numpy()]).duplicated()]
+    order = np.lexsort((themes.index.get_indexer(pkd.index), pkd.map(rank).to_numpy()))
+    return pkd.iloc[order].rename("Kod_PKD")
+
+def fetch_gdelt_batch(date_range, matcher):
+    """Jedno pobranie GKG dla paczki dni, dopasowanie do wszystkich branż naraz."""
     from gdelt import gdelt
-    import pandas as pd
     gd = gdelt(version=2)
     try:
         results = gd.Search(date_range, table="gkg", output="df", coverage=False)
@@ -100,28 +133,22 @@ def fetch_gdelt_for_pkd(pkd_code, keywords, date_range):
     if results is None or results.empty:
         return pd.DataFrame()
 
-    results["match"] = results["V2Themes"].fillna("").apply(
-        lambda x: any(k.lower() in x.lower() for k in keywords)
-    )
-    filtered = results[results["match"]].copy()
-    if filtered.empty:
+    pkd = match_pkd(results["V2Themes"], matcher)
+    if pkd.empty:
         return pd.DataFrame()
 
-    filtered["Kod_PKD"] = pkd_code
+    filtered = results.loc[pkd.index].reset_index(drop=True)
+    filtered["Kod_PKD"] = pkd.to_numpy()
 
-    # obsługa różnych formatów dat
+    # obsługa różnych formatów dat (RRRRMMDD albo RRRRMMDDggmmss) - wektorowo po długości tekstu
     def parse_date(x):
-        x = str(x)
-        if len(x) == 8:
-            return pd.to_datetime(x, format="%Y%m%d")
-        elif len(x) == 14:
-            return pd.to_datetime(x, format="%Y%m%d%H%M%S")
-        else:
-            return pd.NaT
+        x = x.astype(str)
+        day = pd.to_datetime(x.where(x.str.len() == 8), format="%Y%m%d", errors='coerce')
+        return day.fillna(pd.to_datetime(x.where(x.str.len() == 14), format="%Y%m%d%H%M%S", errors='coerce'))
     if "DATEADDED" in filtered.columns:
         filtered["Data"] = pd.to_datetime(filtered["DATEADDED"], format="%Y%m%d%H%M%S", errors='coerce')
     elif "DATE" in filtered.columns:
-        filtered["Data"] = filtered["DATE"].apply(parse_date)
+        filtered["Data"] = parse_date(filtered["DATE"])
     else:
         filtered["Data"] = pd.NaT
 
@@ -150,14 +177,14 @@ def fetch_gdelt_sentiment(PKD_KEYWORDS, days_back=60):
 
     all_results = []
 
+    # Każda paczka dni pobierana raz (nie raz na branżę); słowa wszystkich branż w jednym wzorcu
+    matcher = compile_keyword_matcher(PKD_KEYWORDS)
     with ThreadPoolExecutor(max_workers=4) as executor:
-        for batch in date_batches:
-            futures = [executor.submit(fetch_gdelt_for_pkd, pkd, kws, batch)
-                       for pkd, kws in PKD_KEYWORDS.items()]
-            for future in futures:
-                df = future.result()
-                if not df.empty:
-                    all_results.append(df)
+        futures = [executor.submit(fetch_gdelt_batch, batch, matcher) for batch in date_batches]
+        for future in futures:
+            df = future.result()
+            if not df.empty:
+                all_results.append(df)
 
     if not all_results:
         return pd.DataFrame()
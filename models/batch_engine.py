@@ -0,0 +1,160 @@
+import pandas as pd
+import numpy as np
+from statistics import NormalDist
+
+# Wektorowy silnik prognoz: trend (z punktami zmiany) + sezonowość roczna (Fourier)
+# + regresory + dummies lockdownów. Wszystkie serie liczone jednym batchowym
+# rozwiązaniem ridge na tablicy (seria, czas, cecha) - bez pętli po branżach.
+
+N_CHANGEPOINTS = 10
+CHANGEPOINT_RANGE = 0.8
+FOURIER_ORDER = 3
+ALPHA = 0.1
+ALPHA_CHANGEPOINT = 10.0
+INTERVAL_WIDTH = 0.8
+# Standaryzowane regresory przycinamy do +-N odchyleń: skok WIBOR o kilkadziesiąt sigm
+# względem okna treningowego nie może liniowo "wystrzelić" prognozy.
+# Scenariusze what-if (scenarios.py) przewidują bez przycięcia - duży szok ma dać duży efekt.
+REGRESSOR_CLIP = 3.0
+
+
+def panel(df, pkds, dates, cols):
+    """Ramka (PKD_Code, Date) -> tablica (P, T, C). Brakujące komórki = NaN."""
+    index = pd.MultiIndex.from_product([pkds, dates], names=['PKD_Code', 'Date'])
+    values = df.set_index(['PKD_Code', 'Date'])[cols].reindex(index).to_numpy(dtype=float)
+    return values.reshape(len(pkds), len(dates), len(cols))
+
+
+def time_features(dates, t_start, t_end, changepoints, holiday_dates):
+    """Cechy wspólne dla wszystkich serii: [1, t, zawiasy trendu, Fourier, dummies świąt] -> (T, F0)."""
+    days = (dates - t_start).days.to_numpy(dtype=float)
+    t = days / max((t_end - t_start).days, 1)
+
+    cols = [np.ones_like(t), t]
+    cols += [np.maximum(t - c, 0.0) for c in changepoints]
+
+    # Jak w Prophecie: okres 365.25 dnia liczony od epoki
+    epoch_days = (dates - pd.Timestamp('1970-01-01')).days.to_numpy(dtype=float)
+    for k in range(1, FOURIER_ORDER + 1):
+        arg = 2 * np.pi * k * epoch_days / 365.25
+        cols += [np.sin(arg), np.cos(arg)]
+
+    cols += [dates.isin(h).astype(float) for h in holiday_dates]
+    return np.column_stack(cols)
+
+
+def holiday_windows(holidays):
+    """Tabela świąt Prophet -> lista dat dla każdej pary (święto, przesunięcie w dniach)."""
+    if holidays is None or holidays.empty:
+        return []
+    windows = []
+    for _, row in holidays.iterrows():
+        for offset in range(int(row['lower_window']), int(row['upper_window']) + 1):
+            windows.append([row['ds'] + pd.Timedelta(days=offset)])
+    return windows
+
+
+def fit(train_dates, y, x_reg, holidays=None):
+    """
+    y: (S, T) - NaN = brak obserwacji, x_reg: (S, T, R).
+    Zwraca stan modelu (słownik) dla predict() - współczynniki i skalowanie wszystkich serii.
+    """
+    train_dates = pd.DatetimeIndex(train_dates)
+    t_start, t_end = train_dates[0], train_dates[-1]
+
+    cp_count = min(N_CHANGEPOINTS, max(len(train_dates) - 2, 0))
+    changepoints = np.linspace(0, CHANGEPOINT_RANGE, cp_count + 1)[1:]
+
+    # Usuwamy dummies świąt, które nie trafiają w żadną datę treningu (ich współczynnik i tak byłby 0)
+    windows = [w for w in holiday_windows(holidays) if train_dates.isin(w).any()]
+
+    base = time_features(train_dates, t_start, t_end, changepoints, windows)
+    n_base = base.shape[1]
+    n_reg = x_reg.shape[2]
+
+    w = (~np.isnan(y)).astype(float)
+    n_obs = w.sum(axis=1)
+
+    # Skalowanie y (jak Prophet: max |y|) i standaryzacja regresorów per seria
+    scale = np.nanmax(np.abs(y), axis=1)
+    scale = np.where((scale > 0) & np.isfinite(scale), scale, 1.0)
+    y_scaled = np.nan_to_num(y / scale[:, None])
+
+    x_mask = w[:, :, None] * ~np.isnan(x_reg)
+    x_filled = np.nan_to_num(x_reg)
+    x_count = np.maximum(x_mask.sum(axis=1), 1.0)
+    x_mean = (x_filled * x_mask).sum(axis=1) / x_count
+    x_std = np.sqrt((((x_filled - x_mean[:, None, :]) * x_mask) ** 2).sum(axis=1) / x_count)
+    x_std = np.where(x_std > 0, x_std, 1.0)
+
+    state = {
+        't_start': t_start, 't_end': t_end, 'changepoints': changepoints, 'windows': windows,
+        'x_mean': x_mean, 'x_std': x_std, 'scale': scale, 'too_short': n_obs < 2,
+    }
+    X = design(state, base, x_reg)
+
+    penalty = np.full(n_base + n_reg, ALPHA)
+    penalty[:2] = 1e-6
+    penalty[2:2 + cp_count] = ALPHA_CHANGEPOINT
+
+    Xw = X * w[:, :, None]
+    XtWX = np.einsum('stf,stg->sfg', Xw, X)
+    A_inv = np.linalg.inv(XtWX + np.diag(penalty))
+    beta = np.einsum('sfg,sg->sf', A_inv, np.einsum('stf,st->sf', Xw, y_scaled))
+
+    resid = (y_scaled - np.einsum('stf,sf->st', X, beta)) * w
+    dof = n_obs - np.einsum('sfg,sgf->s', A_inv, XtWX)
+    state.update(
+        beta=beta, A_inv=A_inv,
+        sigma=np.sqrt((resid ** 2).sum(axis=1) / np.maximum(dof, 1.0)),
+        resid=np.where(w > 0, resid * scale[:, None], np.nan),
+    )
+    return state
+
+
+def design(state, base_rows, x, clip=REGRESSOR_CLIP):
+    """
+    Macierz cech: wspólne cechy czasu + standaryzowane regresory. x: (..., S, T, R) -> (..., S, T, F).
+    clip=None -> regresory bez przycinania.
+    """
+    x_std_vals = np.nan_to_num((x - state['x_mean'][:, None, :]) / state['x_std'][:, None, :])
+    if clip is not None:
+        x_std_vals = np.clip(x_std_vals, -clip, clip)
+    base_b = np.broadcast_to(base_rows, x.shape[:-1] + base_rows.shape[-1:])
+    return np.concatenate([base_b, x_std_vals], axis=-1)
+
+
+def predict(state, future_dates, x_reg_future, interval_width=INTERVAL_WIDTH, regressor_clip=REGRESSOR_CLIP):
+    """
+    x_reg_future: (S, H, R) albo (N, S, H, R) - N wariantów regresorów (scenariuszy) naraz.
+    regressor_clip=None -> przyszłe regresory bez przycinania (scenariusze what-if).
+    Zwraca (yhat, lower, upper) o kształcie (S, H) albo (N, S, H).
+    """
+    future_dates = pd.DatetimeIndex(future_dates)
+    base_future = time_features(
+        future_dates, state['t_start'], state['t_end'], state['changepoints'], state['windows']
+    )
+    X_future = design(state, base_future, x_reg_future, regressor_clip)
+
+    yhat = np.einsum('...shf,sf->...sh', X_future, state['beta'])
+    leverage = np.einsum('...shf,sfg,...shg->...sh', X_future, state['A_inv'], X_future)
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    half_width = z * state['sigma'][:, None] * np.sqrt(1.0 + leverage)
+
+    yhat = yhat * state['scale'][:, None]
+    half_width = half_width * state['scale'][:, None]
+
+    # Serie bez wystarczającej liczby obserwacji nie dostają prognozy
+    yhat[..., state['too_short'], :] = np.nan
+    half_width[..., state['too_short'], :] = np.nan
+
+    return yhat, yhat - half_width, yhat + half_width
+
+
+def fit_predict(train_dates, y, x_reg, future_dates, x_reg_future, holidays=None, interval_width=INTERVAL_WIDTH):
+    """
+    y: (S, T) - NaN = brak obserwacji, x_reg: (S, T, R), x_reg_future: (S, H, R).
+    Zwraca (yhat, lower, upper) o kształcie (S, H).
+    """
+    state = fit(train_dates, y, x_reg, holidays)
+    return predict(state, future_dates, x_reg_future, interval_width)
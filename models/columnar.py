@@ -0,0 +1,156 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+
+# Typowany zapis kolumnowy (Arrow IPC / Feather, bez kompresji -> odczyt przez memory mapping) obok plików CSV.
+# CSV zostaje dla frontendu (dataLoader.ts) i jako wersja zapasowa; etapy Pythona czytają .feather,
+# jeśli jest nie starszy niż CSV. Bez pyarrow wszystko działa dalej na CSV.
+# PKD_Code -> kategoria, Date -> natywna data, metryki -> float32 tam, gdzie błąd zaokrąglenia jest pomijalny.
+
+try:
+    import pyarrow as pa
+    import pyarrow.feather as feather
+except ImportError:
+    pa = feather = None
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+PROCESSED_DIR = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed')
+
+# Maksymalny błąd bezwzględny po rzutowaniu kolumny na float32 (score'y 0-100 mieszczą się z zapasem)
+FLOAT32_MAX_ERROR = 1e-4
+
+# Wiersze w jednym batchu pliku - jednostka odczytu strumieniowego (iter_batches)
+BATCH_ROWS = 64_000
+
+
+def columnar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.feather'
+
+
+def float32_columns(df, max_error=FLOAT32_MAX_ERROR):
+    """Kolumny float64, które po rzutowaniu na float32 zmieniają się najwyżej o max_error."""
+    columns = []
+    for col in df.select_dtypes(include='float64').columns:
+        values = df[col].to_numpy()
+        error = np.nanmax(np.abs(values.astype('float32').astype('float64') - values), initial=0.0)
+        if error <= max_error:
+            columns.append(col)
+    return columns
+
+
+def to_typed(df):
+    """Kopia ramki z typami do zapisu kolumnowego."""
+    df = df.copy()
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+    if 'PKD_Code' in df.columns:
+        df['PKD_Code'] = df['PKD_Code'].astype(str).astype('category')
+    for col in float32_columns(df):
+        df[col] = df[col].astype('float32')
+    return df
+
+
+def write_columnar(df, csv_path):
+    """Zapisuje .feather obok csv_path. Zwraca ścieżkę albo None (brak pyarrow)."""
+    if feather is None:
+        print("   ⚠️ Brak pyarrow - pomijam zapis kolumnowy (zostaje CSV)")
+        return None
+    path = columnar_path(csv_path)
+    table = pa.Table.from_pandas(to_typed(df), preserve_index=False)
+    feather.write_feather(table, path, compression='uncompressed', chunksize=BATCH_ROWS)
+    return path
+
+
+def append_columnar(new_rows, csv_path):
+    """Dopisuje wiersze do istniejącego .feather (pełny zapis - format nie ma trybu append)."""
+    path = columnar_path(csv_path)
+    if feather is None or not os.path.exists(path):
+        return None
+    existing = feather.read_table(path, memory_map=True).to_pandas()
+    new_rows = new_rows[existing.columns].assign(PKD_Code=new_rows['PKD_Code'].astype(str))
+    existing['PKD_Code'] = existing['PKD_Code'].astype(str)
+    return write_columnar(pd.concat([existing, new_rows], ignore_index=True), csv_path)
+
+
+def is_fresh(csv_path):
+    """.feather istnieje i nie jest starszy niż CSV (CSV dopisany/podmieniony później = nieaktualny)."""
+    path = columnar_path(csv_path)
+    if feather is None or not os.path.exists(path):
+        return False
+    return not os.path.exists(csv_path) or os.path.getmtime(path) >= os.path.getmtime(csv_path)
+
+
+def read_table(csv_path, columns=None):
+    """
+    Ramka z .feather (projekcja kolumn + memory mapping) albo z CSV, gdy brak aktualnego pliku kolumnowego.
+    Date jako data, PKD_Code jako tekst ('01'; z .feather jako kategoria), columns=None -> wszystkie kolumny.
+    """
+    if is_fresh(csv_path):
+        table = pa.ipc.open_file(pa.memory_map(columnar_path(csv_path))).read_all()
+        if columns is not None:
+            table = table.select([c for c in columns if c in table.schema.names])
+        return table.to_pandas()
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = None if columns is None else [c for c in columns if c in header]
+    df = pd.read_csv(csv_path, usecols=usecols, dtype={'PKD_Code': str})
+    if 'Date' in df.columns:
+        df['Date'] = pd.to_datetime(df['Date'])
+    return df
+
+
+def iter_batches(csv_path, columns=None, batch_rows=BATCH_ROWS):
+    """Kolejne kawałki pliku: batche .feather z memory mappingu albo read_csv(chunksize=...)."""
+    if is_fresh(csv_path):
+        with pa.memory_map(columnar_path(csv_path)) as source:
+            reader = pa.ipc.open_file(source)
+            names = reader.schema.names
+            selected = names if columns is None else [c for c in columns if c in names]
+            for i in range(reader.num_record_batches):
+                yield reader.get_batch(i).select(selected).to_pandas()
+        return
+
+    header = pd.read_csv(csv_path, nrows=0).columns
+    usecols = None if columns is None else [c for c in columns if c in header]
+    for chunk in pd.read_csv(csv_path, usecols=usecols, dtype={'PKD_Code': str}, chunksize=batch_rows):
+        if 'Date' in chunk.columns:
+            chunk['Date'] = pd.to_datetime(chunk['Date'])
+        yield chunk
+
+
+def report(csv_path, columns=None, repeats=5):
+    """Porównanie CSV vs .feather: rozmiar pliku, pamięć ramki i czas wczytania (z projekcją kolumn)."""
+    path = columnar_path(csv_path)
+    if not os.path.exists(csv_path) or not is_fresh(csv_path):
+        print(f"   ⚠️ Brak aktualnego {os.path.basename(path)} - uruchom etap, który go zapisuje")
+        return
+
+    def timed(load):
+        start = time.perf_counter()
+        for _ in range(repeats):
+            df = load()
+        return (time.perf_counter() - start) / repeats, df.memory_usage(deep=True).sum()
+
+    def load_csv():
+        df = pd.read_csv(csv_path, usecols=columns, dtype={'PKD_Code': str})
+        df['Date'] = pd.to_datetime(df['Date'])
+        return df
+
+    t_csv, mem_csv = timed(load_csv)
+    t_col, mem_col = timed(lambda: read_table(csv_path, columns))
+    size_csv, size_col = os.path.getsize(csv_path), os.path.getsize(path)
+    print(f"📦 {os.path.basename(csv_path)} vs {os.path.basename(path)}"
+          f"{'' if columns is None else f' ({len(columns)} kolumn)'}:")
+    print(f"   plik:    {size_csv / 1024:8.1f} KB -> {size_col / 1024:8.1f} KB")
+    print(f"   pamięć:  {mem_csv / 1024:8.1f} KB -> {mem_col / 1024:8.1f} KB")
+    print(f"   odczyt:  {t_csv * 1000:8.2f} ms -> {t_col * 1000:8.2f} ms (x{t_csv / max(t_col, 1e-9):.1f})")
+
+
+if __name__ == "__main__":
+    master = os.path.join(PROCESSED_DIR, 'MASTER_DATA.csv')
+    predictions = os.path.join(PROCESSED_DIR, 'predictions.csv')
+    report(master)
+    report(master, ['Date', 'PKD_Code', 'PKO_SCORE_FINAL', 'WIBOR', 'Google_Trends', 'Energy_Price'])
+    report(predictions)
@@ -0,0 +1,85 @@
+import pandas as pd
+import os
+import json
+import hashlib
+import columnar
+import memory_budget
+
+# Magazyn cech: wygładzone (średnia krocząca 6M per branża) targety i regresory liczone raz
+# i zapisywane obok MASTER_DATA.csv. Forecaster, walidator i tuner czytają ten sam plik,
+# więc walidacja mierzy dokładnie to, na czym trenował model.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+MASTER_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'MASTER_DATA.csv')
+
+# Zmiana sposobu liczenia cech = nowa wersja (nowy plik, stare nie są nadpisywane)
+FEATURE_VERSION = 2
+SMOOTH_WINDOW = 6
+
+
+def features_path(input_file, version=FEATURE_VERSION):
+    """MASTER_DATA.csv -> MASTER_DATA_features_v<wersja>.csv w tym samym katalogu."""
+    base, ext = os.path.splitext(input_file)
+    return f"{base}_features_v{version}{ext}"
+
+
+def smooth(df, columns, window=SMOOTH_WINDOW, fill=True):
+    """
+    Średnia krocząca per PKD_Code jednym grupowym rolling (bez lambdy per grupa).
+    fill=True -> luki uzupełniane w obrębie branży (bfill, potem ffill) we wszystkich kolumnach.
+    """
+    df = df.sort_values(['PKD_Code', 'Date']).reset_index(drop=True)
+    columns = [c for c in columns if c in df.columns]
+
+    rolled = df.groupby('PKD_Code', sort=False)[columns].rolling(window=window, min_periods=1).mean()
+    df[columns] = rolled.reset_index(level=0, drop=True)
+
+    if fill:
+        value_cols = df.columns.drop('PKD_Code')
+        df[value_cols] = df.groupby('PKD_Code', sort=False)[value_cols].bfill()
+        df[value_cols] = df.groupby('PKD_Code', sort=False)[value_cols].ffill()
+    return df
+
+
+def fingerprint(input_file, columns, window):
+    """Hash pliku źródłowego + parametrów wygładzania - zmiana czegokolwiek unieważnia zapisane cechy."""
+    digest = hashlib.sha256()
+    with open(input_file, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    digest.update(json.dumps([FEATURE_VERSION, sorted(columns), window]).encode('utf-8'))
+    return digest.hexdigest()[:16]
+
+
+def load_features(input_file, columns, window=SMOOTH_WINDOW):
+    """Wygładzone cechy z pliku obok MASTER_DATA (gdy aktualne) albo liczone od nowa i zapisywane."""
+    path = features_path(input_file)
+    meta_path = path + '.meta.json'
+    key = fingerprint(input_file, columns, window)
+
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('fingerprint') == key:
+            print(f"🗄️ Cechy z magazynu: {os.path.basename(path)}")
+            features = pd.read_csv(path, parse_dates=['Date'], dtype={'PKD_Code': str})
+            return memory_budget.compact(features, categorical=False)
+
+    print(f"Wygładzam dane historyczne (Rolling Mean {window}M) -> {os.path.basename(path)}")
+    # Tylko potrzebne kolumny (z .feather, jeśli aktualny); wygładzamy w float64
+    df = columnar.read_table(input_file, ['Date', 'PKD_Code'] + list(columns))
+    df['PKD_Code'] = df['PKD_Code'].astype(str)
+    df = df.astype({c: 'float64' for c in df.select_dtypes(include='float32').columns})
+    features = smooth(df, columns, window)
+
+    features.to_csv(path, index=False)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            'fingerprint': key,
+            'version': FEATURE_VERSION,
+            'source': os.path.basename(input_file),
+            'window': window,
+            'columns': [c for c in columns if c in features.columns],
+        }, f, indent=2)
+    return memory_budget.compact(features, categorical=False)
@@ -1,115 +1,469 @@
 import pandas as pd
 import numpy as np
 import os
+import time
+import zlib
+import json
+from concurrent.futures import ProcessPoolExecutor
 from prophet import Prophet
 import logging
+import model_store
+import batch_engine
+import regressor_projection
+import intervals
+import scheduler
+import feature_store
+import columnar
+import memory_budget
 
 logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
 logging.getLogger('prophet').setLevel(logging.WARNING)
 
-def run_forecaster_final():
-    print("ruchamiam AI Forecaster MULTI-TARGET (Wersja 'DIAMOND')...")
-    print("Konfiguracja: Przewidywanie Score + 4 Rankingów Strategicznych")
+# Liczba procesów trenujących modele równolegle (1 = tryb sekwencyjny, bez puli)
+N_WORKERS = os.cpu_count() or 1
 
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.dirname(SCRIPT_DIR) 
-    
-    INPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'MASTER_DATA.csv')
-    OUTPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'predictions.csv')
+# Cache wytrenowanych modeli (models/model_store); False = zawsze trenuj od zera
+USE_MODEL_CACHE = True
 
-    print(f"📂 Szukam pliku w: {INPUT_FILE}")
+# Limit czasu (s) na jeden trening Stana; przekroczenie = prognoza zastępcza (scheduler.fallback_forecast)
+FIT_BUDGET_S = 60
+
+# Silnik prognoz: 'prophet' (model per seria) lub 'numpy' (batch_engine, wszystkie serie naraz)
+ENGINE = 'prophet'
+
+TARGETS = [
+    'PKO_SCORE_FINAL', 
+    'Rank_Growth', 
+    'Rank_Slowdown', 
+    'Rank_Loan_Needs', 
+    'Rank_Trend_Signal'
+]
+
+REGRESSORS = ['WIBOR', 'Google_Trends', 'Energy_Price']
+
+TARGET_DATES = pd.date_range(start='2024-07-01', end='2026-06-30', freq='MS')
+
+PROPHET_PARAMS = {
+    'yearly_seasonality': True,
+    'weekly_seasonality': False,
+    'daily_seasonality': False,
+    'changepoint_prior_scale': 0.01,
+}
 
-    TARGETS = [
-        'PKO_SCORE_FINAL', 
-        'Rank_Growth', 
-        'Rank_Slowdown', 
-        'Rank_Loan_Needs', 
-        'Rank_Trend_Signal'
-    ]
+# Przedziały ufności per target (metody: intervals.METHODS). Do predictions.csv przedziały trafiają tylko
+# dla PKO_SCORE_FINAL (Confidence_Lower/Upper), więc pozostałe targety domyślnie nie płacą za próbkowanie w predict()
+INTERVALS = {
+    'PKO_SCORE_FINAL': {'method': 'sampled', 'samples': 1000},
+}
+DEFAULT_INTERVAL = {'method': 'none'}
+PROPHET_DEFAULT_SAMPLES = 1000  # domyślne uncertainty_samples w Prophet
 
-    REGRESSORS = ['WIBOR', 'Google_Trends', 'Energy_Price']
+# Konfiguracje per (branża, target) wybrane przez tuner.py (brak pliku = PROPHET_PARAMS dla wszystkich)
+TUNED_PARAMS_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tuned_params.json')
 
+
+def build_covid_lockdowns():
     covid_lockdowns = pd.DataFrame([
         {'holiday': 'lockdown_1', 'ds': '2020-03-01', 'lower_window': 0, 'upper_window': 2},
         {'holiday': 'lockdown_2', 'ds': '2020-10-01', 'lower_window': 0, 'upper_window': 3},
         {'holiday': 'lockdown_3', 'ds': '2021-03-01', 'lower_window': 0, 'upper_window': 1},
     ])
     covid_lockdowns['ds'] = pd.to_datetime(covid_lockdowns['ds'])
-    TARGET_DATES = pd.date_range(start='2024-07-01', end='2026-06-30', freq='MS')
+    return covid_lockdowns
 
-    if not os.path.exists(INPUT_FILE):
-        print(f"Błąd: Brak pliku {INPUT_FILE}")
-        return
 
-    df = pd.read_csv(INPUT_FILE)
-    df['Date'] = pd.to_datetime(df['Date'])
-    
-    print("Wygładzam dane historyczne (wszystkie wskaźniki)...")
-    df = df.sort_values(['PKD_Code', 'Date'])
+def load_tuned_params(path=TUNED_PARAMS_FILE):
+    """
+    Wczytuje konfiguracje zapisane przez tuner.py -> {pkd: {target: {'params': {...}, 'regressors': [...], 'cutoffs': [...]}}}.
+    Stary plik (jedna konfiguracja na branżę) obowiązuje tylko dla targetu, na którym był strojony.
+    """
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding='utf-8') as f:
+        tuned = json.load(f)
+    return {
+        pkd: {config.get('target', TARGETS[0]): config} if 'params' in config else config
+        for pkd, config in tuned.items()
+    }
 
-    cols_to_smooth = TARGETS + [r for r in REGRESSORS if r in df.columns]
-    
-    for col in cols_to_smooth:
-        if col in df.columns:
-            df[col] = df.groupby('PKD_Code')[col].transform(
-                lambda x: x.rolling(window=6, min_periods=1).mean()
-            )
 
-    df = df.groupby('PKD_Code').apply(lambda group: group.bfill().ffill()).reset_index(drop=True)
+def model_config(pkd, target_col, tuned, available_regressors):
+    """(hiperparametry, regresory) dla pary (branża, target): strojone przez tuner.py albo domyślne."""
+    config = tuned.get(str(pkd), {}).get(target_col)
+    if config is None:
+        return PROPHET_PARAMS, list(available_regressors)
+    params = dict(PROPHET_PARAMS, **config.get('params', {}))
+    regressors = [r for r in config.get('regressors', available_regressors) if r in available_regressors]
+    return params, regressors
 
-    unique_pkds = df['PKD_Code'].unique()
-    all_forecasts = []
 
-    print(f" Generuję prognozy dla {len(unique_pkds)} branż...")
+def prepare_data(input_file):
+    """Wygładzone (średnia krocząca 6M per branża) targety/regresory z magazynu cech obok MASTER_DATA."""
+    return feature_store.load_features(input_file, TARGETS + REGRESSORS)
 
-    for pkd in unique_pkds:
-        pkd_forecast_df = pd.DataFrame({'Date': TARGET_DATES})
-        pkd_forecast_df['PKD_Code'] = pkd
-        
-        train_df_base = df[df['PKD_Code'] == pkd].copy().sort_values('Date')
 
+def interval_config(target_col):
+    return INTERVALS.get(target_col, DEFAULT_INTERVAL)
+
+
+def predict_with_intervals(m, target_col, prophet_train, future):
+    """
+    m.predict() z przedziałami wg INTERVALS. Zwraca (prognoza dla future, lower, upper, czas predict w s).
+    'sampled' = symulacja Prophet, 'analytic'/'bootstrap' = z reszt na historii (jeden predict razem z future).
+    """
+    config = interval_config(target_col)
+    method = config.get('method', 'none')
+    m.uncertainty_samples = config.get('samples', PROPHET_DEFAULT_SAMPLES) if method == 'sampled' else 0
+
+    frame = future
+    if method in ('analytic', 'bootstrap'):
+        frame = pd.concat([prophet_train[future.columns], future], ignore_index=True)
+    n_history = len(frame) - len(future)
+
+    start = time.perf_counter()
+    forecast = m.predict(frame)
+    predict_time = time.perf_counter() - start
+
+    yhat = forecast['yhat'].values[n_history:]
+    if method == 'sampled':
+        return forecast.iloc[n_history:], forecast['yhat_lower'].values, forecast['yhat_upper'].values, predict_time
+    if n_history:
+        resid = prophet_train['y'].values - forecast['yhat'].values[:n_history]
+        lower, upper = intervals.residual_intervals(yhat[None], resid[None], config)
+        return forecast.iloc[n_history:], lower[0], upper[0], predict_time
+    return forecast, None, None, predict_time
+
+
+def build_model(regressors, params=PROPHET_PARAMS):
+    m = Prophet(holidays=build_covid_lockdowns(), **params)
+    for reg in regressors:
+        m.add_regressor(reg)
+    return m
+
+
+def fit_model(pkd, target_col, prophet_train, regressors, params=PROPHET_PARAMS, use_cache=USE_MODEL_CACHE,
+              budget=FIT_BUDGET_S):
+    """
+    Trenuje (lub wczytuje z cache) model dla danych w formacie Prophet. Zwraca (model, status).
+    budget: limit czasu Stana w s (cmdstanpy przerywa optymalizację i rzuca TimeoutError), None = bez limitu.
+    """
+    fit_kwargs = {'timeout': budget} if budget else {}
+    if not use_cache:
+        m = build_model(regressors, params)
+        m.fit(prophet_train, **fit_kwargs)
+        return m, 'fit'
+
+    key_params = dict(params, holidays=build_covid_lockdowns().to_dict('records'))
+    key = model_store.series_key(pkd, target_col, regressors, key_params)
+    return model_store.fit_cached(
+        lambda: build_model(regressors, params),
+        prophet_train[['ds', 'y'] + regressors],
+        key,
+        fit_kwargs=fit_kwargs
+    )
+
+
+def fit_target(pkd, target_col, train_df, params=PROPHET_PARAMS, regressors=None, future_regressors=None):
+    """
+    Trenuje model Prophet dla jednej pary (PKD, target).
+    Zwraca (pkd, target, kolumny prognozy, czas w s, status, czas predict w s).
+    future_regressors: ramka (Date, regresory) z projekcji dla TARGET_DATES; brak = ostatnia znana wartość.
+    """
+    start = time.perf_counter()
+
+    # Ziarno zależne tylko od (PKD, target) -> przedziały ufności identyczne niezależnie od liczby procesów
+    np.random.seed(zlib.crc32(f"{pkd}|{target_col}".encode('utf-8')))
+
+    prophet_train = train_df.rename(columns={'Date': 'ds', target_col: 'y'})
+    if regressors is None:
+        regressors = [reg for reg in REGRESSORS if reg in prophet_train.columns]
+
+    try:
+        m, status = fit_model(pkd, target_col, prophet_train, regressors, params)
+    except TimeoutError:
+        return pkd, target_col, None, time.perf_counter() - start, 'timeout', 0.0
+    except Exception:
+        return pkd, target_col, None, time.perf_counter() - start, 'error', 0.0
+
+    future = pd.DataFrame({'ds': TARGET_DATES})
+    if future_regressors is not None:
+        future = future.merge(
+            future_regressors[['Date'] + regressors].rename(columns={'Date': 'ds'}), on='ds', how='left'
+        )
+    else:
+        last_known_row = prophet_train.iloc[-1]
+        for reg in regressors:
+            future[reg] = last_known_row[reg]
+
+    forecast, lower, upper, predict_time = predict_with_intervals(m, target_col, prophet_train, future)
+    columns = forecast_columns(target_col, forecast['yhat'].values, lower, upper)
+
+    return pkd, target_col, columns, time.perf_counter() - start, status, predict_time
+
+
+def forecast_columns(target_col, yhat, yhat_lower, yhat_upper):
+    """Kolumny pliku predictions.csv dla jednego targetu (wspólne dla obu silników). Brak przedziałów = None."""
+    if target_col == 'PKO_SCORE_FINAL':
+        columns = {'Predicted_Score': np.clip(yhat, 0, 100).round(1)}
+        bounds = ('Confidence_Lower', 'Confidence_Upper')
+    else:
+        columns = {target_col + "_Predicted": np.clip(yhat, 0, 100).round(1)}
+        bounds = (target_col + "_Lower", target_col + "_Upper")
+
+    if yhat_lower is not None:
+        columns[bounds[0]] = np.clip(yhat_lower, 0, 100).round(1)
+        columns[bounds[1]] = np.clip(yhat_upper, 0, 100).round(1)
+    return columns
+
+
+def run_batch_engine(df, regressors, projection):
+    """Silnik 'numpy': wszystkie pary (PKD, target) jednym rozwiązaniem. Zwraca wyniki w formacie fit_target."""
+    start = time.perf_counter()
+
+    pkds = df['PKD_Code'].unique()
+    targets = [t for t in TARGETS if t in df.columns]
+    train_dates = pd.DatetimeIndex(np.sort(df['Date'].unique()))
+
+    y = batch_engine.panel(df, pkds, train_dates, targets)
+    x = batch_engine.panel(df, pkds, train_dates, regressors)
+
+    x_future = batch_engine.panel(projection, pkds, TARGET_DATES, regressors)
+
+    n_targets = len(targets)
+    y_series = y.transpose(0, 2, 1).reshape(len(pkds) * n_targets, len(train_dates))
+    state = batch_engine.fit(train_dates, y_series, np.repeat(x, n_targets, axis=0), holidays=build_covid_lockdowns())
+    yhat, lower, upper = batch_engine.predict(state, TARGET_DATES, np.repeat(x_future, n_targets, axis=0))
+
+    # 'analytic' i 'sampled' = przedziały z dźwigni ridge (już policzone), 'bootstrap' = z reszt, 'none' = bez
+    methods = {}
+    for k, target_col in enumerate(targets):
+        config = interval_config(target_col)
+        methods[target_col] = config.get('method', 'none')
+        if methods[target_col] == 'bootstrap':
+            rows = slice(k, None, n_targets)
+            lower[rows], upper[rows] = intervals.residual_intervals(yhat[rows], state['resid'][rows], config)
+
+    elapsed = (time.perf_counter() - start) / max(len(y_series), 1)
+    results = []
+    for i, pkd in enumerate(pkds):
+        for k, target_col in enumerate(targets):
+            s = i * n_targets + k
+            if np.isnan(yhat[s]).all():
+                results.append((pkd, target_col, None, elapsed, 'error', 0.0))
+                continue
+            bounds = (None, None) if methods[target_col] == 'none' else (lower[s], upper[s])
+            results.append((pkd, target_col, forecast_columns(target_col, yhat[s], *bounds), elapsed, 'numpy', 0.0))
+    return results
+
+
+def run_fit_jobs(jobs, n_workers, func=fit_target, order=None):
+    """
+    Wykonuje zadania (domyślnie fit_target) w puli procesów. Wyniki zwraca w kolejności zadań.
+    order: kolejność uruchamiania (indeksy zadań), np. scheduler.longest_first.
+    """
+    order = list(range(len(jobs))) if order is None else list(order)
+    results = [None] * len(jobs)
+
+    if n_workers <= 1:
+        for i in order:
+            results[i] = func(*jobs[i])
+        return results
+
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        futures = {i: executor.submit(func, *jobs[i]) for i in order}
+        for i, future in futures.items():
+            results[i] = future.result()
+    return results
+
+
+def prophet_jobs(df, regressors, projection):
+    """Zadania dla fit_target: po jednym na parę (PKD, target), z konfiguracją tej pary i projekcją regresorów branży."""
+    tuned = load_tuned_params()
+    if tuned:
+        print(f"   -> Strojone konfiguracje dla {len(tuned)} branż ({TUNED_PARAMS_FILE})")
+
+    future_by_pkd = dict(tuple(projection.groupby('PKD_Code', sort=False)))
+
+    # Każde zadanie dostaje tylko wycinek swojej branży i kolumny potrzebne do jednego modelu
+    jobs = []
+    for pkd, train_df_base in df.groupby('PKD_Code', sort=False):
+        train_df_base = train_df_base.sort_values('Date')
         for target_col in TARGETS:
             if target_col not in train_df_base.columns:
                 continue
+            params, pkd_regressors = model_config(pkd, target_col, tuned, regressors)
+            future_regressors = future_by_pkd[pkd][['Date'] + pkd_regressors]
+            jobs.append((
+                pkd, target_col, train_df_base[['Date', target_col] + pkd_regressors], params, pkd_regressors,
+                future_regressors
+            ))
+    return jobs
 
-            prophet_train = train_df_base.rename(columns={'Date': 'ds', target_col: 'y'})
 
-            m = Prophet(
-                yearly_seasonality=True,
-                weekly_seasonality=False,
-                daily_seasonality=False,
-                holidays=covid_lockdowns,
-                changepoint_prior_scale=0.01 
-            )
+def run_prophet_engine(df, regressors, projection, n_workers):
+    """Silnik 'prophet': jeden model na parę (PKD, target), trenowany w puli procesów."""
+    jobs = prophet_jobs(df, regressors, projection)
 
-            for reg in REGRESSORS:
-                if reg in prophet_train.columns:
-                    m.add_regressor(reg)
+    # Najdłuższe (wg poprzednich przebiegów) startują pierwsze - krótkie wypełniają końcówkę
+    timings = scheduler.load_timings()
+    keys = [scheduler.timing_key(job[0], job[1]) for job in jobs]
+    order = scheduler.longest_first(keys, timings)
+    if timings:
+        expected = scheduler.expected_times(keys, timings)
+        print(f"   -> Kolejność LPT wg {len(timings)} zapisanych czasów, szacowany czas bez cache: "
+              f"{scheduler.makespan(expected, n_workers):.1f}s (limit: {FIT_BUDGET_S}s/fit)")
 
-            try:
-                m.fit(prophet_train)
-            except Exception:
-                continue
+    run_start = time.perf_counter()
+    results = run_fit_jobs(jobs, n_workers, order=order)
+    wall_time = time.perf_counter() - run_start
+
+    scheduler.save_timings(results, timings, FIT_BUDGET_S)
+    return results, wall_time
+
+
+def apply_fallbacks(df, results):
+    """
+    Serie bez prognozy (przekroczony budżet, błąd treningu) dostają prognozę zastępczą, liczoną wektorowo naraz.
+    Zwraca (wyniki, raport: lista (pkd, target, powód, metoda, czas)).
+    """
+    failed = [i for i, r in enumerate(results) if r[2] is None]
+    if not failed:
+        return results, []
+
+    train_dates = pd.DatetimeIndex(np.sort(df['Date'].unique()))
+    pkds = list(dict.fromkeys(results[i][0] for i in failed))
+    targets = list(dict.fromkeys(results[i][1] for i in failed))
+    panel = batch_engine.panel(df, pkds, train_dates, targets)
+    y = np.array([panel[pkds.index(results[i][0]), :, targets.index(results[i][1])] for i in failed])
+
+    yhat, resid, methods = scheduler.fallback_forecast(y, train_dates[-1], TARGET_DATES)
+
+    results = list(results)
+    report = []
+    for row, i in enumerate(failed):
+        pkd, target_col, _, elapsed, reason, predict_time = results[i]
+        # 'sampled' wymaga modelu Prophet - zastępczo przedział analityczny z reszt
+        config = interval_config(target_col)
+        if config.get('method') == 'sampled':
+            config = dict(config, method='analytic')
+        lower, upper = intervals.residual_intervals(yhat[row][None], resid[row][None], config)
+        bounds = (None, None) if lower is None else (lower[0], upper[0])
+        columns = forecast_columns(target_col, yhat[row], *bounds)
+        results[i] = (pkd, target_col, columns, elapsed, 'fallback', predict_time)
+        report.append((pkd, target_col, reason, methods[row], elapsed))
+    return results, report
+
+
+def print_predict_report(results):
+    """Czas predict() wg metody przedziałów i szacowana oszczędność względem próbkowania wszystkich targetów."""
+    default_samples = PROPHET_DEFAULT_SAMPLES
+    by_samples = {}
+    for _, target_col, columns, _, _, predict_time in results:
+        if columns is None:
+            continue
+        config = interval_config(target_col)
+        samples = config.get('samples', default_samples) if config.get('method') == 'sampled' else 0
+        by_samples.setdefault(samples, []).append(predict_time)
+
+    total = sum(sum(times) for times in by_samples.values())
+    print(f"Predict: {total:.2f}s łącznie | " + ", ".join(
+        f"{'bez próbkowania' if s == 0 else f'{s} próbek'}: {len(t)} serii, śr. {np.mean(t) * 1000:.0f} ms"
+        for s, t in sorted(by_samples.items())
+    ))
+
+    # Koszt jednej próbki szacowany z różnicy średnich czasów serii z próbkowaniem i bez
+    sampled = [(s, np.mean(t)) for s, t in by_samples.items() if s > 0]
+    if 0 not in by_samples or not sampled:
+        return
+    base = np.mean(by_samples[0])
+    per_sample = np.mean([max(t - base, 0.0) / s for s, t in sampled])
+    saved = sum((default_samples - s) * per_sample * len(t) for s, t in by_samples.items() if s < default_samples)
+    print(f"   -> Oszczędność względem {default_samples} próbek dla wszystkich targetów: ~{saved:.2f}s "
+          f"({saved / max(total + saved, 1e-9) * 100:.0f}% czasu predict)")
+
+
+def run_forecaster_final(n_workers=N_WORKERS, engine=ENGINE):
+    print("ruchamiam AI Forecaster MULTI-TARGET (Wersja 'DIAMOND')...")
+    print("Konfiguracja: Przewidywanie Score + 4 Rankingów Strategicznych")
+
+    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+    PROJECT_ROOT = os.path.dirname(SCRIPT_DIR) 
+    
+    INPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'MASTER_DATA.csv')
+    OUTPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'predictions.csv')
+    FALLBACK_REPORT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'forecast_fallbacks.csv')
+
+    print(f"📂 Szukam pliku w: {INPUT_FILE}")
+
+    if not os.path.exists(INPUT_FILE):
+        print(f"Błąd: Brak pliku {INPUT_FILE}")
+        return
+
+    with memory_budget.stage('cechy'):
+        df = prepare_data(INPUT_FILE)
+
+    unique_pkds = df['PKD_Code'].unique()
+    regressors = [r for r in REGRESSORS if r in df.columns]
+
+    # Regresory na okres prognozy liczone raz (wspólne dla wszystkich branż i targetów)
+    projection_start = time.perf_counter()
+    projection, from_cache = regressor_projection.load_or_project(df, TARGET_DATES, regressors)
+    print(f"📈 Projekcja regresorów {regressors}: {time.perf_counter() - projection_start:.2f}s"
+          f"{' (cache)' if from_cache else ''}")
+
+    with memory_budget.stage('prognozy'):
+        if engine == 'numpy':
+            print(f" Generuję prognozy dla {len(unique_pkds)} branż (silnik: numpy)...")
+            run_start = time.perf_counter()
+            results = run_batch_engine(df, regressors, projection)
+            wall_time = time.perf_counter() - run_start
+        else:
+            print(f" Generuję prognozy dla {len(unique_pkds)} branż (procesy: {n_workers})...")
+            results, wall_time = run_prophet_engine(df, regressors, projection, n_workers)
+
+    results, fallback_report = apply_fallbacks(df, results)
+
+    forecasts_by_pkd = {}
+    for pkd, target_col, columns, elapsed, status, _ in results:
+        if engine != 'numpy' or columns is None:
+            print(f"   ⏱️ {pkd} / {target_col}: {elapsed:.2f}s [{status}]")
+        if columns is None:
+            continue
+        if pkd not in forecasts_by_pkd:
+            forecasts_by_pkd[pkd] = pd.DataFrame({'Date': TARGET_DATES})
+            forecasts_by_pkd[pkd]['PKD_Code'] = pkd
+        for name, values in columns.items():
+            forecasts_by_pkd[pkd][name] = values
+
+    if engine == 'numpy':
+        print(f"Czas: {wall_time:.2f}s ({len(results)} serii, silnik numpy)")
+    else:
+        fit_time = sum(r[3] for r in results)
+        print(f"Czas: {wall_time:.1f}s (suma czasów modeli: {fit_time:.1f}s, przyspieszenie x{fit_time / max(wall_time, 1e-9):.1f})")
+
+    if engine != 'numpy':
+        print_predict_report(results)
+
+    if engine != 'numpy' and USE_MODEL_CACHE:
+        statuses = [r[4] for r in results]
+        print(f"Cache modeli: {statuses.count('hit')} trafień, {statuses.count('warm')} douczonych, {statuses.count('fit')} od zera")
+        removed = model_store.evict()
+        if removed:
+            print(f"🧹 Usunięto {removed} starych modeli z cache")
+
+    if fallback_report:
+        print(f"\n⚠️ Prognozy zastępcze: {len(fallback_report)} serii")
+        print(f"{'PKD':<6} | {'TARGET':<18} | {'POWÓD':<8} | {'METODA':<15} | CZAS")
+        for pkd, target_col, reason, method, elapsed in fallback_report:
+            print(f"{str(pkd):<6} | {target_col:<18} | {reason:<8} | {method:<15} | {elapsed:.1f}s")
+        pd.DataFrame(fallback_report, columns=['PKD_Code', 'Target', 'Reason', 'Fallback', 'Elapsed_s']).to_csv(
+            FALLBACK_REPORT_FILE, index=False
+        )
+        print(f"   -> Raport: {FALLBACK_REPORT_FILE}")
+    elif os.path.exists(FALLBACK_REPORT_FILE):
+        os.remove(FALLBACK_REPORT_FILE)
 
-            future = pd.DataFrame({'ds': TARGET_DATES})
-            last_known_row = prophet_train.iloc[-1]
-            for reg in REGRESSORS:
-                if reg in prophet_train.columns:
-                    future[reg] = last_known_row[reg]
-
-            forecast = m.predict(future)
-            
-            suffix = "_Predicted"
-            
-            if target_col == 'PKO_SCORE_FINAL':
-                pkd_forecast_df['Predicted_Score'] = forecast['yhat'].clip(0, 100).round(1).values
-                pkd_forecast_df['Confidence_Lower'] = forecast['yhat_lower'].clip(0, 100).round(1).values
-                pkd_forecast_df['Confidence_Upper'] = forecast['yhat_upper'].clip(0, 100).round(1).values
-            else:
-                clean_name = target_col + suffix
-                pkd_forecast_df[clean_name] = forecast['yhat'].clip(0, 100).round(1).values
-
-        all_forecasts.append(pkd_forecast_df)
+    all_forecasts = [forecasts_by_pkd[pkd] for pkd in unique_pkds if pkd in forecasts_by_pkd]
 
     if all_forecasts:
         final_df = pd.concat(all_forecasts, ignore_index=True)
@@ -133,7 +487,9 @@ def run_forecaster_final():
         
         final_df = final_df[cols_to_save + remaining]
         
-        final_df.to_csv(OUTPUT_FILE, index=False)
+        with memory_budget.stage('zapis'):
+            final_df.to_csv(OUTPUT_FILE, index=False)
+            columnar.write_columnar(final_df, OUTPUT_FILE)
         
         print("\n" + "="*50)
         print(f"SUKCES! Plik wynikowy: {OUTPUT_FILE}")
@@ -144,4 +500,5 @@ def run_forecaster_final():
         print(" Nie udało się wygenerować prognoz.")
 
 if __name__ == "__main__":
+    memory_budget.configure()
     run_forecaster_final()
\ No newline at end of file
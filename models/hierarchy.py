@@ -0,0 +1,197 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+from regressor_projection import damped_trend_forecast
+from industries import SECTION_OF_DIVISION
+
+# Prognozy hierarchiczne: Total -> sekcja PKD -> dział (2 cyfry) -> klasa (4 cyfry).
+# Prognozy bazowe liczone jednym wektorowym przebiegiem dla wszystkich węzłów wszystkich poziomów
+# (albo tylko dla jednego poziomu: top-down / middle-out), potem uzgadniane macierzą sumującą S,
+# tak żeby dzieci sumowały się do rodziców. Dane: upadłości z KRZ (roczne, per podklasa PKD).
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+
+INPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'krz_pkd.csv')
+OUTPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'predictions_hierarchy.csv')
+
+HORIZON = 2  # lata prognozy
+
+LEVELS = ['Total', 'Section', 'Division', 'Class']
+
+# Metody: 'mint_shrink', 'wls_struct', 'ols' (uzgadnianie wszystkich poziomów), 'bottom_up',
+# 'top_down' (model tylko dla Total), 'middle_out' (modele tylko dla działów)
+METHOD = 'mint_shrink'
+MIDDLE_LEVEL = 'Division'
+
+# Szacowany koszt jednego modelu Prophet (s) - do porównania w raporcie
+PROPHET_FIT_S = 0.3
+
+
+def build_hierarchy(leaf_codes):
+    """
+    Kody klas (4 cyfry) -> (węzły, S). węzły: ramka (Level, Node) w kolejności wierszy S,
+    S: macierz sumująca (węzły x liście, liście posortowane), wiersz = które liście składają się na węzeł.
+    """
+    leaves = pd.DataFrame({'Class': np.sort(pd.Index(leaf_codes).astype(str).unique())})
+    leaves['Division'] = leaves['Class'].str[:2]
+    leaves['Section'] = leaves['Division'].map(SECTION_OF_DIVISION)
+    leaves['Total'] = 'Total'
+
+    blocks, labels = [], []
+    for level in LEVELS:
+        codes, inverse = np.unique(leaves[level].to_numpy(), return_inverse=True)
+        # Wiersz węzła = indykator jego liści (kolumny np.eye wybrane odwrotnym indeksem)
+        blocks.append(np.eye(len(codes))[:, inverse])
+        labels.append(pd.DataFrame({'Level': level, 'Node': codes}))
+    return pd.concat(labels, ignore_index=True), np.vstack(blocks)
+
+
+def shrink_covariance(resid):
+    """Kowariancja reszt (węzły x czas, NaN = brak) ściągana do diagonali (Schäfer-Strimmer, jak MinT-shrink)."""
+    e = np.nan_to_num(resid)
+    n = max(int((~np.isnan(resid)).sum(axis=1).max()), 2)
+    cov = e @ e.T / n
+    sd = np.sqrt(np.maximum(np.diag(cov), 1e-12))
+
+    xs = e / sd[:, None]
+    corr = xs @ xs.T / n
+    v = ((xs ** 2) @ (xs ** 2).T - (xs @ xs.T) ** 2 / n) / (n * (n - 1))
+    np.fill_diagonal(v, 0.0)
+    d = corr ** 2
+    np.fill_diagonal(d, 0.0)
+    lam = float(np.clip(v.sum() / max(d.sum(), 1e-12), 0.0, 1.0))
+
+    shrunk = (1 - lam) * cov
+    # Seria bez zmienności (np. same zera) nie może wyzerować diagonali - W musi być odwracalna
+    shrunk[np.diag_indices_from(shrunk)] = np.maximum(np.diag(cov), 1e-6)
+    return shrunk, lam
+
+
+def reconciliation_matrix(S, method, resid=None):
+    """Macierz P (liście x węzły): liście = P @ prognozy_bazowe, spójne prognozy = S @ P @ prognozy_bazowe."""
+    if method == 'ols':
+        return np.linalg.solve(S.T @ S, S.T), None
+    if method == 'wls_struct':
+        w_inv = 1.0 / S.sum(axis=1)
+    elif method == 'mint_shrink':
+        W, lam = shrink_covariance(resid)
+        W_inv_S = np.linalg.solve(W, S)
+        return np.linalg.solve(S.T @ W_inv_S, W_inv_S.T), lam
+    else:
+        raise ValueError(f"Nieznana metoda uzgadniania: {method}")
+    return np.linalg.solve(S.T @ (S * w_inv[:, None]), S.T * w_inv[None, :]), None
+
+
+def disaggregate(S, nodes, y_leaves, level, level_forecast):
+    """
+    Top-down / middle-out: prognozy węzłów poziomu 'level' rozdzielane na liście wg średnich
+    historycznych udziałów liścia w węźle (Gross-Sohl A). Zwraca prognozy liści (L, H).
+    """
+    rows = np.flatnonzero(nodes['Level'].to_numpy() == level)
+    parent = S[rows].argmax(axis=0)  # węzeł poziomu 'level', do którego należy każdy liść
+    parent_hist = S[rows] @ y_leaves
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        shares = np.nanmean(np.where(parent_hist[parent] > 0, y_leaves / parent_hist[parent], np.nan), axis=1)
+    # Węzeł bez historii -> równy podział między jego liście
+    n_children = S[rows].sum(axis=1)[parent]
+    shares = np.where(np.isnan(shares), 1.0 / n_children, shares)
+    shares = shares / (S[rows] @ shares)[parent]
+    return shares[:, None] * level_forecast[parent]
+
+
+def forecast_hierarchy(y_leaves, S, nodes, method=METHOD, horizon=HORIZON, middle_level=MIDDLE_LEVEL):
+    """
+    y_leaves: (L, T) - historia liści. Zwraca (prognozy bazowe węzłów (N, H) albo NaN dla nieliczonych,
+    spójne prognozy węzłów (N, H), liczba modeli, lambda shrinkage).
+    """
+    n_nodes = len(nodes)
+    y_nodes = S @ y_leaves
+    base = np.full((n_nodes, horizon), np.nan)
+    lam = None
+
+    if method in ('top_down', 'middle_out', 'bottom_up'):
+        level = {'top_down': 'Total', 'middle_out': middle_level, 'bottom_up': 'Class'}[method]
+        rows = np.flatnonzero(nodes['Level'].to_numpy() == level)
+        base[rows] = damped_trend_forecast(y_nodes[rows], horizon)
+        leaves = base[rows] if level == 'Class' else disaggregate(S, nodes, y_leaves, level, base[rows])
+        n_models = len(rows)
+    else:
+        base, resid = damped_trend_forecast(y_nodes, horizon, return_residuals=True)
+        P, lam = reconciliation_matrix(S, method, resid)
+        leaves = P @ base
+        n_models = n_nodes
+
+    # Liczby upadłości nie mogą być ujemne: zerujemy liście i agregujemy w górę (zachowuje spójność)
+    coherent = S @ np.maximum(leaves, 0.0)
+    return base, coherent, n_models, lam
+
+
+def load_bankruptcies(path=INPUT_FILE):
+    """KRZ (rok;pkd;liczba_upadlosci, podklasy PKD) -> panel klas 4-cyfrowych (klasy x lata), brak = 0."""
+    df = pd.read_csv(path, sep=';', dtype={'pkd': str})
+    df.columns = [c.lower().strip() for c in df.columns]
+    df['Class'] = df['pkd'].str.strip().str[:4]
+
+    valid = df['Class'].str.fullmatch(r'\d{4}') & df['Class'].str[:2].map(SECTION_OF_DIVISION).notna()
+    if (~valid).any():
+        print(f"   ⚠️ Pomijam {int((~valid).sum())} wierszy z niepoprawnym kodem PKD")
+    df = df[valid]
+
+    panel = df.pivot_table(index='Class', columns='rok', values='liczba_upadlosci', aggfunc='sum', fill_value=0)
+    return panel.sort_index().astype(float)
+
+
+def run_hierarchy(method=METHOD, horizon=HORIZON, input_file=INPUT_FILE, output_file=OUTPUT_FILE):
+    print(f"🌳 Prognoza hierarchiczna PKD (sekcja -> dział -> klasa), metoda: {method}...")
+
+    if not os.path.exists(input_file):
+        print(f"❌ Brak pliku {input_file}")
+        return None
+
+    start = time.perf_counter()
+    panel = load_bankruptcies(input_file)
+    nodes, S = build_hierarchy(panel.index)
+    years = panel.columns.astype(int)
+    future_years = np.arange(years.max() + 1, years.max() + 1 + horizon)
+
+    counts = nodes['Level'].value_counts()
+    print(f"   -> Węzły: {len(nodes)} ({', '.join(f'{lvl}: {counts[lvl]}' for lvl in LEVELS)}), lata {years.min()}-{years.max()}")
+
+    base, coherent, n_models, lam = forecast_hierarchy(panel.to_numpy(), S, nodes, method, horizon)
+    elapsed = time.perf_counter() - start
+
+    history = S @ panel.to_numpy()
+    result = pd.DataFrame({
+        'Year': np.tile(future_years, len(nodes)),
+        'Level': np.repeat(nodes['Level'].to_numpy(), horizon),
+        'Node': np.repeat(nodes['Node'].to_numpy(), horizon),
+        'Last_Actual': np.repeat(history[:, -1], horizon),
+        'Base_Forecast': base.ravel().round(1),
+        'Forecast': coherent.ravel().round(1),
+    })
+    result.to_csv(output_file, index=False)
+
+    # Spójność bazowych prognoz: o ile suma dzieci odbiega od rodzica (tylko przy modelach na wszystkich poziomach)
+    if not np.isnan(base).any():
+        incoherence = np.abs(S @ np.maximum(base[-S.shape[1]:], 0) - base).max()
+        print(f"   -> Niespójność prognoz bazowych (max |suma liści - węzeł|): {incoherence:.1f}")
+    if lam is not None:
+        print(f"   -> Shrinkage kowariancji reszt: lambda = {lam:.3f}")
+
+    print(f"   -> Modele: {n_models} (wektorowo), czas: {elapsed:.2f}s "
+          f"vs ~{len(nodes) * PROPHET_FIT_S:.0f}s przy osobnym Prophecie dla każdego węzła")
+
+    total = result[result['Level'] == 'Total']
+    print(f"\n{'ROK':<6} | {'TOTAL (spójny)':<15} | TOTAL (bazowy)")
+    for row in total.itertuples():
+        print(f"{row.Year:<6} | {row.Forecast:<15.1f} | {row.Base_Forecast:.1f}")
+
+    print(f"\n✅ Zapisano: {output_file} ({len(result)} wierszy)")
+    return result
+
+
+if __name__ == "__main__":
+    run_hierarchy()
@@ -0,0 +1,155 @@
+import pandas as pd
+import numpy as np
+import os
+
+# Hierarchia PKD 2007 (sekcja -> dział -> grupa -> klasa) i lista branż z konfiguracji (industries.yaml).
+# Dane źródłowe zostają z pełnym kodem; agregaty wszystkich poziomów liczone są jednym grupowaniem
+# po kodach i tanim zwijaniem już zagregowanej (małej) tabeli w górę hierarchii.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+INDUSTRIES_FILE = os.path.join(SCRIPT_DIR, 'industries.yaml')
+
+# Poziomy od najogólniejszego; liczba cyfr kodu na poziomie (sekcja = litera z zakresu działów)
+LEVELS = ['section', 'division', 'group', 'class']
+LEVEL_DIGITS = {'section': 2, 'division': 2, 'group': 3, 'class': 4}
+
+# Sekcje PKD 2007: litera -> zakres działów (włącznie)
+SECTION_RANGES = {
+    'A': (1, 3), 'B': (5, 9), 'C': (10, 33), 'D': (35, 35), 'E': (36, 39), 'F': (41, 43), 'G': (45, 47),
+    'H': (49, 53), 'I': (55, 56), 'J': (58, 63), 'K': (64, 66), 'L': (68, 68), 'M': (69, 75), 'N': (77, 82),
+    'O': (84, 84), 'P': (85, 85), 'Q': (86, 88), 'R': (90, 93), 'S': (94, 96), 'T': (97, 98), 'U': (99, 99),
+}
+SECTION_OF_DIVISION = {
+    f'{division:02d}': section
+    for section, (first, last) in SECTION_RANGES.items()
+    for division in range(first, last + 1)
+}
+DIVISIONS = list(SECTION_OF_DIVISION)
+
+
+def load_key_industries(path=INDUSTRIES_FILE):
+    """Lista kodów z konfiguracji ([] = cała gospodarka)."""
+    import yaml  # tylko dla pliku konfiguracji
+    with open(path, encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+    return [str(code).strip() for code in config.get('key_industries') or []]
+
+
+KEY_INDUSTRIES = load_key_industries()
+
+
+def pkd_digits(codes):
+    """Kody w dowolnym zapisie ('01.11.Z', '0111Z', '01') -> same cyfry, najwyżej 4 (klasa)."""
+    return pd.Series(codes).astype(str).str.replace(r'\D', '', regex=True).str[:4]
+
+
+def level_code(digits, level):
+    """Cyfry kodu -> kod na poziomie ('C', '10', '10.1', '10.11'); NaN, gdy kod jest płytszy niż poziom."""
+    digits = pd.Series(digits)
+    deep_enough = digits.str.len() >= LEVEL_DIGITS[level]
+    if level == 'section':
+        code = digits.str[:2].map(SECTION_OF_DIVISION)
+    elif level == 'division':
+        code = digits.str[:2]
+    elif level == 'group':
+        code = digits.str[:2] + '.' + digits.str[2:3]
+    else:
+        code = digits.str[:2] + '.' + digits.str[2:4]
+    return code.where(deep_enough)
+
+
+def level_of(code):
+    """Poziom kodu w zapisie z level_code."""
+    code = str(code)
+    if code.isalpha():
+        return 'section'
+    return {2: 'division', 3: 'group', 4: 'class'}.get(len(code.replace('.', '')))
+
+
+def divisions_in_scope(whitelist=KEY_INDUSTRIES):
+    """Działy, w których leżą kody z listy (do filtrowania przy odczycie); None = wszystkie."""
+    if not whitelist:
+        return None
+    divisions = set()
+    for code in whitelist:
+        if level_of(code) == 'section':
+            divisions.update(d for d, s in SECTION_OF_DIVISION.items() if s == code)
+        else:
+            divisions.add(code.replace('.', '')[:2])
+    return sorted(divisions)
+
+
+def is_key(code, whitelist=KEY_INDUSTRIES):
+    """Kod (dowolny poziom) należy do branży z listy albo do jej podpoziomu."""
+    if not whitelist:
+        return True
+    code = str(code).strip()
+    digits = ''.join(c for c in code if c.isdigit())[:4]
+    if len(digits) < 2:
+        return code in whitelist
+    ancestors = {SECTION_OF_DIVISION.get(digits[:2]), digits[:2], f'{digits[:2]}.{digits[2:3]}', f'{digits[:2]}.{digits[2:4]}'}
+    return not ancestors.isdisjoint(whitelist)
+
+
+def in_scope(codes, level, whitelist=KEY_INDUSTRIES):
+    """Maska kodów poziomu level, które są na liście branż albo leżą pod kodem z listy (wektorowo is_key)."""
+    codes = pd.Series(codes)
+    if not whitelist:
+        return pd.Series(True, index=codes.index)
+    mask = codes.isin(whitelist)
+    if level != 'section':
+        digits = codes.str.replace('.', '', regex=False)
+        for upper in LEVELS[:LEVELS.index(level)]:
+            mask |= level_code(digits, upper).isin(whitelist)
+    return mask
+
+
+def rollup(df, code_col, keys, value_cols, whitelist=KEY_INDUSTRIES, events=False):
+    """
+    Agregaty wszystkich poziomów PKD: jedno grupowanie surowych wierszy po (keys, kod), potem zwijanie
+    tej (małej) tabeli w górę hierarchii. Zwraca keys + [PKD_Level, PKD_Code] + value_cols.
+    events=False (opublikowane wartości, np. GUS): węzeł = wartość podana dla tego kodu, a gdy jej brak
+    (osobno dla każdego klucza i kolumny) - suma dzieci. events=True (zdarzenia, np. postępowania KRZ):
+    każdy wiersz liczony na każdym poziomie, do którego sięga jego kod ('10' -> dział 10 i sekcja C).
+    Z listą branż: tylko kody z listy i ich podpoziomy.
+    """
+    total = (lambda frame: frame.sum()) if events else (lambda frame: frame.sum(min_count=1))
+
+    # Jedno przejście po surowych wierszach: numer kodu zamiast tekstu, cyfry liczone dla unikalnych kodów
+    code_ids, uniques = pd.factorize(df[code_col])
+    digits = pkd_digits(uniques)
+    known = np.append(digits.str.len().ge(2).to_numpy(), False)[code_ids]  # id -1 (brak kodu) -> pomijany
+    rows = df.loc[known, value_cols]
+    base = total(rows.groupby([df.loc[known, k] for k in keys] + [pd.Series(code_ids[known], index=rows.index, name='Code_Id')]))
+
+    # Ten sam kod w różnym zapisie ('01.11.Z', '0111Z') -> jeden wiersz
+    base = base.reset_index()
+    base['Digits'] = digits.to_numpy()[base.pop('Code_Id').to_numpy()]
+    base = total(base.groupby(keys + ['Digits'])[value_cols]).reset_index()
+    depth = base['Digits'].str.len()
+
+    def by_code(frame, codes):
+        return total(frame[value_cols].groupby([frame[k] for k in keys] + [codes.rename('PKD_Code')]))
+
+    parts, children = [], None
+    for level in reversed(LEVELS):
+        code = level_code(base['Digits'], level)
+        if events:
+            rows = code.notna()
+            table = by_code(base[rows], code[rows])
+        else:
+            # Wartość podana dla kodu tego poziomu; brakujące komórki z sumy dzieci (poziom niżej)
+            rows = code.notna() & (depth == LEVEL_DIGITS[level]) if level != 'section' else pd.Series(False, index=base.index)
+            table = by_code(base[rows], code[rows])
+            if children is not None:
+                child = children.reset_index()
+                parent = level_code(child['PKD_Code'].str.replace('.', '', regex=False), level)
+                table = table.combine_first(by_code(child, parent))
+        children = table
+        table = table.reset_index()
+        parts.append(table[in_scope(table['PKD_Code'], level, whitelist).to_numpy()].assign(PKD_Level=level))
+
+    result = pd.concat(parts[::-1], ignore_index=True)
+    if not events:
+        result[value_cols] = result[value_cols].fillna(0.0)  # komórka bez wartości na żadnym poziomie -> 0 (jak suma)
+    return result[keys + ['PKD_Level', 'PKD_Code'] + value_cols]
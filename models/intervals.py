@@ -0,0 +1,52 @@
+import numpy as np
+from statistics import NormalDist
+
+# Przedziały ufności liczone z reszt dopasowania (in-sample), wspólne dla wszystkich silników.
+# Wszystkie serie naraz: reszty (S, T) z NaN tam, gdzie brak obserwacji, prognoza (S, H).
+# Przedziały są płaskie w horyzoncie - nie uwzględniają niepewności trendu (tę daje tylko 'sampled' w Prophecie).
+
+INTERVAL_WIDTH = 0.8
+BOOTSTRAP_SAMPLES = 500
+BOOTSTRAP_SEED = 42
+
+# Metody: 'none' (bez przedziałów), 'analytic' (rozkład normalny reszt; w silniku numpy - z dźwigni ridge),
+# 'bootstrap' (percentyle losowanych reszt), 'sampled' (symulacja Prophet, 'samples' próbek;
+# silnik numpy nie ma symulacji i liczy wtedy 'analytic')
+METHODS = ['none', 'analytic', 'bootstrap', 'sampled']
+
+
+def analytic(yhat, resid, interval_width=INTERVAL_WIDTH):
+    """yhat +- z * odchylenie standardowe reszt serii."""
+    z = NormalDist().inv_cdf(0.5 + interval_width / 2)
+    half_width = z * np.nanstd(resid, axis=1, ddof=1)[:, None]
+    return yhat - half_width, yhat + half_width
+
+
+def bootstrap(yhat, resid, n_samples=BOOTSTRAP_SAMPLES, interval_width=INTERVAL_WIDTH, seed=BOOTSTRAP_SEED):
+    """
+    Bootstrap reszt: yhat + percentyle n_samples reszt losowanych ze zwracaniem, osobno dla każdego kroku horyzontu.
+    Te same liczby losowe dla każdej serii -> wynik serii nie zależy od składu batcha ani liczby procesów.
+    """
+    n_series, horizon = yhat.shape
+    ordered = np.sort(resid, axis=1)  # NaN na końcu
+    n_valid = (~np.isnan(resid)).sum(axis=1)
+
+    u = np.random.default_rng(seed).random((n_samples, horizon))
+    idx = (u[None] * np.maximum(n_valid, 1)[:, None, None]).astype(int)
+    draws = np.take_along_axis(ordered, idx.reshape(n_series, -1), axis=1).reshape(n_series, n_samples, horizon)
+
+    q = [(1 - interval_width) / 2, (1 + interval_width) / 2]
+    low, high = np.quantile(draws, q, axis=1)
+    low[n_valid < 2] = np.nan
+    high[n_valid < 2] = np.nan
+    return yhat + low, yhat + high
+
+
+def residual_intervals(yhat, resid, config, interval_width=INTERVAL_WIDTH):
+    """Przedziały wg konfiguracji {'method', 'samples'} dla metod opartych na resztach. 'none' -> (None, None)."""
+    method = config.get('method', 'none')
+    if method == 'analytic':
+        return analytic(yhat, resid, interval_width)
+    if method == 'bootstrap':
+        return bootstrap(yhat, resid, config.get('samples', BOOTSTRAP_SAMPLES), interval_width)
+    return None, None
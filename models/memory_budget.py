@@ -0,0 +1,88 @@
+import pandas as pd
+import os
+import sys
+import time
+from contextlib import contextmanager
+import columnar
+
+# Tryb oszczędzania pamięci (pełne PKD 4-cyfrowe na małym kontenerze bez swapowania): --lean albo LEAN_MODE=1,
+# włączany jawnie przez configure() w punkcie wejścia skryptu (sam import modułu niczego nie zmienia).
+# - PKD_Code jako kategoria, liczby zmniejszane (float32 gdy błąd pomijalny, int do najmniejszego typu)
+# - copy-on-write w pandas: wycinki i podramki bez kopii, kopiowane dopiero przy zapisie
+# - etapy liczone partiami branż (by_partition), gdy wynik branży nie zależy od innych
+# - szczytowe RSS raportowane po każdym etapie (stage)
+# Bez trybu lean wszystko działa jak dotąd (te same typy i wyniki).
+
+try:
+    import resource  # brak na Windows
+except ImportError:
+    resource = None
+
+LEAN_MODE = False
+
+# Branże w jednej partii przetwarzania (tryb lean)
+PARTITION_CODES = 200
+
+
+def configure(argv=None):
+    """Punkt wejścia skryptu: tryb lean z --lean albo LEAN_MODE=1 (wtedy też copy-on-write w pandas)."""
+    global LEAN_MODE
+    LEAN_MODE = '--lean' in (sys.argv if argv is None else argv) or os.environ.get('LEAN_MODE') == '1'
+    if LEAN_MODE:
+        pd.set_option('mode.copy_on_write', True)
+    return LEAN_MODE
+
+
+def peak_rss_mb():
+    """Szczytowe RSS procesu w MB (None, gdy system go nie udostępnia)."""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux: KB, macOS: bajty
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+
+@contextmanager
+def stage(name, report=None):
+    """Czas i szczytowe RSS etapu potoku (domyślnie wypisywane tylko w trybie lean)."""
+    start, before = time.perf_counter(), peak_rss_mb()
+    failed = True
+    try:
+        yield
+        failed = False
+    finally:
+        if LEAN_MODE if report is None else report:
+            status = ' (błąd)' if failed else ''
+            peak = peak_rss_mb()
+            if peak is None:
+                print(f"   📏 [{name}]{status} {time.perf_counter() - start:.2f}s (RSS niedostępne)")
+            else:
+                print(f"   📏 [{name}]{status} {time.perf_counter() - start:.2f}s, szczyt RSS {peak:.0f} MB (+{peak - before:.0f} MB)")
+
+
+def compact(df, lean=None, categorical=True):
+    """
+    Tryb lean: PKD_Code -> kategoria, float64 -> float32 (błąd <= columnar.FLOAT32_MAX_ERROR), int -> najmniejszy typ.
+    categorical=False -> PKD_Code zostaje tekstem (etapy, które kluczują po nim słowniki i pivoty).
+    """
+    if not (LEAN_MODE if lean is None else lean):
+        return df
+    if categorical and 'PKD_Code' in df.columns and not isinstance(df['PKD_Code'].dtype, pd.CategoricalDtype):
+        df['PKD_Code'] = df['PKD_Code'].astype(str).astype('category')
+    for col in columnar.float32_columns(df):
+        df[col] = df[col].astype('float32')
+    for col in df.select_dtypes(include='integer').columns:
+        df[col] = pd.to_numeric(df[col], downcast='integer')
+    return df
+
+
+def by_partition(df, func, lean=None, n_codes=PARTITION_CODES):
+    """
+    func(df) liczone partiami po n_codes branż (tryb lean) - szczyt pamięci pośrednich tablic
+    rośnie z rozmiarem partii, nie całego zbioru. Tylko dla etapów, w których branże są niezależne.
+    """
+    codes = df['PKD_Code'].unique()
+    if not (LEAN_MODE if lean is None else lean) or len(codes) <= n_codes:
+        return func(df)
+    parts = [func(df[df['PKD_Code'].isin(codes[i:i + n_codes])]) for i in range(0, len(codes), n_codes)]
+    return pd.concat(parts, ignore_index=True)
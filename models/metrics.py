@@ -0,0 +1,95 @@
+import pandas as pd
+import numpy as np
+
+# Silnik metryk backtestu: tablice (fold, seria, horyzont) z NaN = brak obserwacji.
+# Wszystkie 8 metryk liczone jednym przebiegiem z sum po grupach (np.bincount),
+# dla dowolnej kombinacji etykiet: Cutoff / PKD_Code / Target / Horizon.
+
+METRICS = ['MAE', 'RMSE', 'MAPE', 'R2', 'SMAPE', 'DA', 'MASE', 'VR']
+
+
+def mase_scale(history):
+    """Mianownik MASE per seria: średni |y_t - y_(t-1)| na historii treningowej (..., T) z NaN."""
+    diffs = np.abs(np.diff(history, axis=-1))
+    count = (~np.isnan(diffs)).sum(axis=-1)
+    total = np.nansum(diffs, axis=-1)
+    return np.where(count > 0, total / np.maximum(count, 1), np.nan)
+
+
+def group_ids(coords, by, shape):
+    """Id grupy dla każdej komórki (F, S, H) + ramka etykiet grup (kolumny = by)."""
+    if not by:
+        return np.zeros(shape, dtype=int), pd.DataFrame(index=[0])
+
+    codes, uniques = [], []
+    for name in by:
+        axis, labels = coords[name]
+        code, unique = pd.factorize(np.asarray(labels))
+        broadcast = [1] * len(shape)
+        broadcast[axis] = -1
+        codes.append(np.broadcast_to(code.reshape(broadcast), shape))
+        uniques.append(unique)
+
+    sizes = [len(u) for u in uniques]
+    ids = np.ravel_multi_index(codes, sizes)
+    index = np.unravel_index(np.arange(int(np.prod(sizes))), sizes)
+    labels = pd.DataFrame({name: np.asarray(u)[i] for name, u, i in zip(by, uniques, index)})
+    return ids, labels
+
+
+def evaluate(y_true, y_pred, scale, coords, by):
+    """
+    y_true, y_pred: (F, S, H), scale: (F, S) z mase_scale().
+    coords: {nazwa: (oś, etykiety wzdłuż osi)}, np. {'Target': (1, targets_per_series), 'Horizon': (2, [1..H])}.
+    Zwraca ramkę: kolumny by + N + METRICS, jeden wiersz na niepustą grupę.
+    """
+    shape = y_true.shape
+    ids, labels = group_ids(coords, by, shape)
+    n_groups = len(labels)
+
+    valid = ~(np.isnan(y_true) | np.isnan(y_pred))
+    yt = np.where(valid, y_true, 0.0)
+    yp = np.where(valid, y_pred, 0.0)
+    err = yp - yt
+
+    def group_sum(values, mask=valid):
+        return np.bincount(ids[mask], weights=values[mask], minlength=n_groups)
+
+    n = group_sum(np.ones(shape))
+    sse = group_sum(err ** 2)
+    sum_t, sum_t2 = group_sum(yt), group_sum(yt ** 2)
+    sum_p, sum_p2 = group_sum(yp), group_sum(yp ** 2)
+
+    nonzero = valid & (yt != 0)
+    ape = np.abs(err) / np.where(nonzero, np.abs(yt), 1.0)
+    smape = 2 * np.abs(err) / (np.abs(yt) + np.abs(yp) + 1e-10)
+
+    # MASE: błąd każdej komórki skalowany mianownikiem jej własnej serii
+    series_scale = np.broadcast_to(scale[:, :, None], shape)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        scaled = np.where(series_scale > 0, np.abs(err) / series_scale, np.inf)
+
+    # DA: zgodność kierunku zmian między kolejnymi krokami horyzontu tej samej serii (przypisana do kroku h)
+    pairs = valid[..., 1:] & valid[..., :-1]
+    hits = np.sign(np.diff(yt, axis=-1)) == np.sign(np.diff(yp, axis=-1))
+    pair_ids = ids[..., 1:]
+
+    with np.errstate(divide='ignore', invalid='ignore'):
+        mean_t, mean_p = sum_t / n, sum_p / n
+        var_t, var_p = sum_t2 / n - mean_t ** 2, sum_p2 / n - mean_p ** 2
+        sst = sum_t2 - n * mean_t ** 2
+        n_pairs = np.bincount(pair_ids[pairs], minlength=n_groups)
+
+        result = labels.assign(
+            N=n.astype(int),
+            MAE=group_sum(np.abs(err)) / n,
+            RMSE=np.sqrt(sse / n),
+            MAPE=group_sum(ape, nonzero) / group_sum(np.ones(shape), nonzero) * 100,
+            # Jak sklearn: stały y_true -> R2 = 1 przy zerowym błędzie, inaczej 0
+            R2=np.where(sst > 1e-12, 1 - sse / sst, np.where(sse > 1e-12, 0.0, 1.0)),
+            SMAPE=group_sum(smape) / n * 100,
+            DA=np.bincount(pair_ids[pairs], weights=hits[pairs], minlength=n_groups) / n_pairs * 100,
+            MASE=group_sum(scaled) / n,
+            VR=np.where(var_t > 1e-12, var_p / var_t, 0.0),
+        )
+    return result[result['N'] > 0].reset_index(drop=True)
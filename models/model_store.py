@@ -0,0 +1,180 @@
+import pandas as pd
+import os
+import json
+import time
+import hashlib
+import prophet
+from prophet.serialize import model_to_json, model_from_json
+
+# Magazyn wytrenowanych modeli Prophet.
+# Klucz: (PKD, target, regresory, hiperparametry) + hash wierszy treningowych.
+# Trafienie w cache = brak m.fit(), tylko predict().
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+STORE_DIR = os.path.join(SCRIPT_DIR, 'model_store')
+
+MAX_STORE_MB = 512
+MAX_AGE_DAYS = 14
+
+# Douczanie od parametrów modelu z cache, gdy dopisano nowe miesiące.
+# Na krótkich seriach miesięcznych Stan częściej spada wtedy do wolnego Newtona, więc domyślnie wyłączone.
+WARM_START = False
+
+
+def _digest(payload):
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+def series_key(pkd, target_col, regressors, params):
+    """Klucz modelu bez danych: to samo (PKD, target, regresory, hiperparametry) = ta sama seria."""
+    spec = {
+        'pkd': str(pkd),
+        'target': target_col,
+        'regressors': sorted(regressors),
+        'params': params,
+        'prophet': prophet.__version__,
+    }
+    return _digest(json.dumps(spec, sort_keys=True, default=str).encode('utf-8'))
+
+
+def row_hashes(train_df):
+    """Hash każdego wiersza treningowego (pozwala sprawdzić, czy stare dane są prefiksem nowych)."""
+    return pd.util.hash_pandas_object(train_df, index=False).values
+
+
+def _paths(store_dir, key, data_hash):
+    base = os.path.join(store_dir, f"{key}_{data_hash}")
+    return base + '.json', base + '.meta.json'
+
+
+def _write_atomic(path, text):
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def warm_start_params(m, train_df):
+    """
+    Parametry wytrenowanego modelu w formacie 'init' dla Stana.
+    Prophet trenuje na przeskalowanych y i t, więc przeliczamy je na skalę nowych danych.
+    """
+    y_scale = float(train_df['y'].abs().max()) or 1.0
+    t_scale = (train_df['ds'].max() - train_df['ds'].min()) / pd.Timedelta(days=1)
+    y_ratio = m.y_scale / y_scale
+    slope_ratio = y_ratio * t_scale / (m.t_scale / pd.Timedelta(days=1))
+
+    return {
+        'k': float(m.params['k'][0][0]) * slope_ratio,
+        'm': float(m.params['m'][0][0]) * y_ratio,
+        'sigma_obs': float(m.params['sigma_obs'][0][0]) * y_ratio,
+        'delta': m.params['delta'][0] * slope_ratio,
+        'beta': m.params['beta'][0] * y_ratio,
+    }
+
+
+def find_warm_start(store_dir, key, hashes):
+    """Szuka najdłuższego modelu z cache, którego dane treningowe są prefiksem obecnych (dopisane nowe miesiące)."""
+    if not os.path.isdir(store_dir):
+        return None
+
+    best = None
+    for name in os.listdir(store_dir):
+        if not (name.startswith(key + '_') and name.endswith('.meta.json')):
+            continue
+        try:
+            with open(os.path.join(store_dir, name), encoding='utf-8') as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            continue
+        n_rows = meta.get('n_rows', 0)
+        if n_rows >= len(hashes) or (best is not None and n_rows <= best['n_rows']):
+            continue
+        if _digest(hashes[:n_rows].tobytes()) == meta.get('data_hash'):
+            best = meta
+
+    if best is None:
+        return None
+
+    model_path, _ = _paths(store_dir, key, best['data_hash'])
+    try:
+        with open(model_path, encoding='utf-8') as f:
+            return model_from_json(f.read())
+    except (OSError, ValueError):
+        return None
+
+
+def fit_cached(make_model, train_df, key, store_dir=STORE_DIR, fit_kwargs=None):
+    """
+    Zwraca (model, status). status: 'hit' (z cache), 'warm' (douczony od parametrów z cache), 'fit' (od zera).
+    make_model() musi zwracać świeży, skonfigurowany (niewytrenowany) model Prophet.
+    fit_kwargs trafiają do m.fit() (np. timeout dla Stana).
+    """
+    fit_kwargs = fit_kwargs or {}
+    hashes = row_hashes(train_df)
+    data_hash = _digest(hashes.tobytes())
+    model_path, meta_path = _paths(store_dir, key, data_hash)
+
+    if os.path.exists(model_path):
+        try:
+            with open(model_path, encoding='utf-8') as f:
+                m = model_from_json(f.read())
+            os.utime(model_path)
+            return m, 'hit'
+        except (OSError, ValueError):
+            pass
+
+    status = 'fit'
+    m = make_model()
+    previous = find_warm_start(store_dir, key, hashes) if WARM_START else None
+    if previous is not None:
+        try:
+            m.fit(train_df, init=warm_start_params(previous, train_df), **fit_kwargs)
+            status = 'warm'
+        except TimeoutError:
+            raise
+        except Exception:
+            m = make_model()
+    if status == 'fit':
+        m.fit(train_df, **fit_kwargs)
+
+    os.makedirs(store_dir, exist_ok=True)
+    _write_atomic(model_path, model_to_json(m))
+    _write_atomic(meta_path, json.dumps({
+        'data_hash': data_hash,
+        'n_rows': len(train_df),
+        'created': time.time(),
+    }))
+    return m, status
+
+
+def evict(store_dir=STORE_DIR, max_mb=MAX_STORE_MB, max_age_days=MAX_AGE_DAYS):
+    """Usuwa modele nieużywane dłużej niż max_age_days, potem najstarsze ponad limit rozmiaru."""
+    if not os.path.isdir(store_dir):
+        return 0
+
+    entries = []
+    for name in os.listdir(store_dir):
+        if not name.endswith('.json') or name.endswith('.meta.json'):
+            continue
+        path = os.path.join(store_dir, name)
+        stat = os.stat(path)
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort()
+    now = time.time()
+    total_bytes = sum(e[1] for e in entries)
+    removed = 0
+
+    for mtime, size, path in entries:
+        too_old = now - mtime > max_age_days * 86400
+        too_big = total_bytes > max_mb * 1024 * 1024
+        if not (too_old or too_big):
+            continue
+        for p in (path, path[:-len('.json')] + '.meta.json'):
+            if os.path.exists(p):
+                os.remove(p)
+        total_bytes -= size
+        removed += 1
+
+    return removed
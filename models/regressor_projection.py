@@ -0,0 +1,129 @@
+import pandas as pd
+import numpy as np
+import os
+import json
+import hashlib
+
+# Projekcja regresorów na okres prognozy - liczona raz na przebieg, wspólna dla wszystkich modeli.
+# WIBOR i Energy_Price są makro (identyczne dla każdej branży) -> jedna seria na regresor,
+# Google_Trends jest per branża. Wszystkie serie idą jednym wektorowym przebiegiem
+# Holta z tłumionym trendem (damped trend ETS) z doborem parametrów z siatki.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+PROJECTION_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'regressor_projection.csv')
+
+MACRO_REGRESSORS = ['WIBOR', 'Energy_Price']
+
+# Siatka parametrów ETS: wygładzanie poziomu, trendu i tłumienie
+ALPHAS = [0.2, 0.5, 0.8]
+BETAS = [0.05, 0.2]
+PHIS = [0.8, 0.9, 0.98]
+
+# Dopuszczalny zakres projekcji (None = bez ograniczenia)
+BOUNDS = {
+    'WIBOR': (0, None),
+    'Energy_Price': (0, None),
+    'Google_Trends': (0, 100),
+}
+
+
+def damped_trend_forecast(y, horizon, return_residuals=False):
+    """
+    Holt z tłumionym trendem dla wielu serii naraz. y: (S, T) bez NaN -> prognoza (S, horizon).
+    return_residuals=True -> (prognoza, błędy prognoz jednokrokowych (S, T) najlepszych parametrów).
+    """
+    grid = np.array([(a, b, p) for a in ALPHAS for b in BETAS for p in PHIS])
+    alpha, beta, phi = (grid[:, i, None] for i in range(3))
+    n_series, n_time = y.shape
+
+    level = np.tile(y[:, 0], (len(grid), 1))
+    trend = np.tile(y[:, 1] - y[:, 0] if n_time > 1 else np.zeros(n_series), (len(grid), 1))
+    sse = np.zeros_like(level)
+    errors = np.full((len(grid), n_series, n_time), np.nan) if return_residuals else None
+
+    # Rekurencja po czasie, wektorowo po (parametry x serie)
+    for t in range(1, n_time):
+        pred = level + phi * trend
+        err = y[:, t] - pred
+        sse += err ** 2
+        if return_residuals:
+            errors[:, :, t] = err
+        level = pred + alpha * err
+        trend = phi * trend + alpha * beta * err
+
+    best = sse.argmin(axis=0)
+    cols = np.arange(n_series)
+    damping = np.cumsum(grid[best, 2][:, None] ** np.arange(1, horizon + 1)[None, :], axis=1)
+    forecast = level[best, cols][:, None] + damping * trend[best, cols][:, None]
+    if return_residuals:
+        return forecast, errors[best, cols]
+    return forecast
+
+
+def months_between(start, end):
+    return (end.year - start.year) * 12 + end.month - start.month
+
+
+def project_regressors(df, future_dates, regressors):
+    """Zwraca ramkę (Date, PKD_Code, regresory...) z projekcją dla future_dates dla każdej branży."""
+    future_dates = pd.DatetimeIndex(future_dates)
+    pkds = df['PKD_Code'].unique()
+    dates = pd.DatetimeIndex(np.sort(df['Date'].unique()))
+
+    # Wiersze macierzy: po jednej serii na regresor makro, po jednej na (branża, regresor branżowy)
+    rows, labels = [], []
+    for reg in regressors:
+        wide = df.pivot_table(index='Date', columns='PKD_Code', values=reg).reindex(dates)
+        if reg in MACRO_REGRESSORS:
+            rows.append(wide.mean(axis=1).to_numpy())
+            labels.append((reg, None))
+        else:
+            wide = wide.reindex(columns=pkds)
+            rows.extend(wide.to_numpy().T)
+            labels.extend((reg, pkd) for pkd in pkds)
+
+    y = pd.DataFrame(np.array(rows, dtype=float).T).ffill().bfill().fillna(0).to_numpy().T
+
+    steps = np.array([months_between(dates[-1], d) for d in future_dates])
+    horizon = max(int(steps.max()), 1)
+    forecast = damped_trend_forecast(y, horizon)[:, np.clip(steps, 1, horizon) - 1]
+
+    projection = pd.DataFrame({
+        'Date': np.tile(future_dates, len(pkds)),
+        'PKD_Code': np.repeat(pkds, len(future_dates)),
+    })
+    for reg in regressors:
+        low, high = BOUNDS.get(reg, (None, None))
+        if reg in MACRO_REGRESSORS:
+            values = np.tile(forecast[labels.index((reg, None))], len(pkds))
+        else:
+            values = np.concatenate([forecast[labels.index((reg, pkd))] for pkd in pkds])
+        projection[reg] = values if low is None and high is None else np.clip(values, low, high)
+    return projection
+
+
+def load_or_project(df, future_dates, regressors, path=PROJECTION_FILE):
+    """Projekcja z cache (plik CSV + hash danych wejściowych) lub liczona od nowa i zapisywana."""
+    source = df[['Date', 'PKD_Code'] + regressors]
+    fingerprint = hashlib.sha256(
+        pd.util.hash_pandas_object(source, index=False).values.tobytes()
+        + str(list(pd.DatetimeIndex(future_dates))).encode('utf-8')
+        + json.dumps([ALPHAS, BETAS, PHIS, BOUNDS, MACRO_REGRESSORS]).encode('utf-8')
+    ).hexdigest()[:16]
+    meta_path = path + '.meta.json'
+
+    if os.path.exists(path) and os.path.exists(meta_path):
+        with open(meta_path, encoding='utf-8') as f:
+            meta = json.load(f)
+        if meta.get('fingerprint') == fingerprint:
+            cached = pd.read_csv(path, parse_dates=['Date'], dtype={'PKD_Code': str})
+            cached['PKD_Code'] = cached['PKD_Code'].astype(df['PKD_Code'].dtype)
+            return cached, True
+
+    projection = project_regressors(df, future_dates, regressors)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    projection.to_csv(path, index=False)
+    with open(meta_path, 'w', encoding='utf-8') as f:
+        json.dump({'fingerprint': fingerprint}, f)
+    return projection, False
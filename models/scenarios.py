@@ -0,0 +1,257 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import zlib
+from prophet.utilities import regressor_coefficients
+from forecaster import (
+    TARGETS, REGRESSORS, TARGET_DATES, ENGINE, N_WORKERS,
+    prepare_data, fit_model, prophet_jobs, run_fit_jobs, build_covid_lockdowns, predict_with_intervals,
+    interval_config
+)
+import batch_engine
+import regressor_projection
+import intervals
+
+# Tryb scenariuszy: "co jeśli WIBOR 8% i energia +40%" dla wszystkich branż.
+# Modele trenowane są raz (Prophet z cache model_store), potem wszystkie scenariusze
+# liczone jednym wektorowym przebiegiem po współczynnikach regresorów:
+# prognoza_scenariusza = prognoza_bazowa + efekt(regresory_scenariusza - regresory_bazowe).
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
+
+INPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'MASTER_DATA.csv')
+OUTPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'predictions_scenarios.csv')
+
+# YAML albo CSV (kolumny: scenario, regressor, op, value[, start])
+SCENARIOS_FILE = os.path.join(SCRIPT_DIR, 'scenarios.yaml')
+
+# Operacje na projekcji bazowej regresora: set = poziom, scale = mnożnik, shift = przesunięcie
+OPERATIONS = ['set', 'scale', 'shift']
+
+# Przycinanie standaryzowanych regresorów w predict() silnika numpy. Prognozy i backtest używają
+# batch_engine.REGRESSOR_CLIP (+-3 sigmy); scenariusze nie - szok spoza zakresu treningu (np. WIBOR
+# +5 pp) ma dać efekt proporcjonalny, a nie ucięty. Liczba (np. 3.0) = przycinanie jak w prognozach.
+SCENARIO_REGRESSOR_CLIP = None
+
+
+def load_scenarios(path=SCENARIOS_FILE):
+    """Wczytuje scenariusze -> lista {'name', 'start', 'regressors': {regresor: {operacja: wartość}}}."""
+    if path.endswith('.csv'):
+        table = pd.read_csv(path)
+        scenarios = []
+        for name, rows in table.groupby('scenario', sort=False):
+            regs = {}
+            for row in rows.itertuples():
+                if isinstance(row.regressor, str) and isinstance(row.op, str):
+                    regs.setdefault(row.regressor, {})[row.op] = float(row.value)
+            start = rows['start'].dropna() if 'start' in rows.columns else pd.Series(dtype=object)
+            scenarios.append({'name': name, 'start': start.iloc[0] if len(start) else None, 'regressors': regs})
+        return scenarios
+
+    import yaml  # tylko dla plików YAML
+    with open(path, encoding='utf-8') as f:
+        raw = yaml.safe_load(f) or []
+    return [
+        {'name': str(s['name']), 'start': s.get('start'), 'regressors': s.get('regressors') or {}}
+        for s in raw
+    ]
+
+
+def scenario_paths(scenarios, base_x, regressors, future_dates):
+    """
+    Projekcja bazowa (P, H, R) + scenariusze -> ścieżki regresorów (N, P, H, R), jednym przebiegiem.
+    Operacja działa od daty 'start' scenariusza (brak = cały horyzont).
+    """
+    n, n_reg = len(scenarios), len(regressors)
+    set_value = np.full((n, n_reg), np.nan)
+    scale = np.ones((n, n_reg))
+    shift = np.zeros((n, n_reg))
+    active = np.ones((n, len(future_dates)), dtype=bool)
+
+    for i, scenario in enumerate(scenarios):
+        for reg, ops in scenario['regressors'].items():
+            if reg not in regressors:
+                print(f"   ⚠️ Scenariusz '{scenario['name']}': pomijam nieznany regresor {reg}")
+                continue
+            unknown = set(ops) - set(OPERATIONS)
+            if unknown:
+                raise ValueError(f"Scenariusz '{scenario['name']}': nieznane operacje {sorted(unknown)} dla {reg}")
+            r = regressors.index(reg)
+            set_value[i, r] = ops.get('set', np.nan)
+            scale[i, r] = ops.get('scale', 1.0)
+            shift[i, r] = ops.get('shift', 0.0)
+        if scenario.get('start') is not None:
+            active[i] = future_dates >= pd.Timestamp(str(scenario['start']))
+
+    level = np.where(np.isnan(set_value)[:, None, None, :], base_x[None], set_value[:, None, None, :])
+    changed = level * scale[:, None, None, :] + shift[:, None, None, :]
+    return np.where(active[:, None, :, None], changed, base_x[None])
+
+
+def fit_components(pkd, target_col, train_df, params, regressors, future_regressors):
+    """
+    Jak forecaster.fit_target, ale zwraca składowe potrzebne do scenariuszy:
+    prognozę bazową, trend i współczynniki regresorów (addytywne / multiplikatywne) w skali oryginalnej.
+    """
+    start = time.perf_counter()
+    np.random.seed(zlib.crc32(f"{pkd}|{target_col}".encode('utf-8')))
+
+    prophet_train = train_df.rename(columns={'Date': 'ds', target_col: 'y'})
+    try:
+        m, status = fit_model(pkd, target_col, prophet_train, regressors, params)
+    except Exception:
+        return pkd, target_col, None, time.perf_counter() - start, 'error'
+
+    future = pd.DataFrame({'ds': TARGET_DATES}).merge(
+        future_regressors[['Date'] + regressors].rename(columns={'Date': 'ds'}), on='ds', how='left'
+    )
+    forecast, lower, upper, _ = predict_with_intervals(m, target_col, prophet_train, future)
+    if lower is None:
+        lower = upper = np.full(len(forecast), np.nan)
+
+    # Współczynniki w skali oryginalnej: efekt addytywny = coef * dx, multiplikatywny = trend * coef * dx
+    coef_add, coef_mult = {}, {}
+    if m.extra_regressors:
+        for row in regressor_coefficients(m).itertuples():
+            coefs = coef_add if row.regressor_mode == 'additive' else coef_mult
+            coefs[row.regressor] = row.coef
+
+    components = {
+        'yhat': forecast['yhat'].values,
+        'lower': lower,
+        'upper': upper,
+        'trend': forecast['trend'].values,
+        'coef_add': coef_add,
+        'coef_mult': coef_mult,
+    }
+    return pkd, target_col, components, time.perf_counter() - start, status
+
+
+def run_prophet_scenarios(df, regressors, projection, pkds, base_x, x_scenarios, n_workers):
+    """Prophet: trening raz na parę (PKD, target), scenariusze jako przesunięcie o efekt regresorów."""
+    fit_start = time.perf_counter()
+    results = run_fit_jobs(prophet_jobs(df, regressors, projection), n_workers, func=fit_components)
+    fit_time = time.perf_counter() - fit_start
+
+    results = [r for r in results if r[2] is not None]
+    series = [(pkd, target_col) for pkd, target_col, *_ in results]
+    comps = [r[2] for r in results]
+
+    eval_start = time.perf_counter()
+    coef_add = np.array([[c['coef_add'].get(reg, 0.0) for reg in regressors] for c in comps])
+    coef_mult = np.array([[c['coef_mult'].get(reg, 0.0) for reg in regressors] for c in comps])
+    trend = np.array([c['trend'] for c in comps])
+
+    # (N, P, H, R) -> (N, S, H, R): każda seria dostaje ścieżki swojej branży
+    pkd_index = {pkd: i for i, pkd in enumerate(pkds)}
+    delta_x = (x_scenarios - base_x[None])[:, [pkd_index[pkd] for pkd, _ in series]]
+    effect = (np.einsum('nshr,sr->nsh', delta_x, coef_add)
+              + trend[None] * np.einsum('nshr,sr->nsh', delta_x, coef_mult))
+
+    # Przedziały przesuwamy o ten sam efekt (niepewność trendu i szumu nie zależy od scenariusza)
+    yhat, lower, upper = (np.array([c[k] for c in comps])[None] + effect for k in ('yhat', 'lower', 'upper'))
+    statuses = [r[4] for r in results]
+    return series, (yhat, lower, upper), fit_time, time.perf_counter() - eval_start, statuses
+
+
+def run_numpy_scenarios(df, regressors, pkds, x_scenarios):
+    """Silnik numpy: jedno dopasowanie batch_engine.fit, wszystkie scenariusze jednym predict()."""
+    fit_start = time.perf_counter()
+    targets = [t for t in TARGETS if t in df.columns]
+    train_dates = pd.DatetimeIndex(np.sort(df['Date'].unique()))
+
+    y = batch_engine.panel(df, pkds, train_dates, targets)
+    x = batch_engine.panel(df, pkds, train_dates, regressors)
+    n_targets = len(targets)
+    state = batch_engine.fit(
+        train_dates, y.transpose(0, 2, 1).reshape(len(pkds) * n_targets, len(train_dates)),
+        np.repeat(x, n_targets, axis=0), holidays=build_covid_lockdowns()
+    )
+    fit_time = time.perf_counter() - fit_start
+
+    eval_start = time.perf_counter()
+    yhat, lower, upper = batch_engine.predict(
+        state, TARGET_DATES, np.repeat(x_scenarios, n_targets, axis=1), regressor_clip=SCENARIO_REGRESSOR_CLIP
+    )
+
+    # Przedziały wg INTERVALS jak w forecaster.run_batch_engine; bootstrap reszt nie zależy od scenariusza
+    for k, target_col in enumerate(targets):
+        config = interval_config(target_col)
+        rows = slice(k, None, n_targets)
+        if config.get('method', 'none') == 'none':
+            lower[:, rows] = upper[:, rows] = np.nan
+        elif config['method'] == 'bootstrap':
+            low, high = intervals.residual_intervals(np.zeros_like(yhat[0, rows]), state['resid'][rows], config)
+            lower[:, rows], upper[:, rows] = yhat[:, rows] + low, yhat[:, rows] + high
+
+    series = [(pkd, target_col) for pkd in pkds for target_col in targets]
+    return series, (yhat, lower, upper), fit_time, time.perf_counter() - eval_start, ['numpy'] * len(series)
+
+
+def scenarios_frame(scenarios, series, forecasts):
+    """Tablice (N, S, H) -> długi format: Scenario, Date, PKD_Code, Target, Predicted, Confidence_Lower/Upper."""
+    yhat, lower, upper = forecasts
+    n, s, h = yhat.shape
+    frame = pd.DataFrame({
+        'Scenario': np.repeat([sc['name'] for sc in scenarios], s * h),
+        'Date': np.tile(TARGET_DATES, n * s),
+        'PKD_Code': np.tile(np.repeat([pkd for pkd, _ in series], h), n),
+        'Target': np.tile(np.repeat([t for _, t in series], h), n),
+        'Predicted': np.clip(yhat.ravel(), 0, 100).round(1),
+        'Confidence_Lower': np.clip(lower.ravel(), 0, 100).round(1),
+        'Confidence_Upper': np.clip(upper.ravel(), 0, 100).round(1),
+    })
+    return frame.dropna(subset=['Predicted'])
+
+
+def run_scenarios(scenarios_file=SCENARIOS_FILE, engine=ENGINE, n_workers=N_WORKERS, output_file=OUTPUT_FILE):
+    print(f"🧪 Tryb scenariuszy (silnik: {engine}, plik: {scenarios_file})...")
+
+    if not os.path.exists(INPUT_FILE):
+        print(f"❌ Brak pliku {INPUT_FILE}")
+        return None
+
+    scenarios = load_scenarios(scenarios_file)
+    if not scenarios:
+        print("❌ Brak scenariuszy w pliku")
+        return None
+
+    df = prepare_data(INPUT_FILE)
+    pkds = df['PKD_Code'].unique()
+    regressors = [r for r in REGRESSORS if r in df.columns]
+
+    projection, _ = regressor_projection.load_or_project(df, TARGET_DATES, regressors)
+    base_x = batch_engine.panel(projection, pkds, TARGET_DATES, regressors)
+    x_scenarios = scenario_paths(scenarios, base_x, regressors, TARGET_DATES)
+
+    if engine == 'numpy':
+        series, forecasts, fit_time, eval_time, statuses = run_numpy_scenarios(df, regressors, pkds, x_scenarios)
+    else:
+        series, forecasts, fit_time, eval_time, statuses = run_prophet_scenarios(
+            df, regressors, projection, pkds, base_x, x_scenarios, n_workers
+        )
+
+    result = scenarios_frame(scenarios, series, forecasts)
+    result.to_csv(output_file, index=False)
+
+    print(f"   -> Trening: {fit_time:.2f}s ({len(series)} serii"
+          f"{', z cache: ' + str(statuses.count('hit')) if engine != 'numpy' else ''})")
+    print(f"   -> Scenariusze: {len(scenarios)} w {eval_time * 1000:.1f} ms "
+          f"({eval_time * 1000 / len(scenarios):.2f} ms/scenariusz)")
+
+    # Podsumowanie: średni Score w ostatnim miesiącu horyzontu per scenariusz
+    last = result[(result['Target'] == 'PKO_SCORE_FINAL') & (result['Date'] == TARGET_DATES[-1])]
+    summary = last.groupby('Scenario', sort=False)['Predicted'].mean()
+    print(f"\n{'SCENARIUSZ':<32} | ŚREDNI SCORE {TARGET_DATES[-1]:%Y-%m}")
+    print("-" * 55)
+    for name, value in summary.items():
+        print(f"{name:<32} | {value:.1f}")
+
+    print(f"\n✅ Zapisano: {output_file} ({len(result)} wierszy)")
+    return result
+
+
+if __name__ == "__main__":
+    run_scenarios()
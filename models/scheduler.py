@@ -0,0 +1,105 @@
+import numpy as np
+import os
+import json
+import heapq
+from regressor_projection import damped_trend_forecast, months_between
+
+# Harmonogram treningów z budżetem czasu.
+# Zadania startują od najdłuższych (wg czasów z poprzednich przebiegów), każdy fit Stana ma limit
+# FIT_BUDGET_S (forecaster.fit_model), a serie, których model przekroczył budżet albo się wysypał,
+# dostają szybką prognozę zastępczą: sezonowy naiwny albo Holt z tłumionym trendem.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+TIMINGS_FILE = os.path.join(SCRIPT_DIR, 'fit_timings.json')
+
+SEASON = 12
+
+
+def timing_key(pkd, target_col):
+    return f"{pkd}|{target_col}"
+
+
+def load_timings(path=TIMINGS_FILE):
+    """Czasy treningu z poprzednich przebiegów -> {'pkd|target': sekundy}."""
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_timings(results, timings, budget, path=TIMINGS_FILE):
+    """
+    Aktualizuje czasy po przebiegu. Liczą się tylko prawdziwe treningi (trafienie w cache nic nie mówi
+    o koszcie fitu), przekroczenie budżetu zapisujemy jako budżet - seria pójdzie na początek kolejki.
+    """
+    updated = dict(timings)
+    for pkd, target_col, _, elapsed, status, *_ in results:
+        if status in ('fit', 'warm'):
+            updated[timing_key(pkd, target_col)] = round(elapsed, 3)
+        elif status == 'timeout':
+            updated[timing_key(pkd, target_col)] = budget
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(updated, f, indent=1, sort_keys=True)
+    os.replace(tmp_path, path)
+    return updated
+
+
+def expected_times(keys, timings):
+    """Oczekiwany czas każdego zadania. Nieznane = najdłuższy znany (bezpieczniej zacząć je wcześnie)."""
+    default = max(timings.values(), default=0.0)
+    return [timings.get(key, default) for key in keys]
+
+
+def longest_first(keys, timings):
+    """Kolejność zadań: od najdłuższego oczekiwanego czasu (LPT), remisy wg kolejności wejściowej."""
+    expected = expected_times(keys, timings)
+    return sorted(range(len(keys)), key=lambda i: -expected[i])
+
+
+def makespan(expected, n_workers):
+    """Szacowany czas ściany dla kolejności LPT: każde zadanie trafia do najwcześniej wolnego procesu."""
+    workers = [0.0] * max(n_workers, 1)
+    for t in sorted(expected, reverse=True):
+        heapq.heapreplace(workers, workers[0] + t)
+    return max(workers)
+
+
+def fallback_forecast(y, last_date, future_dates):
+    """
+    Prognozy zastępcze dla wielu serii naraz. y: (S, T) z NaN -> (yhat (S, H), reszty (S, T), metoda per seria).
+    Metoda per seria: sezonowy naiwny albo Holt z tłumionym trendem - ta z mniejszym średnim błędem in-sample.
+    """
+    filled = np.array([_fill(row) for row in y])
+    steps = np.array([months_between(last_date, d) for d in future_dates])
+    horizon = max(int(steps.max()), 1)
+    step_idx = np.clip(steps, 1, horizon) - 1
+
+    trend_fc, trend_resid = damped_trend_forecast(filled, horizon, return_residuals=True)
+    trend_fc = trend_fc[:, step_idx]
+
+    n_time = filled.shape[1]
+    if n_time <= SEASON:
+        return trend_fc, trend_resid, ['damped_trend'] * len(y)
+
+    # Sezonowy naiwny: wartość sprzed SEASON miesięcy, dla kroku h - odpowiedni miesiąc ostatniego roku
+    naive_fc = filled[:, n_time - SEASON + (np.clip(steps, 1, None) - 1) % SEASON]
+    naive_resid = np.full_like(filled, np.nan)
+    naive_resid[:, SEASON:] = filled[:, SEASON:] - filled[:, :-SEASON]
+
+    use_naive = np.nanmean(np.abs(naive_resid), axis=1) < np.nanmean(np.abs(trend_resid), axis=1)
+    yhat = np.where(use_naive[:, None], naive_fc, trend_fc)
+    resid = np.where(use_naive[:, None], naive_resid, trend_resid)
+    return yhat, resid, ['seasonal_naive' if n else 'damped_trend' for n in use_naive]
+
+
+def _fill(row):
+    """Braki w serii: interpolacja liniowa, na brzegach najbliższa wartość, pusta seria = 0."""
+    valid = ~np.isnan(row)
+    if not valid.any():
+        return np.zeros_like(row)
+    positions = np.arange(len(row))
+    return np.interp(positions, positions[valid], row[valid])
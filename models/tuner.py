@@ -0,0 +1,152 @@
+import numpy as np
+import json
+import sys
+import time
+import random
+from itertools import combinations
+from concurrent.futures import ProcessPoolExecutor
+import logging
+from forecaster import REGRESSORS, PROPHET_PARAMS, N_WORKERS, TUNED_PARAMS_FILE, load_tuned_params
+import validator
+
+logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
+logging.getLogger('prophet').setLevel(logging.WARNING)
+
+# Strojenie hiperparametrów Prophet per (branża, target) (successive halving na foldach backtestu).
+# Wszyscy kandydaci startują na najnowszych foldach strojenia, po każdym szczeblu zostaje 1/ETA najlepszych
+# wg średniego MASE. Zwycięzcy trafiają do TUNED_PARAMS_FILE (klucz: branża -> target), skąd czyta je forecaster.
+# Ostatnie HOLDOUT_CUTOFFS punktów odcięcia backtestu nie biorą udziału w wyborze - validator raportuje
+# na nich metryki out-of-sample (foldy strojenia oznaczone w backtest_metrics.csv kolumną Tuning_Fold).
+
+TUNE_TARGET = 'PKO_SCORE_FINAL'  # python tuner.py <target> - inny target
+N_CANDIDATES = 24
+SEED = 42
+
+HOLDOUT_CUTOFFS = 2
+TUNING_CUTOFFS = sorted(validator.BACKTEST_CUTOFFS)[:-HOLDOUT_CUTOFFS]
+
+# Liczba foldów (od najnowszego punktu odcięcia strojenia) oceniana na kolejnych szczeblach
+RUNGS = [2, 4, len(TUNING_CUTOFFS)]
+ETA = 3
+
+SEARCH_SPACE = {
+    'changepoint_prior_scale': [0.001, 0.01, 0.05, 0.2, 0.5],
+    'seasonality_prior_scale': [0.1, 1.0, 10.0],
+    'seasonality_mode': ['additive', 'multiplicative'],
+}
+
+
+def regressor_subsets(regressors):
+    return [list(c) for n in range(len(regressors) + 1) for c in combinations(regressors, n)]
+
+
+def sample_candidates(n_candidates=N_CANDIDATES, seed=SEED, regressors=REGRESSORS):
+    """Losowa próbka siatki (parametry, regresory). Kandydat 0 to zawsze obecna konfiguracja domyślna."""
+    grid = [
+        ({'changepoint_prior_scale': cps, 'seasonality_prior_scale': sps, 'seasonality_mode': mode}, subset)
+        for cps in SEARCH_SPACE['changepoint_prior_scale']
+        for sps in SEARCH_SPACE['seasonality_prior_scale']
+        for mode in SEARCH_SPACE['seasonality_mode']
+        for subset in regressor_subsets(regressors)
+    ]
+    rng = random.Random(seed)
+    sampled = rng.sample(grid, min(n_candidates - 1, len(grid)))
+    return [({}, list(regressors))] + sampled
+
+
+def evaluate_fold(cutoff, pkd, target, group, params, regressors):
+    """MASE jednego foldu dla kandydata. Błąd treningu = inf (kandydat odpada przy przycinaniu)."""
+    fold = validator.run_fold(
+        cutoff, pkd, target, group, validator.BACKTEST_HORIZON, validator.BACKTEST_WINDOW,
+        dict(PROPHET_PARAMS, **params), regressors, use_cache=False
+    )
+    if fold is None:
+        return np.inf
+    y_true, y_pred, scale, _ = fold
+    mase = np.mean(np.abs(y_true - y_pred)) / scale if scale > 0 else np.inf
+    return mase if np.isfinite(mase) else np.inf
+
+
+def run_tuning(target=TUNE_TARGET, n_candidates=N_CANDIDATES, n_workers=N_WORKERS, output_file=TUNED_PARAMS_FILE):
+    print(f"🎛️ Strojenie hiperparametrów per branża (target: {target}, kandydaci: {n_candidates}, procesy: {n_workers}, "
+          f"foldy: {len(TUNING_CUTOFFS)}, bez {HOLDOUT_CUTOFFS} najnowszych)...")
+
+    df_smooth = validator.load_smoothed_data()
+    if df_smooth is None:
+        return None
+
+    regressors = [r for r in REGRESSORS if r in df_smooth.columns]
+    groups = {
+        pkd: group.sort_values('Date')[['Date', target] + regressors]
+        for pkd, group in df_smooth.groupby('PKD_Code', sort=False)
+    }
+    candidates = sample_candidates(n_candidates, regressors=regressors)
+    cutoffs = sorted(TUNING_CUTOFFS, reverse=True)
+
+    alive = {pkd: list(range(len(candidates))) for pkd in groups}
+    scores = {(pkd, c): [] for pkd in groups for c in range(len(candidates))}
+    start = time.perf_counter()
+    done_folds = 0
+
+    with ProcessPoolExecutor(max_workers=max(n_workers, 1)) as executor:
+        for rung, n_folds in enumerate(RUNGS):
+            rung_cutoffs = cutoffs[done_folds:n_folds]
+            done_folds = n_folds
+
+            jobs = [
+                (pkd, c, cutoff)
+                for pkd, cands in alive.items()
+                for c in cands
+                for cutoff in rung_cutoffs
+            ]
+            futures = [
+                executor.submit(evaluate_fold, cutoff, pkd, target, groups[pkd], *candidates[c])
+                for pkd, c, cutoff in jobs
+            ]
+            for (pkd, c, _), future in zip(jobs, futures):
+                scores[(pkd, c)].append(future.result())
+
+            last_rung = rung == len(RUNGS) - 1
+            n_before = sum(len(c) for c in alive.values())
+            for pkd, cands in alive.items():
+                ranked = sorted(cands, key=lambda c: (np.mean(scores[(pkd, c)]), c))
+                alive[pkd] = ranked if last_rung else ranked[:max(1, int(np.ceil(len(ranked) / ETA)))]
+            n_after = sum(len(c) for c in alive.values())
+
+            print(f"   -> Szczebel {rung + 1}: {len(jobs)} foldów, foldy/kandydat: {done_folds}, "
+                  f"kandydaci {n_before} -> {n_after} ({time.perf_counter() - start:.1f}s)")
+
+    # Konfiguracje innych targetów z pliku zostają; nadpisujemy tylko strojony target
+    winners = load_tuned_params(output_file)
+    print("\n" + "=" * 100)
+    print(f"{'PKD':<6} | {'MASE':<7} | {'DOMYŚLNY vs NAJLEPSZY*':<22} | KONFIGURACJA")
+    print("-" * 100)
+    for pkd, cands in alive.items():
+        best = cands[0]
+        params, regs = candidates[best]
+        best_mase = float(np.mean(scores[(pkd, best)]))
+        # Domyślny kandydat mógł odpaść wcześniej - porównujemy na foldach, które przeszedł
+        n_default = len(scores[(pkd, 0)])
+        default_mase = float(np.mean(scores[(pkd, 0)]))
+        best_on_same = float(np.mean(scores[(pkd, best)][:n_default]))
+        winners.setdefault(str(pkd), {})[target] = {
+            'params': params,
+            'regressors': regs,
+            'target': target,
+            'MASE': best_mase,
+            'folds': len(scores[(pkd, best)]),
+            'cutoffs': cutoffs[:len(scores[(pkd, best)])],
+        }
+        print(f"{str(pkd):<6} | {best_mase:<7.3f} | {default_mase:<8.3f} vs {best_on_same:<8.3f} | {params} {regs}")
+    print("-" * 100)
+    print("* średni MASE na foldach, które przeszła konfiguracja domyślna")
+    print("=" * 100)
+
+    with open(output_file, 'w', encoding='utf-8') as f:
+        json.dump(winners, f, indent=2, ensure_ascii=False)
+    print(f"✅ Zapisano konfiguracje: {output_file} ({time.perf_counter() - start:.1f}s)")
+    return winners
+
+
+if __name__ == "__main__":
+    run_tuning(sys.argv[1] if len(sys.argv) > 1 else TUNE_TARGET)
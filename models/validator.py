@@ -1,143 +1,294 @@
 import pandas as pd
 import numpy as np
 import os
-from prophet import Prophet
-from sklearn.metrics import mean_absolute_error, mean_squared_error, r2_score
+import time
+from concurrent.futures import ProcessPoolExecutor
 import logging
+from forecaster import (
+    TARGETS, REGRESSORS, ENGINE, N_WORKERS, PROPHET_PARAMS, USE_MODEL_CACHE,
+    fit_model, build_covid_lockdowns, load_tuned_params, model_config, prepare_data
+)
+import batch_engine
+import metrics
 
 
 logging.getLogger('cmdstanpy').setLevel(logging.WARNING)
 logging.getLogger('prophet').setLevel(logging.WARNING)
 
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
 
-def calculate_metrics(y_true, y_pred, y_train_history):
-    y_true = np.array(y_true)
-    y_pred = np.array(y_pred)
+INPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'MASTER_DATA.csv')
+BACKTEST_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'backtest_metrics.csv')
+BACKTEST_HORIZON_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'backtest_metrics_by_horizon.csv')
 
-    mae = mean_absolute_error(y_true, y_pred)
-    rmse = np.sqrt(mean_squared_error(y_true, y_pred))
+CUTOFF_DATE = '2023-06-30'
 
-    mask = y_true != 0
-    mape = np.mean(np.abs((y_true[mask] - y_pred[mask]) / y_true[mask])) * 100
+# Backtest kroczący (rolling origin): punkty odcięcia, horyzont w miesiącach, okno treningowe
+BACKTEST_CUTOFFS = [
+    '2021-12-31', '2022-03-31', '2022-06-30', '2022-09-30', '2022-12-31',
+    '2023-03-31', '2023-06-30', '2023-09-30', '2023-12-31'
+]
+BACKTEST_HORIZON = 12
+BACKTEST_WINDOW = None  # None = okno rosnące (expanding), liczba = ostatnie N miesięcy (rolling)
 
-    r2 = r2_score(y_true, y_pred)
-    
-    smape = 100/len(y_true) * np.sum(2 * np.abs(y_pred - y_true) / (np.abs(y_true) + np.abs(y_pred) + 1e-10))
+MIN_TRAIN = 12
+MIN_TEST = 6
+
+# Tryb uruchomienia skryptu: 'audit' (jeden CUTOFF_DATE) lub 'backtest' (wiele punktów odcięcia)
+MODE = 'audit'
+
+
+def load_smoothed_data():
+    """Wygładzone targety/regresory z magazynu cech - te same, na których trenuje forecaster."""
+    if not os.path.exists(INPUT_FILE):
+        print(f"❌ Brak pliku {INPUT_FILE}")
+        return None
+    return prepare_data(INPUT_FILE)
+
+
+def split_fold(group, cutoff, horizon=None, window=None):
+    """Dzieli historię jednej branży na (train, test) względem punktu odcięcia."""
+    cutoff = pd.Timestamp(cutoff)
+    train = group[group['Date'] <= cutoff]
+    if window:
+        train = train[train['Date'] > cutoff - pd.DateOffset(months=window)]
+    test = group[group['Date'] > cutoff]
+    if horizon:
+        test = test.head(horizon)
+    return train, test
+
+
+def predict_fold_prophet(pkd, target, train, test, params=PROPHET_PARAMS, regressors=REGRESSORS,
+                         use_cache=USE_MODEL_CACHE):
+    """Trenuje Prophet na train i zwraca prognozę (przyciętą do 0-100) dla dat z test. None przy błędzie."""
+    prophet_train = train.rename(columns={'Date': 'ds', target: 'y'})
+
+    valid_regressors = [
+        reg for reg in regressors
+        if reg in prophet_train.columns and not prophet_train[reg].isnull().all()
+    ]
+
+    try:
+        m, _ = fit_model(pkd, target, prophet_train, valid_regressors, params, use_cache)
+
+        # Walidacja używa tylko yhat - bez symulacji przedziałów ufności w predict()
+        m.uncertainty_samples = 0
+        future = test[['Date'] + valid_regressors].rename(columns={'Date': 'ds'})
+        forecast = m.predict(future)
+        return forecast['yhat'].values.clip(0, 100)
+    except Exception:
+        return None
+
+
+def predict_holdout_batch(df_smooth, targets, regressors, cutoff_date, horizon=None, window=None):
+    """Silnik 'numpy': prognozy na okres testowy dla wszystkich (PKD, target) naraz -> {(pkd, target): yhat}."""
+    pkds = df_smooth['PKD_Code'].unique()
+    cutoff = pd.Timestamp(cutoff_date)
+    all_dates = pd.DatetimeIndex(np.sort(df_smooth['Date'].unique()))
+    train_dates = all_dates[all_dates <= cutoff]
+    if window:
+        train_dates = train_dates[train_dates > cutoff - pd.DateOffset(months=window)]
+    test_dates = all_dates[all_dates > cutoff]
+    if horizon:
+        test_dates = test_dates[:horizon]
+
+    y = batch_engine.panel(df_smooth, pkds, train_dates, targets)
+    x = batch_engine.panel(df_smooth, pkds, train_dates, regressors)
+    x_test = batch_engine.panel(df_smooth, pkds, test_dates, regressors)
+
+    n_targets = len(targets)
+    yhat, _, _ = batch_engine.fit_predict(
+        train_dates,
+        y.transpose(0, 2, 1).reshape(len(pkds) * n_targets, len(train_dates)),
+        np.repeat(x, n_targets, axis=0),
+        test_dates,
+        np.repeat(x_test, n_targets, axis=0),
+        holidays=build_covid_lockdowns()
+    )
+
+    predictions = {}
+    for i, pkd in enumerate(pkds):
+        for k, target in enumerate(targets):
+            predictions[(pkd, target)] = pd.Series(yhat[i * n_targets + k], index=test_dates)
+    return predictions
+
+
+def run_fold(cutoff, pkd, target, group, horizon, window, params=PROPHET_PARAMS, regressors=REGRESSORS,
+             use_cache=USE_MODEL_CACHE):
+    """
+    Zadanie dla puli procesów: jeden fold silnikiem Prophet.
+    Zwraca (y_true, y_pred, mianownik MASE, długość treningu) lub None.
+    """
+    train, test = split_fold(group, cutoff, horizon, window)
+    if len(test) < MIN_TEST or len(train) < MIN_TRAIN:
+        return None
+    y_pred = predict_fold_prophet(pkd, target, train, test, params, regressors, use_cache)
+    if y_pred is None:
+        return None
+    return test[target].values, y_pred, float(metrics.mase_scale(train[target].values)), len(train)
+
+
+def collect_folds(engine, df_smooth, cutoffs, targets, regressors, horizon=None, window=None, n_workers=N_WORKERS):
+    """
+    Prognozy wszystkich foldów w prealokowanych tablicach (fold, seria, horyzont), seria = (PKD, target).
+    Zwraca (y_true, y_pred, mianownik MASE (F, S), długość treningu (F, S), etykiety serii).
+    """
+    # Grupowanie raz - każdy fold dostaje gotowy wycinek swojej branży
+    groups = {
+        pkd: group.sort_values('Date')
+        for pkd, group in df_smooth.groupby('PKD_Code', sort=False)
+    }
+    series = [(pkd, target) for pkd in groups for target in targets]
+    n_steps = horizon or df_smooth['Date'].nunique()
+
+    y_true = np.full((len(cutoffs), len(series), n_steps), np.nan)
+    y_pred = np.full_like(y_true, np.nan)
+    scale = np.full((len(cutoffs), len(series)), np.nan)
+    n_train = np.zeros((len(cutoffs), len(series)), dtype=int)
 
-    if len(y_true) > 1:
-        diff_true = np.diff(y_true)
-        diff_pred = np.diff(y_pred)
-        da = np.mean(np.sign(diff_true) == np.sign(diff_pred)) * 100 if len(diff_true) > 0 else 0.0
+    def store(f, s, fold):
+        truth, pred, fold_scale, fold_train = fold
+        y_true[f, s, :len(truth)] = truth
+        y_pred[f, s, :len(pred)] = pred
+        scale[f, s] = fold_scale
+        n_train[f, s] = fold_train
+
+    if engine == 'numpy':
+        for f, cutoff in enumerate(cutoffs):
+            predictions = predict_holdout_batch(df_smooth, targets, regressors, cutoff, horizon, window)
+            for s, (pkd, target) in enumerate(series):
+                train, test = split_fold(groups[pkd], cutoff, horizon, window)
+                if len(test) < MIN_TEST or len(train) < MIN_TRAIN:
+                    continue
+                yhat = predictions[(pkd, target)].reindex(test['Date']).values
+                if np.isnan(yhat).any():
+                    continue
+                store(f, s, (test[target].values, yhat.clip(0, 100),
+                             metrics.mase_scale(train[target].values), len(train)))
     else:
-        da = 0.0
+        tuned = load_tuned_params()
+        keys = [(f, s) for f in range(len(cutoffs)) for s in range(len(series))]
+        jobs = [
+            (cutoffs[f], pkd, target, groups[pkd][['Date', target] + regressors], horizon, window,
+             *model_config(pkd, target, tuned, regressors))
+            for f, s in keys
+            for pkd, target in [series[s]]
+        ]
+        print(f"   -> {len(jobs)} foldów, procesy: {n_workers}")
+        if n_workers <= 1:
+            results = [run_fold(*job) for job in jobs]
+        else:
+            with ProcessPoolExecutor(max_workers=n_workers) as executor:
+                futures = [executor.submit(run_fold, *job) for job in jobs]
+                results = [future.result() for future in futures]
+        for (f, s), fold in zip(keys, results):
+            if fold is not None:
+                store(f, s, fold)
 
-    n = len(y_train_history)
-    d = np.abs(np.diff(y_train_history)).sum() / (n - 1)
-    mase = mae / d if d != 0 else np.inf
+    return y_true, y_pred, scale, n_train, series
 
-    var_true = np.var(y_true)
-    var_pred = np.var(y_pred)
-    vr = var_pred / var_true if var_true != 0 else 0.0
-    
-    return {'MAE': mae, 'RMSE': rmse, 'MAPE': mape, 'R2': r2, 'SMAPE': smape, 'DA': da, 'MASE': mase, 'VR': vr}
 
+def fold_coords(cutoffs, series, n_steps):
+    """Etykiety osi tablic foldów dla metrics.evaluate."""
+    return {
+        'Cutoff': (0, [pd.Timestamp(c).date().isoformat() for c in cutoffs]),
+        'PKD_Code': (1, [pkd for pkd, _ in series]),
+        'Target': (1, [target for _, target in series]),
+        'Horizon': (2, np.arange(1, n_steps + 1)),
+    }
 
-def run_validator_multi_target():
-    print("Uruchamiam PEŁNY AUDYT MODELU (8 Metryk)...")
 
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.dirname(SCRIPT_DIR)
-    
-    INPUT_FILE = os.path.join(PROJECT_ROOT, 'my-react-app', 'public', 'data', 'processed', 'MASTER_DATA.csv')
+def run_backtest(engine=ENGINE, cutoffs=BACKTEST_CUTOFFS, horizon=BACKTEST_HORIZON,
+                 window=BACKTEST_WINDOW, n_workers=N_WORKERS):
+    """Backtest kroczący: metryki dla każdego (cutoff, PKD, target) zapisane do BACKTEST_FILE."""
+    print(f"Uruchamiam BACKTEST KROCZĄCY ({len(cutoffs)} punktów odcięcia, horyzont {horizon}M, silnik: {engine})...")
 
-    CUTOFF_DATE = '2023-06-30'
-    
-    TARGETS = [
-        'PKO_SCORE_FINAL', 'Rank_Growth', 'Rank_Slowdown', 'Rank_Loan_Needs', 'Rank_Trend_Signal'
+    df_smooth = load_smoothed_data()
+    if df_smooth is None:
+        return None
+
+    targets = [t for t in TARGETS if t in df_smooth.columns]
+    regressors = [r for r in REGRESSORS if r in df_smooth.columns]
+
+    start = time.perf_counter()
+    y_true, y_pred, scale, n_train, series = collect_folds(
+        engine, df_smooth, cutoffs, targets, regressors, horizon, window, n_workers
+    )
+    elapsed = time.perf_counter() - start
+
+    metrics_start = time.perf_counter()
+    coords = fold_coords(cutoffs, series, y_true.shape[2])
+    metrics_df = metrics.evaluate(y_true, y_pred, scale, coords, ['Cutoff', 'PKD_Code', 'Target'])
+    by_horizon = metrics.evaluate(y_true, y_pred, scale, coords, ['Target', 'Horizon'])
+    summary = metrics.evaluate(y_true, y_pred, scale, coords, ['Target']).set_index('Target')
+    metrics_time = time.perf_counter() - metrics_start
+
+    if metrics_df.empty:
+        print("⚠️ Brak poprawnych foldów.")
+        return None
+
+    train_lengths = pd.DataFrame({
+        'Cutoff': np.repeat(coords['Cutoff'][1], len(series)),
+        'PKD_Code': np.tile(coords['PKD_Code'][1], len(cutoffs)),
+        'Target': np.tile(coords['Target'][1], len(cutoffs)),
+        'N_Train': n_train.ravel(),
+    })
+    metrics_df = metrics_df.merge(train_lengths, on=['Cutoff', 'PKD_Code', 'Target'])
+    metrics_df.insert(3, 'Engine', engine)
+    # Foldy, na których tuner wybierał konfigurację danej pary - dla nich metryki są in-sample
+    tuned = load_tuned_params()
+    tuning_folds = {
+        (pkd, target, pd.Timestamp(c).date().isoformat())
+        for pkd, configs in tuned.items() for target, config in configs.items() for c in config.get('cutoffs', [])
+    }
+    metrics_df['Tuning_Fold'] = [
+        (str(pkd), target, cutoff) in tuning_folds
+        for pkd, target, cutoff in zip(metrics_df['PKD_Code'], metrics_df['Target'], metrics_df['Cutoff'])
     ]
-    
-    REGRESSORS = ['WIBOR', 'Google_Trends', 'Energy_Price']
+    metrics_df = metrics_df[['Cutoff', 'PKD_Code', 'Target', 'Engine', 'N', 'N_Train', 'Tuning_Fold'] + metrics.METRICS]
+    metrics_df.to_csv(BACKTEST_FILE, index=False)
+    by_horizon.to_csv(BACKTEST_HORIZON_FILE, index=False)
 
-    covid_lockdowns = pd.DataFrame([
-        {'holiday': 'lockdown_1', 'ds': '2020-03-01', 'lower_window': 0, 'upper_window': 2},
-        {'holiday': 'lockdown_2', 'ds': '2020-10-01', 'lower_window': 0, 'upper_window': 3},
-        {'holiday': 'lockdown_3', 'ds': '2021-03-01', 'lower_window': 0, 'upper_window': 1},
-    ])
-    covid_lockdowns['ds'] = pd.to_datetime(covid_lockdowns['ds'])
+    print(f"✅ {len(metrics_df)} foldów w {elapsed:.1f}s (metryki: {metrics_time * 1000:.0f} ms). Tabela metryk: {BACKTEST_FILE}")
+    print("\n" + "="*120)
+    print("METRYKI PER TARGET (wszystkie foldy, MASE skalowany per seria)")
+    print("="*120)
+    print(summary[metrics.METRICS].replace([np.inf, -np.inf], np.nan).round(2).to_string())
+    if metrics_df['Tuning_Fold'].any():
+        print("-" * 120)
+        print("MASE: FOLDY STROJENIA (in-sample dla konfiguracji z tuner.py) vs POZOSTAŁE (out-of-sample)")
+        tuning = metrics_df.replace([np.inf, -np.inf], np.nan).groupby(['Target', 'Tuning_Fold'])['MASE'].mean().unstack()
+        print(tuning.rename(columns={True: 'strojenie', False: 'out-of-sample'}).round(2).to_string())
+    print("-" * 120)
+    print("MAE PER PUNKT ODCIĘCIA")
+    print(metrics_df.pivot_table(index='Target', columns='Cutoff', values='MAE', aggfunc='mean').round(2).to_string())
+    print("-" * 120)
+    print(f"MAE PER KROK HORYZONTU ({BACKTEST_HORIZON_FILE})")
+    print(by_horizon.pivot(index='Target', columns='Horizon', values='MAE').round(2).to_string())
+    print("="*120)
 
-    if not os.path.exists(INPUT_FILE):
-        print(f"❌ Brak pliku {INPUT_FILE}")
-        return
+    return metrics_df
 
-    df = pd.read_csv(INPUT_FILE)
-    df['Date'] = pd.to_datetime(df['Date'])
 
-    print("🌊 Wygładzam dane historyczne (Rolling Mean 6M)...")
-    df_smooth = df.copy().sort_values(['PKD_Code', 'Date'])
-    cols_to_smooth = TARGETS + [r for r in REGRESSORS if r in df.columns]
-    
-    for col in cols_to_smooth:
-        if col in df_smooth.columns:
-            df_smooth[col] = df_smooth.groupby('PKD_Code')[col].transform(
-                lambda x: x.rolling(window=6, min_periods=1).mean()
-            )
+def run_validator_multi_target(engine=ENGINE):
+    print(f"Uruchamiam PEŁNY AUDYT MODELU (8 Metryk, silnik: {engine})...")
+
+    df_smooth = load_smoothed_data()
+    if df_smooth is None:
+        return
 
-    unique_industries = df_smooth['PKD_Code'].unique()
-    final_metrics = {}
+    targets = [t for t in TARGETS if t in df_smooth.columns]
+    regressors = [r for r in REGRESSORS if r in df_smooth.columns]
 
     print(f"Data Splitu: {CUTOFF_DATE}")
     print("-" * 120)
 
-    for target in TARGETS:
-        if target not in df_smooth.columns: continue
-            
-        print(f"🚀 Testuję: {target}...")
-        all_y_true = []
-        all_y_pred = []
-        all_train_history = []
-        
-        for pkd in unique_industries:
-            group = df_smooth[df_smooth['PKD_Code'] == pkd].sort_values('Date').copy()
-            
-            train = group[group['Date'] <= CUTOFF_DATE].copy()
-            test = group[group['Date'] > CUTOFF_DATE].copy()
-            
-            if len(test) < 6 or len(train) < 12: continue
-
-            all_train_history.extend(train[target].values)
-            
-            prophet_train = train.rename(columns={'Date': 'ds', target: 'y'})
-
-            m = Prophet(
-                yearly_seasonality=True, weekly_seasonality=False, daily_seasonality=False,
-                holidays=covid_lockdowns,
-                changepoint_prior_scale=0.01 
-            )
-            
-            valid_regressors = []
-            for reg in REGRESSORS:
-                if reg in prophet_train.columns and not prophet_train[reg].isnull().all():
-                    m.add_regressor(reg)
-                    valid_regressors.append(reg)
-            
-            try:
-                m.fit(prophet_train)
-                
-                future = test[['Date'] + valid_regressors].rename(columns={'Date': 'ds'})
-                forecast = m.predict(future)
-
-                soft_clipped = forecast['yhat'].values.clip(0, 100)
-                
-                all_y_true.extend(test[target].values)
-                all_y_pred.extend(soft_clipped)
-                
-            except Exception:
-                continue
-
-        if all_y_true:
-            m = calculate_metrics(all_y_true, all_y_pred, all_train_history)
-            final_metrics[target] = m
-            print(f"   -> MAE: {m['MAE']:.2f} | MASE: {m['MASE']:.2f} | VR: {m['VR']:.2f}")
+    y_true, y_pred, scale, _, series = collect_folds(engine, df_smooth, [CUTOFF_DATE], targets, regressors)
+    coords = fold_coords([CUTOFF_DATE], series, y_true.shape[2])
+    per_target = metrics.evaluate(y_true, y_pred, scale, coords, ['Target']).set_index('Target')
+    per_pkd = metrics.evaluate(y_true, y_pred, scale, coords, ['PKD_Code', 'Target'])
+    final_metrics = {target: per_target.loc[target] for target in targets if target in per_target.index}
 
     print("\n" + "="*120)
     print(f"RAPORT KOŃCOWY (AUDYT 8 METRYK)")
@@ -146,12 +297,17 @@ def run_validator_multi_target():
     print("-" * 120)
     
     for target, m in final_metrics.items():
-        if not m: continue
         rating = "WYBITNA" if m['MAE'] < 10 and m['MASE'] < 1 else "BARDZO DOBRA" if m['MAE'] < 15 and m['MASE'] < 1.5 else "DOBRA"
         r2_str = f"{m['R2']:.2f}"
         print(f"{target:<22} | {m['MAE']:<6.2f} | {m['RMSE']:<6.2f} | {m['MAPE']:<6.1f} | {r2_str:<7} | {m['SMAPE']:<6.1f} | {m['DA']:<6.1f} | {m['MASE']:<6.2f} | {m['VR']:<6.2f} | {rating}")
     
     print("="*120)
+    print("MASE PER BRANŻA")
+    print(per_pkd.pivot(index='PKD_Code', columns='Target', values='MASE')[targets].round(2).to_string())
+    print("="*120)
 
 if __name__ == "__main__":
-    run_validator_multi_target()
\ No newline at end of file
+    if MODE == 'backtest':
+        run_backtest()
+    else:
+        run_validator_multi_target()
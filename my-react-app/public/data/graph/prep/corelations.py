@@ -1,11 +1,10 @@
 import csv
 import os  # <--- 1. Dodano bibliotekę os
+import sys
 
-# List of industries to keep (Exact match required)
-KEY_INDUSTRIES = [
-    '01', '10', '16', '23', '24', '29', '31', '35', 
-    '41', '68', '46', '47', '49', '55', '62'
-]
+# List of industries to keep: models/industries.yaml (code or any of its parent levels listed)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', '..', 'models'))
+import industries
 
 def parse_csv_data(file_path):
     dependency_dict = {}
@@ -31,7 +30,7 @@ def parse_csv_data(file_path):
                 
                 # Filter: Identify which columns match KEY_INDUSTRIES
                 for idx, pkd in enumerate(raw_headers):
-                    if pkd in KEY_INDUSTRIES:
+                    if industries.is_key(pkd):
                         target_indices.append((idx, pkd))
                         dependency_dict[pkd] = [] # Initialize list for this industry
                 
@@ -44,7 +43,7 @@ def parse_csv_data(file_path):
                 supplier_pkd = clean(row[0])
                 
                 # Filter: Skip rows that are NOT in our key list
-                if supplier_pkd not in KEY_INDUSTRIES:
+                if not industries.is_key(supplier_pkd):
                     continue
                 
                 values = row[1:]
@@ -1,5 +1,10 @@
 import pandas as pd
 import os
+import sys
+
+# Odczyt kolumnowy (.feather obok CSV) z katalogu models/
+sys.path.insert(0, os.path.normpath(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', '..', '..', '..', '..', 'models')))
+import columnar
 
 def getScores():
     # 1. Pobierz folder, w którym leży TEN skrypt (czyli .../data/graph/prep)
@@ -15,10 +20,10 @@ def getScores():
     print(f"Szukam pliku tutaj: {file_path}") # Dla pewności zobaczysz, gdzie szuka
 
     try:
-        # dtype={'PKD_Code': str} jest kluczowe!
-        df = pd.read_csv(file_path, dtype={'PKD_Code': str})
+        # Tylko 3 potrzebne kolumny; PKD_Code zawsze jako tekst ('01')
+        df = columnar.read_table(file_path, ['Date', 'PKD_Code', 'PKO_SCORE_FINAL'])
+        df['PKD_Code'] = df['PKD_Code'].astype(str)
 
-        df['Date'] = pd.to_datetime(df['Date'])
         df = df.sort_values(by='Date', ascending=False)
         latest_df = df.drop_duplicates(subset='PKD_Code', keep='first')
         
@@ -1,7 +1,10 @@
 import pandas as pd
 import numpy as np
-from sklearn.preprocessing import MinMaxScaler
+from concurrent.futures import ProcessPoolExecutor
 import os
+import sys
+import json
+import time
 
 # --- KONFIGURACJA ---
 USE_MOCK_DATA = False
@@ -10,13 +13,93 @@ USE_MOCK_DATA = False
 # skrypt jest w folderze Hacknation/data/processors/
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 
+# Zapis kolumnowy (.feather obok CSV) wspólny z modelami
+sys.path.insert(0, os.path.normpath(os.path.join(SCRIPT_DIR, '..', '..', '..', '..', 'models')))
+import columnar
+import memory_budget
+import industries
+
 # Używamy plików z końcówką v2
 PATH_HARD = os.path.join(os.path.dirname(SCRIPT_DIR), 'processed', 'hard_datav2.csv')
 PATH_SOFT = os.path.join(os.path.dirname(SCRIPT_DIR), 'processed', 'soft_datav2.csv')
 PATH_OUTPUT = os.path.join(os.path.dirname(SCRIPT_DIR), 'processed', 'MASTER_DATA.csv')
+# Miesięczne liczniki upadłości z rejestru KRZ (HardDataMiner) - zastępują interpolowany roczny Bankruptcy_Rate
+PATH_BANKRUPTCY_MONTHLY = os.path.join(os.path.dirname(SCRIPT_DIR), 'processed', 'bankruptcy_monthly.csv')
+
+# Tryb przyrostowy: nowe miesiące dopisywane do MASTER_DATA bez przeliczania historii.
+# Pełne przeliczenie tylko gdy nowe dane wychodzą poza granice normalizacji min-max (albo brak stanu).
+INCREMENTAL = True
+PATH_INDEX_STATE = os.path.join(os.path.dirname(SCRIPT_DIR), 'processed', 'MASTER_DATA.state.json')
+TAIL_MONTHS = 12  # najdłuższe okno cech: pct_change(12), rolling(12)
+TAIL_COLUMNS = ['Date', 'PKD_Code', 'Revenue', 'Employment', 'PKO_SCORE_FINAL']
+
+# Upsampling rok -> miesiąc: liczba procesów (kody PKD dzielone na paczki); 1 = bez puli
+UPSAMPLE_WORKERS = 1
+
+# Liczby kodów PKD w benchmarku upsamplingu (python data_architect.py --bench; tam też porównanie CSV vs .feather)
+BENCHMARK_SIZES = [15, 100, 1000]
+
+# Lista branż (do generatora mocków) z konfiguracji models/industries.yaml; pusta lista = wszystkie działy
+KEY_INDUSTRIES = sorted(industries.KEY_INDUSTRIES or industries.DIVISIONS)
+
+# Poziom PKD, na którym liczony jest indeks (hard data ma agregaty sekcji, działów, grup i klas)
+INDEX_LEVEL = 'division'
 
-# Lista branż (do generatora mocków)
-KEY_INDUSTRIES = ['01', '10', '16', '23', '24', '29', '31', '35', '41', '46', '47', '49', '55', '62', '68']
+# Wrażliwość branż na stopy i ceny energii
+RISK_SENSITIVITY = {
+    '41': {'wibor': 1.0, 'energy': 0.3}, # Budowlanka
+    '68': {'wibor': 1.0, 'energy': 0.2}, # Nieruchomości
+    '24': {'wibor': 0.4, 'energy': 1.0}, # Metale
+    '35': {'wibor': 0.3, 'energy': -0.5},# Energetyka
+    '49': {'wibor': 0.5, 'energy': 0.9}, # Transport
+    '10': {'wibor': 0.4, 'energy': 0.6}, # Spożywka
+    '62': {'wibor': 0.1, 'energy': 0.1}, # IT
+}
+
+# Kolumny normalizowane min-max (0-100) na całej historii
+NORM_COLUMNS = {
+    'Rev_Growth_YoY': 'Norm_Growth',
+    'Profit_Margin': 'Norm_Margin',
+    'Google_Trends': 'Norm_Google',     
+    'WIBOR': 'Norm_WIBOR',              
+    'Energy_Price': 'Norm_Energy',      
+    'Bankruptcy_Rate': 'Norm_Bankrupt', 
+    'Liquidity_Calc': 'Norm_Liquidity', 
+    'Employment_Growth': 'Norm_Employ'  
+}
+RANK_COLUMNS = ['Rank_Slowdown', 'Rank_Loan_Needs', 'Rank_Trend_Signal']
+
+# Wagi PKO_SCORE (cecha -> waga); cechy ryzyka wchodzą odwrócone: waga * (100 - cecha).
+# Inne zestawy wag i wrażliwości: weight_sweep.py
+SCORE_WEIGHTS = {
+    'Norm_Margin': 0.15,
+    'Norm_Growth': 0.15,
+    'Norm_Liquidity': 0.10,
+    'Norm_Google': 0.20,
+    'Norm_Employ': 0.10,
+    'Norm_Total_Risk': 0.15,
+    'Norm_Bankrupt': 0.15,
+}
+INVERTED_FEATURES = ['Norm_Total_Risk', 'Norm_Bankrupt']
+
+# Atrybucja: wkład każdego składnika w PKO_SCORE (suma = PKO_SCORE), ryzyko złożone rozbite na WIBOR / energię
+# i stałą bazę; Delta_* = zmiana m/m wkładu w punktach PKO_SCORE_FINAL (suma = zmiana PKO_SCORE_FINAL)
+CONTRIB_COLUMNS = [
+    'Contrib_Margin', 'Contrib_Growth', 'Contrib_Liquidity', 'Contrib_Google', 'Contrib_Employ',
+    'Contrib_Risk_WIBOR', 'Contrib_Risk_Energy', 'Contrib_Risk_Base', 'Contrib_Bankrupt',
+]
+DELTA_COLUMNS = ['Delta_' + c[len('Contrib_'):] for c in CONTRIB_COLUMNS if c != 'Contrib_Risk_Base']
+
+# Kluczowe kolumny + RANKINGI zapisywane do MASTER_DATA
+COLS_TO_SAVE = [
+    'Date', 'PKD_Code', 
+    'PKO_SCORE_FINAL', 'PKO_SCORE',
+    'Revenue', 'Profit', 'Liquidity_Calc', 'Employment', 'Bankruptcy_Rate',
+    'Google_Trends', 'WIBOR', 'Energy_Price',
+    'Norm_Growth', 'Norm_Margin', 'Norm_Liquidity', 'Norm_Employ',
+    'Norm_Google', 'Norm_Total_Risk', 'Norm_Bankrupt',
+    'Rank_Growth', 'Rank_Slowdown', 'Rank_Loan_Needs', 'Rank_Trend_Signal'
+] + CONTRIB_COLUMNS + ['Rescale_Effect'] + DELTA_COLUMNS
 
 def generate_full_mock_data():
     """Plan B: Generuje kompletny zestaw danych (Hard + Soft) z powietrza."""
@@ -58,6 +141,9 @@ def load_real_data():
         # --- 1. Hard Data ---
         print(f"   -> Przetwarzanie {PATH_HARD}...")
         df_hard = pd.read_csv(PATH_HARD, parse_dates=['Date'], dtype={'PKD_Code': str})
+        if 'PKD_Level' in df_hard.columns:
+            df_hard = df_hard[df_hard['PKD_Level'] == INDEX_LEVEL].drop(columns='PKD_Level')
+        df_hard = memory_budget.compact(df_hard)
         
         # Uzupełnianie zer
         cols_to_fix = ['Current_Assets', 'Short_Term_Liabilities', 'Employment', 'Liquidity_Ratio']
@@ -65,19 +151,10 @@ def load_real_data():
             if col in df_hard.columns:
                 df_hard[col] = df_hard[col].replace(0, np.nan)
 
-        # Upsampling (Interpolacja)
-        upsampled_dfs = []
-        for pkd, group in df_hard.groupby('PKD_Code'):
-            temp_group = group.drop(columns=['PKD_Code'], errors='ignore')
-            temp_group = temp_group.sort_values('Date').set_index('Date')
-            
-            temp_group = temp_group.resample('MS').interpolate(method='linear')
-            temp_group = temp_group.bfill().ffill()
-            
-            temp_group['PKD_Code'] = pkd
-            upsampled_dfs.append(temp_group.reset_index())
-            
-        df_hard_monthly = pd.concat(upsampled_dfs)
+        # Upsampling (Interpolacja) - wszystkie branże naraz (w trybie lean partiami branż)
+        with memory_budget.stage('upsampling'):
+            df_hard_monthly = memory_budget.by_partition(df_hard, upsample_monthly)
+        df_hard_monthly = monthly_bankruptcy_rate(df_hard_monthly)
         
         # --- 2. Soft Data ---
         print(f"   -> Przetwarzanie {PATH_SOFT}...")
@@ -95,18 +172,192 @@ def load_real_data():
         print("  -> Łączenie tabel...")
         master_df = pd.merge(df_hard_monthly, df_soft_monthly, on=['Date', 'PKD_Code'], how='inner')
         master_df = master_df.fillna(0)
-        return master_df
+        return memory_budget.compact(master_df)
 
     except Exception as e:
         print(f" Wyjątek w ETL: {e}")
         return generate_full_mock_data()
 
-def calculate_index(df):
-    print(" Przeliczanie Algorytmu PKO FutureIndex V8.0 (z Rankingami)...")
+def upsample_per_group(df_hard):
+    """Dawna ścieżka: resample + interpolacja osobno dla każdej branży (wzorzec do benchmarku)."""
+    upsampled_dfs = []
+    for pkd, group in df_hard.groupby('PKD_Code'):
+        temp_group = group.drop(columns=['PKD_Code'], errors='ignore')
+        temp_group = temp_group.sort_values('Date').set_index('Date')
+        
+        temp_group = temp_group.resample('MS').interpolate(method='linear')
+        temp_group = temp_group.bfill().ffill()
+        
+        temp_group['PKD_Code'] = pkd
+        upsampled_dfs.append(temp_group.reset_index())
+        
+    return pd.concat(upsampled_dfs)
+
+
+def upsample_monthly(df_hard, n_workers=UPSAMPLE_WORKERS):
+    """
+    Dane roczne -> miesięczne dla wszystkich branż jedną operacją na indeksie (PKD_Code, miesiąc).
+    Interpolacja liniowa między obserwacjami branży, brzegi uzupełniane najbliższą wartością
+    (jak resample('MS').interpolate() + bfill().ffill() per branża).
+    """
+    if n_workers > 1:
+        codes = df_hard['PKD_Code'].unique()
+        chunks = [df_hard[df_hard['PKD_Code'].isin(part)] for part in np.array_split(codes, n_workers)]
+        with ProcessPoolExecutor(max_workers=n_workers) as pool:
+            return pd.concat(pool.map(upsample_monthly, chunks, [1] * len(chunks)), ignore_index=True)
+
+    df = df_hard.sort_values(['PKD_Code', 'Date'])
+    value_cols = [c for c in df.columns if c not in ('PKD_Code', 'Date')]
+    numeric_cols = [c for c in value_cols if pd.api.types.is_numeric_dtype(df[c])]
+
+    # Siatka miesięcy od pierwszej do ostatniej obserwacji każdej branży
+    month = (df['Date'].dt.year * 12 + df['Date'].dt.month - 1).to_numpy()
+    span = pd.DataFrame({'PKD_Code': df['PKD_Code'].to_numpy(), 'Month': month}).groupby('PKD_Code', sort=False)['Month'].agg(['min', 'max'])
+    lengths = (span['max'] - span['min'] + 1).to_numpy()
+    codes = np.repeat(span.index.to_numpy(), lengths)
+    starts = np.cumsum(lengths) - lengths
+    grid_month = np.repeat(span['min'].to_numpy(), lengths) + np.arange(lengths.sum()) - np.repeat(starts, lengths)
+
+    grid = pd.MultiIndex.from_arrays([codes, grid_month])
+    values = df[value_cols].set_axis(pd.MultiIndex.from_arrays([df['PKD_Code'].to_numpy(), month])).reindex(grid)
+    values = values.reset_index(drop=True)
+
+    # Liniowo: poprzednia i następna obserwacja branży (wartość + pozycja), wzór jak w np.interp
+    y = values[numeric_cols].to_numpy(dtype=float)
+    pos = np.arange(len(values), dtype=float)[:, None]
+    known_pos = pd.DataFrame(np.where(np.isnan(y), np.nan, pos), columns=numeric_cols)
+
+    def by_code(frame, fill):
+        return getattr(frame.groupby(codes, sort=False), fill)().to_numpy(dtype=float)
+
+    y_frame = pd.DataFrame(y, columns=numeric_cols)
+    prev_y, next_y = by_code(y_frame, 'ffill'), by_code(y_frame, 'bfill')
+    prev_pos, next_pos = by_code(known_pos, 'ffill'), by_code(known_pos, 'bfill')
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        between = (next_y - prev_y) / (next_pos - prev_pos) * (pos - prev_pos) + prev_y
+    edge = np.where(np.isnan(prev_y), next_y, prev_y)
+    filled = np.where(~np.isnan(y), y, np.where(np.isnan(prev_y) | np.isnan(next_y), edge, between))
+    values[numeric_cols] = filled
+
+    other_cols = [c for c in value_cols if c not in numeric_cols]
+    if other_cols:
+        values[other_cols] = values.groupby(codes, sort=False)[other_cols].bfill()
+        values[other_cols] = values.groupby(codes, sort=False)[other_cols].ffill()
+
+    dates = (grid_month - 1970 * 12).astype('datetime64[M]').astype('datetime64[ns]')
+    return pd.concat([pd.DataFrame({'Date': dates}), values, pd.DataFrame({'PKD_Code': codes})], axis=1)
+
+
+def monthly_bankruptcy_rate(df, path=PATH_BANKRUPTCY_MONTHLY):
+    """
+    Bankruptcy_Rate z miesięcznych liczników KRZ zamiast interpolacji rocznego wskaźnika:
+    upadłości w miesiącu x 12 / liczba firm (skala roczna jak w hard_datav2). Miesiąc bez postępowań w zakresie
+    rejestru = 0; miesiące spoza zakresu (albo brak pliku miesięcznego) zostają z interpolacji.
+    """
+    if not os.path.exists(path) or 'Company_Count' not in df.columns:
+        return df
+    monthly = pd.read_csv(path, parse_dates=['Date'], dtype={'PKD_Code': str})
+    monthly = monthly[monthly['PKD_Level'] == INDEX_LEVEL]
+    if monthly.empty:
+        return df
+
+    counts = monthly.set_index(['PKD_Code', 'Date'])['Liczba_Upadlosci']
+    keys = pd.MultiIndex.from_arrays([df['PKD_Code'].astype(str), df['Date']])
+    count = counts.reindex(keys).fillna(0).to_numpy(dtype=float)
+    companies = df['Company_Count'].to_numpy(dtype=float)
+    covered = df['Date'].between(monthly['Date'].min(), monthly['Date'].max()).to_numpy()
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rate = np.where(companies > 0, count * 12 / companies, 0.0)
+    df['Bankruptcy_Rate'] = np.where(covered, rate, df['Bankruptcy_Rate'].to_numpy(dtype=float))
+    print(f"   -> Bankruptcy_Rate miesięcznie z KRZ: {covered.sum()} z {len(df)} wierszy ({os.path.basename(path)})")
+    return df
+
+
+def benchmark_upsampling(sizes=BENCHMARK_SIZES):
+    """Porównanie czasu i wyników: pętla per branża vs wektorowo, na syntetycznych danych rocznych."""
+    rng = np.random.default_rng(0)
+    print(f"{'KODY':<6} | {'PĘTLA (s)':<10} | {'WEKTOR (s)':<10} | {'PRZYSP.':<8} | MAX |RÓŻNICA|")
+    for n_codes in sizes:
+        years = pd.date_range('2005-01-01', '2024-01-01', freq='YS')
+        df = pd.DataFrame({
+            'PKD_Code': np.repeat([f"{i:04d}" for i in range(n_codes)], len(years)),
+            'Date': np.tile(years, n_codes),
+        })
+        for col in ['Revenue', 'Profit', 'Current_Assets', 'Employment']:
+            df[col] = rng.normal(1000, 200, len(df))
+            df.loc[rng.random(len(df)) < 0.1, col] = np.nan  # luki jak po replace(0, np.nan)
+        df = df[rng.random(len(df)) > 0.05]  # brakujące lata
+
+        start = time.perf_counter()
+        old = upsample_per_group(df).reset_index(drop=True)
+        t_old = time.perf_counter() - start
+        start = time.perf_counter()
+        new = upsample_monthly(df)
+        t_new = time.perf_counter() - start
+
+        diff = np.nanmax(np.abs(old[new.columns].drop(columns=['Date', 'PKD_Code']).to_numpy() - new.drop(columns=['Date', 'PKD_Code']).to_numpy()))
+        print(f"{n_codes:<6} | {t_old:<10.3f} | {t_new:<10.3f} | {t_old / t_new:<8.1f} | {diff:.1e}")
+
+
+def minmax_scale(low, high):
+    """Mnożnik min-max 0-100 (zakres bliski zera -> 1, jak w MinMaxScaler)."""
+    data_range = np.subtract(high, low)
+    return 100.0 / np.where(data_range >= 10 * np.finfo(float).eps, data_range, 1.0)
+
+
+def minmax(values, low, high):
+    """Jak MinMaxScaler(feature_range=(0, 100)) dopasowany do zakresu [low, high] (te same operacje; low/high mogą być wektorami)."""
+    scale = minmax_scale(low, high)
+    return values * scale + (0.0 - low * scale)
+
+
+def normalize(df, source, target, bounds, fit_rows, constant=None):
+    """
+    Min-max 0-100 kolumny source -> target. Granice = bieżące min/max (bounds) rozszerzone o wiersze fit_rows,
+    więc w trybie przyrostowym zmiana bounds oznacza konieczność pełnego przeliczenia.
+    constant: wartość dla kolumny stałej (jak warunek std() == 0).
+    """
+    observed = df.loc[fit_rows, source]
+    low, high = bounds.get(source, (np.inf, -np.inf))
+    bounds[source] = (min(low, float(observed.min())), max(high, float(observed.max())))
+    low, high = bounds[source]
+
+    if constant is not None and low == high:
+        df[target] = constant
+    else:
+        df[target] = minmax(df[source].to_numpy(dtype=float), low, high)
+
+
+def score_features(df, features=SCORE_WEIGHTS):
+    """Kolumny cech score'u w kolejności wag (cechy ryzyka odwrócone: 100 - x)."""
+    return [100 - df[f] if f in INVERTED_FEATURES else df[f] for f in features]
+
+
+def attribute(df, bounds):
+    """Kolumny Contrib_* (suma = PKO_SCORE) i Rescale_Effect (PKO_SCORE_FINAL - PKO_SCORE)."""
+    for (feature, weight), values in zip(SCORE_WEIGHTS.items(), score_features(df)):
+        if feature != 'Norm_Total_Risk':
+            df['Contrib_' + feature[len('Norm_'):]] = weight * values
+
+    # Norm_Total_Risk = skala * (surowe - min), surowe = WIBOR * wrażliwość + energia * wrażliwość,
+    # więc waga * (100 - Norm_Total_Risk) = baza - kara za WIBOR - kara za energię
+    weight = SCORE_WEIGHTS['Norm_Total_Risk']
+    low, high = bounds['Total_Risk_Raw']
+    scale = minmax_scale(low, high)
+    df['Contrib_Risk_WIBOR'] = -weight * scale * df['Norm_WIBOR'] * df['Risk_WIBOR_Weight']
+    df['Contrib_Risk_Energy'] = -weight * scale * df['Norm_Energy'] * df['Risk_Energy_Weight']
+    df['Contrib_Risk_Base'] = weight * (100 + scale * low)
+    df['Rescale_Effect'] = df['PKO_SCORE_FINAL'] - df['PKO_SCORE']
+
+
+def score_rows(df, bounds, fit_rows):
+    """Cechy, normalizacja i PKO_SCORE_FINAL (kroki 1-5)."""
     df = df.sort_values(['PKD_Code', 'Date'])
+    fit_rows = fit_rows.reindex(df.index)
     
     # --- 1. INŻYNIERIA CECH ---
-    df['Rev_Growth_YoY'] = df.groupby('PKD_Code')['Revenue'].pct_change(periods=12).fillna(0)
+    df['Rev_Growth_YoY'] = df.groupby('PKD_Code', observed=True)['Revenue'].pct_change(periods=12).fillna(0)
     df['Profit_Margin'] = df['Profit'] / df['Revenue'].replace(0, 1)
     
     # Płynność
@@ -118,47 +369,21 @@ def calculate_index(df):
         
     # Zatrudnienie
     if 'Employment' in df.columns:
-        df['Employment_Growth'] = df.groupby('PKD_Code')['Employment'].pct_change(periods=12).fillna(0)
+        df['Employment_Growth'] = df.groupby('PKD_Code', observed=True)['Employment'].pct_change(periods=12).fillna(0)
     else:
         df['Employment_Growth'] = 0
 
     # --- 2. WRAŻLIWOŚĆ ---
-    risk_sensitivity = {
-        '41': {'wibor': 1.0, 'energy': 0.3}, # Budowlanka
-        '68': {'wibor': 1.0, 'energy': 0.2}, # Nieruchomości
-        '24': {'wibor': 0.4, 'energy': 1.0}, # Metale
-        '35': {'wibor': 0.3, 'energy': -0.5},# Energetyka
-        '49': {'wibor': 0.5, 'energy': 0.9}, # Transport
-        '10': {'wibor': 0.4, 'energy': 0.6}, # Spożywka
-        '62': {'wibor': 0.1, 'energy': 0.1}, # IT
-    }
-    
     def get_risk(pkd, kind):
-        return risk_sensitivity.get(pkd, {'wibor': 0.5, 'energy': 0.5}).get(kind, 0.5)
+        return RISK_SENSITIVITY.get(pkd, {'wibor': 0.5, 'energy': 0.5}).get(kind, 0.5)
 
     df['Risk_WIBOR_Weight'] = df['PKD_Code'].apply(lambda x: get_risk(x, 'wibor'))
     df['Risk_Energy_Weight'] = df['PKD_Code'].apply(lambda x: get_risk(x, 'energy'))
 
     # --- 3. NORMALIZACJA ---
-    scaler = MinMaxScaler(feature_range=(0, 100))
-    
-    cols_to_norm = {
-        'Rev_Growth_YoY': 'Norm_Growth',
-        'Profit_Margin': 'Norm_Margin',
-        'Google_Trends': 'Norm_Google',     
-        'WIBOR': 'Norm_WIBOR',              
-        'Energy_Price': 'Norm_Energy',      
-        'Bankruptcy_Rate': 'Norm_Bankrupt', 
-        'Liquidity_Calc': 'Norm_Liquidity', 
-        'Employment_Growth': 'Norm_Employ'  
-    }
-    
-    for col, norm_name in cols_to_norm.items():
+    for col, norm_name in NORM_COLUMNS.items():
         if col in df.columns:
-            if df[col].std() == 0:
-                 df[norm_name] = 50
-            else:
-                df[norm_name] = scaler.fit_transform(df[[col]])
+            normalize(df, col, norm_name, bounds, fit_rows, constant=50)
         else:
             df[norm_name] = 50
 
@@ -170,78 +395,159 @@ def calculate_index(df):
         (df['Norm_WIBOR'] * df['Risk_WIBOR_Weight']) + 
         (df['Norm_Energy'] * df['Risk_Energy_Weight'])
     )
-    df['Norm_Total_Risk'] = scaler.fit_transform(df[['Total_Risk_Raw']])
+    normalize(df, 'Total_Risk_Raw', 'Norm_Total_Risk', bounds, fit_rows)
 
     # --- 5. SCORE ---
-    df['PKO_SCORE'] = (
-        (0.15 * df['Norm_Margin']) + 
-        (0.15 * df['Norm_Growth']) +
-        (0.10 * df['Norm_Liquidity']) +
-        (0.20 * df['Norm_Google']) +
-        (0.10 * df['Norm_Employ']) +
-        (0.15 * (100 - df['Norm_Total_Risk'])) +  
-        (0.15 * (100 - df['Norm_Bankrupt']))      
-    )
+    df['PKO_SCORE'] = sum(weight * feature for weight, feature in zip(SCORE_WEIGHTS.values(), score_features(df)))
     
-    df['PKO_SCORE_FINAL'] = scaler.fit_transform(df[['PKO_SCORE']])
+    normalize(df, 'PKO_SCORE', 'PKO_SCORE_FINAL', bounds, fit_rows)
 
-    
-    # --- 6. RANKING ENGINE ---
+    # --- 5b. ATRYBUCJA ---
+    attribute(df, bounds)
+    return df
+
+
+def rank_rows(df, bounds, fit_rows):
+    """Wskaźniki rankingowe (krok 6) - potrzebują PKO_SCORE_FINAL z ostatnich 12 miesięcy branży."""
     print("Obliczanie wskaźników rankingowych...")
+    fit_rows = fit_rows.reindex(df.index)
 
     # a. Liderzy Wzrostu
     df['Rank_Growth'] = df['Norm_Growth']
 
     # b. Symptomy Pogorszenia (Momentum 3M - spadek score'u)
-    score_change = df.groupby('PKD_Code')['PKO_SCORE_FINAL'].diff(periods=3).fillna(0)
+    score_change = df.groupby('PKD_Code', observed=True)['PKO_SCORE_FINAL'].diff(periods=3).fillna(0)
     df['Rank_Slowdown'] = score_change * -1 
 
     # c. Potrzeby Pożyczkowe (Wzrost + Niska Płynność)
     df['Rank_Loan_Needs'] = (df['Norm_Growth'] * 0.7) + ((100 - df['Norm_Liquidity']) * 0.3)
 
     # d. Zmiana Trendu (Sygnał MACD-like)
-    trend_short = df.groupby('PKD_Code')['PKO_SCORE_FINAL'].transform(lambda x: x.rolling(3).mean())
-    trend_long = df.groupby('PKD_Code')['PKO_SCORE_FINAL'].transform(lambda x: x.rolling(12).mean())
+    trend_short = df.groupby('PKD_Code', observed=True)['PKO_SCORE_FINAL'].transform(lambda x: x.rolling(3).mean())
+    trend_long = df.groupby('PKD_Code', observed=True)['PKO_SCORE_FINAL'].transform(lambda x: x.rolling(12).mean())
     df['Rank_Trend_Signal'] = (trend_short - trend_long).fillna(0)
 
     # Normalizacja rankingów
-    for col in ['Rank_Slowdown', 'Rank_Loan_Needs', 'Rank_Trend_Signal']:
-        if df[col].std() != 0:
-            df[col] = scaler.fit_transform(df[[col]])
-        else:
-            df[col] = 50
+    for col in RANK_COLUMNS:
+        normalize(df, col, col, bounds, fit_rows, constant=50)
+
+    # e. Atrybucja zmian m/m w punktach PKO_SCORE_FINAL (stała przeskalowania się znosi, zostaje mnożnik)
+    contrib_cols = [c for c in CONTRIB_COLUMNS if c != 'Contrib_Risk_Base']
+    deltas = df.groupby('PKD_Code', observed=True)[contrib_cols].diff().fillna(0) * minmax_scale(*bounds['PKO_SCORE'])
+    df[DELTA_COLUMNS] = deltas.to_numpy()
 
     return df
 
-def main():
-    if USE_MOCK_DATA:
-        master_df = generate_full_mock_data()
-    else:
-        master_df = load_real_data()
-        if master_df is None:
-            master_df = generate_full_mock_data()
 
-    master_df = calculate_index(master_df)
-    
-    os.makedirs(os.path.dirname(PATH_OUTPUT), exist_ok=True)
-    
-    # Wybieramy kluczowe kolumny + RANKINGI
-    cols_to_save = [
-        'Date', 'PKD_Code', 
-        'PKO_SCORE_FINAL', 'PKO_SCORE',
-        'Revenue', 'Profit', 'Liquidity_Calc', 'Employment', 'Bankruptcy_Rate',
-        'Google_Trends', 'WIBOR', 'Energy_Price',
-        'Norm_Growth', 'Norm_Margin', 'Norm_Liquidity', 'Norm_Employ',
-        'Norm_Google', 'Norm_Total_Risk', 'Norm_Bankrupt',
-        'Rank_Growth', 'Rank_Slowdown', 'Rank_Loan_Needs', 'Rank_Trend_Signal'
-    ]
-    
-    cols_to_save = [c for c in cols_to_save if c in master_df.columns]
-    
+def calculate_index(df, bounds=None):
+    """Pełne przeliczenie indeksu na całej historii. bounds (dict) zostaje uzupełniony o granice normalizacji."""
+    print(" Przeliczanie Algorytmu PKO FutureIndex V8.0 (z Rankingami)...")
+    bounds = {} if bounds is None else bounds
+    all_rows = pd.Series(True, index=df.index)
+    df = score_rows(df, bounds, all_rows)
+    return rank_rows(df, bounds, all_rows)
+
+
+def save_index_state(df, bounds, path=PATH_INDEX_STATE):
+    """Stan trybu przyrostowego: granice normalizacji + ostatnie TAIL_MONTHS wierszy każdej branży."""
+    tail = df.sort_values(['PKD_Code', 'Date']).groupby('PKD_Code', observed=True).tail(TAIL_MONTHS)
+    tail = tail[[c for c in TAIL_COLUMNS + CONTRIB_COLUMNS if c in tail.columns]].assign(Date=tail['Date'].dt.strftime('%Y-%m-%d'))
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump({'bounds': bounds, 'tail': tail.to_dict(orient='records')}, f)
+
+
+def load_index_state(path=PATH_INDEX_STATE):
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        state = json.load(f)
+    tail = pd.DataFrame(state['tail'])
+    tail['Date'] = pd.to_datetime(tail['Date'])
+    return {k: tuple(v) for k, v in state['bounds'].items()}, tail
+
+
+def update_index(master_df, bounds, tail):
+    """
+    Tryb przyrostowy: liczy indeks tylko dla miesięcy nowszych niż zapisany ogon każdej branży.
+    Zwraca (nowe wiersze, granice) albo (None, powód), gdy potrzebne jest pełne przeliczenie.
+    """
+    if any(c not in tail.columns for c in TAIL_COLUMNS + CONTRIB_COLUMNS):
+        return None, "stan bez wymaganych kolumn ogona"
+
+    last_date = tail.groupby('PKD_Code', observed=True)['Date'].max()
+    if not set(master_df['PKD_Code']) <= set(last_date.index):
+        return None, "nowe branże"
+
+    new = master_df[master_df['Date'] > master_df['PKD_Code'].map(last_date)]
+    if new.empty:
+        return new, bounds
+
+    window = pd.concat([tail, new], ignore_index=True)
+    fit_rows = pd.Series(np.arange(len(window)) >= len(tail), index=window.index)
+    restored = ['PKO_SCORE_FINAL'] + CONTRIB_COLUMNS
+    tail_values = window[restored]
+    updated = dict(bounds)
+
+    # Ogon daje historię dla pct_change(12), diff(3), rolling(12) i delt m/m; jego własne wyniki nie są przeliczane
+    window = score_rows(window, updated, fit_rows)
+    window[restored] = window[restored].where(fit_rows, tail_values)
+    window = rank_rows(window, updated, fit_rows)
+
+    shifted = [col for col in updated if updated[col] != bounds.get(col)]
+    if shifted:
+        return None, f"przesunięte granice normalizacji: {', '.join(shifted)}"
+    return window[fit_rows.reindex(window.index)], bounds
+
+
+def save_master(master_df, bounds):
+    """Pełny zapis MASTER_DATA + stan trybu przyrostowego."""
+    cols_to_save = [c for c in COLS_TO_SAVE if c in master_df.columns]
     master_df[cols_to_save].to_csv(PATH_OUTPUT, index=False)
-    
+    columnar.write_columnar(master_df[cols_to_save], PATH_OUTPUT)
+    save_index_state(master_df, bounds)
     print(f"✅ SUKCES! Plik CSV zapisany: {PATH_OUTPUT}")
+
+
+def main(incremental=INCREMENTAL):
+    with memory_budget.stage('ETL'):
+        if USE_MOCK_DATA:
+            master_df = generate_full_mock_data()
+        else:
+            master_df = load_real_data()
+            if master_df is None:
+                master_df = generate_full_mock_data()
+
+    os.makedirs(os.path.dirname(PATH_OUTPUT), exist_ok=True)
+
+    state = load_index_state() if incremental and not USE_MOCK_DATA and os.path.exists(PATH_OUTPUT) else None
+    if state is not None:
+        bounds, tail = state
+        with memory_budget.stage('indeks przyrostowy'):
+            new_rows, result = update_index(master_df, bounds, tail)
+        if new_rows is not None:
+            if new_rows.empty:
+                print("✅ MASTER_DATA aktualny - brak nowych miesięcy.")
+                return
+            # Dopisujemy tylko nowe wiersze w kolejności kolumn istniejącego pliku
+            header = pd.read_csv(PATH_OUTPUT, nrows=0).columns
+            new_rows[header].to_csv(PATH_OUTPUT, mode='a', header=False, index=False)
+            columnar.append_columnar(new_rows[header], PATH_OUTPUT)
+            save_index_state(pd.concat([tail, new_rows], ignore_index=True), bounds)
+            print(f"✅ Dopisano {len(new_rows)} wierszy ({new_rows['Date'].min():%Y-%m} - {new_rows['Date'].max():%Y-%m}) do {PATH_OUTPUT}")
+            return
+        print(f"🔁 Pełne przeliczenie indeksu: {result}")
+
+    bounds = {}
+    with memory_budget.stage('indeks'):
+        master_df = calculate_index(master_df, bounds)
+    with memory_budget.stage('zapis'):
+        save_master(master_df, bounds)
     print(master_df[['Date', 'PKD_Code', 'PKO_SCORE_FINAL']].tail())
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    memory_budget.configure()
+    if '--bench' in sys.argv:
+        benchmark_upsampling()
+        columnar.report(PATH_OUTPUT)
+    else:
+        main()
\ No newline at end of file
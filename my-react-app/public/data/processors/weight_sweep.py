@@ -0,0 +1,207 @@
+import pandas as pd
+import numpy as np
+import os
+import time
+import data_architect as da
+import columnar
+
+# Analiza what-if wag PKO_SCORE: setki schematów wag (i wrażliwości branż na WIBOR/energię) liczone naraz.
+# Blok znormalizowanych cech (wiersze x cechy) mnożony raz przez macierz wag (cechy x schematy),
+# potem wektorowo po schematach: przeskalowanie 0-100, Rank_Slowdown i Rank_Trend_Signal.
+# Wynik: stabilność pozycji każdej branży w rankingach (ostatni miesiąc) między schematami.
+
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PATH_SCHEMES = os.path.join(SCRIPT_DIR, 'weight_schemes.yaml')
+PATH_SWEEP = os.path.join(os.path.dirname(SCRIPT_DIR), 'processed', 'weight_sweep.csv')
+
+# Rankingi zależne od wag (Rank_Growth i Rank_Loan_Needs od wag nie zależą)
+RANK_METRICS = ['PKO_SCORE_FINAL', 'Rank_Slowdown', 'Rank_Trend_Signal']
+TOP_N = 3
+
+# Domyślna wrażliwość branży spoza RISK_SENSITIVITY (jak get_risk w data_architect)
+DEFAULT_RISK = {'wibor': 0.5, 'energy': 0.5}
+
+
+def load_schemes(path=PATH_SCHEMES):
+    """
+    Schematy z YAML -> [(nazwa, wagi cech, wrażliwości {pkd: {wibor, energy}})].
+    Pierwszy zawsze 'baseline' (wagi z data_architect); brak pola = wartości bazowe.
+    """
+    import yaml
+
+    with open(path, encoding='utf-8') as f:
+        config = yaml.safe_load(f) or {}
+
+    schemes = [('baseline', dict(da.SCORE_WEIGHTS), {})]
+    for entry in config.get('schemes', []):
+        if entry['name'] == 'baseline':
+            continue
+        unknown = set(entry.get('weights', {})) - set(da.SCORE_WEIGHTS)
+        if unknown:
+            raise ValueError(f"Nieznane cechy w schemacie {entry['name']}: {sorted(unknown)}")
+        weights = dict(da.SCORE_WEIGHTS, **entry.get('weights', {}))
+        risk = {str(pkd): dict(kinds) for pkd, kinds in entry.get('risk', {}).items()}
+        schemes.append((entry['name'], weights, risk))
+
+    # Losowe schematy wokół wag bazowych: Dirichlet(concentration * wagi bazowe) - suma wag = 1
+    random_cfg = config.get('random')
+    if random_cfg:
+        base = np.array(list(da.SCORE_WEIGHTS.values()))
+        rng = np.random.default_rng(random_cfg.get('seed', 42))
+        draws = rng.dirichlet(random_cfg.get('concentration', 40) * base, size=random_cfg.get('count', 100))
+        for i, row in enumerate(draws):
+            schemes.append((f"random_{i:03d}", dict(zip(da.SCORE_WEIGHTS, row)), {}))
+    return schemes
+
+
+def risk_tables(schemes, codes):
+    """Wrażliwości (schematy x branże) dla WIBOR i energii: bazowa tabela nadpisana przez schemat."""
+    shape = (len(schemes), len(codes))
+    wibor, energy = np.empty(shape), np.empty(shape)
+    for k, (_, _, overrides) in enumerate(schemes):
+        for c, pkd in enumerate(codes):
+            risk = {**DEFAULT_RISK, **da.RISK_SENSITIVITY.get(pkd, {}), **overrides.get(pkd, {})}
+            wibor[k, c], energy[k, c] = risk['wibor'], risk['energy']
+    return wibor, energy
+
+
+def load_features(path=da.PATH_OUTPUT):
+    """MASTER_DATA -> (ramka posortowana po branży i dacie, Norm_WIBOR, Norm_Energy) - jak w calculate_index."""
+    df = columnar.read_table(path)
+    df['PKD_Code'] = df['PKD_Code'].astype(str)
+    df = df.astype({c: 'float64' for c in df.select_dtypes(include='float32').columns})
+    df = df.sort_values(['PKD_Code', 'Date']).reset_index(drop=True)
+
+    all_rows = pd.Series(True, index=df.index)
+    for col, norm_name in [('WIBOR', 'Norm_WIBOR'), ('Energy_Price', 'Norm_Energy')]:
+        if col in df.columns:
+            da.normalize(df, col, norm_name, {}, all_rows, constant=50)
+        else:
+            df[norm_name] = 0
+    return df
+
+
+def minmax_columns(values, constant=None):
+    """Min-max 0-100 każdej kolumny (schematu) osobno; constant -> wartość dla kolumny stałej."""
+    low, high = np.nanmin(values, axis=0), np.nanmax(values, axis=0)
+    scaled = da.minmax(values, low, high)
+    if constant is not None:
+        scaled = np.where(low == high, constant, scaled)
+    return scaled
+
+
+def grouped_rolling_mean(values, pos, window):
+    """Średnia krocząca (pełne okno, jak rolling(window)) wzdłuż wierszy, w obrębie branży (pos = nr wiersza w branży)."""
+    csum = np.vstack([np.zeros((1, values.shape[1])), np.cumsum(values, axis=0)])
+    rows = np.arange(len(values))
+    start = np.maximum(rows + 1 - window, 0)
+    mean = (csum[rows + 1] - csum[start]) / window
+    return np.where((pos >= window - 1)[:, None], mean, np.nan)
+
+
+def sweep(df, schemes):
+    """Wszystkie schematy naraz -> {metryka: (wiersze x schematy)}."""
+    codes, code_idx = np.unique(df['PKD_Code'].to_numpy(), return_inverse=True)
+    features = [f for f in da.SCORE_WEIGHTS if f != 'Norm_Total_Risk']
+    weights = np.array([[w[f] for f in features] for _, w, _ in schemes])  # (K, F)
+    risk_weight = np.array([w['Norm_Total_Risk'] for _, w, _ in schemes])
+
+    # Ryzyko złożone zależy od wrażliwości branż -> osobna normalizacja dla każdego schematu
+    wibor, energy = risk_tables(schemes, codes)
+    total_risk_raw = df['Norm_WIBOR'].to_numpy()[:, None] * wibor[:, code_idx].T + df['Norm_Energy'].to_numpy()[:, None] * energy[:, code_idx].T
+    norm_total_risk = minmax_columns(total_risk_raw)
+
+    # Jedno mnożenie: (wiersze x cechy) @ (cechy x schematy)
+    block = np.column_stack(da.score_features(df, features))
+    score = block @ weights.T + risk_weight[None, :] * (100 - norm_total_risk)
+    final = minmax_columns(score)
+
+    # Pozycja wiersza w branży (dane posortowane po PKD_Code, Date)
+    first_row = np.searchsorted(code_idx, code_idx)
+    pos = np.arange(len(df)) - first_row
+
+    shifted = np.vstack([np.full((3, final.shape[1]), np.nan), final[:-3]])
+    score_change = np.where((pos >= 3)[:, None], final - shifted, 0.0)
+    trend = grouped_rolling_mean(final, pos, 3) - grouped_rolling_mean(final, pos, 12)
+
+    return {
+        'PKO_SCORE_FINAL': final,
+        'Rank_Slowdown': minmax_columns(-score_change, constant=50),
+        'Rank_Trend_Signal': minmax_columns(np.nan_to_num(trend, nan=0.0), constant=50),
+    }
+
+
+def rank_positions(values):
+    """Pozycje w rankingu (1 = najwyższa wartość) w każdej kolumnie (branże x schematy)."""
+    order = np.argsort(-values, axis=0, kind='stable')
+    positions = np.empty_like(order)
+    np.put_along_axis(positions, order, np.arange(1, len(values) + 1)[:, None], axis=0)
+    return positions
+
+
+def stability(df, results, schemes, top_n=TOP_N):
+    """Statystyki pozycji branż (ostatni miesiąc każdej branży) między schematami + Spearman vs baseline."""
+    last_rows = df.groupby('PKD_Code', sort=True).tail(1).index.to_numpy()
+    codes = df.loc[last_rows, 'PKD_Code'].to_numpy()
+    n = len(codes)
+
+    frames, spearman = [], {}
+    for metric, values in results.items():
+        ranks = rank_positions(values[last_rows])
+        d = ranks - ranks[:, [0]]
+        spearman[metric] = 1 - 6 * (d ** 2).sum(axis=0) / (n * (n ** 2 - 1)) if n > 1 else np.ones(len(schemes))
+        frames.append(pd.DataFrame({
+            'PKD_Code': codes,
+            'Metric': metric,
+            'Base_Rank': ranks[:, 0],
+            'Mean_Rank': ranks.mean(axis=1).round(2),
+            'Std_Rank': ranks.std(axis=1).round(2),
+            'Min_Rank': ranks.min(axis=1),
+            'Max_Rank': ranks.max(axis=1),
+            f'Top{top_n}_Share': ((ranks <= top_n).mean(axis=1) * 100).round(1),
+        }))
+    summary = pd.DataFrame({'Scheme': [name for name, _, _ in schemes], **{f'Spearman_{m}': s for m, s in spearman.items()}})
+    return pd.concat(frames, ignore_index=True), summary
+
+
+def run_sweep(schemes_file=PATH_SCHEMES, output_file=PATH_SWEEP):
+    print(f"⚖️ Analiza wag PKO_SCORE (schematy: {schemes_file})...")
+
+    if not os.path.exists(da.PATH_OUTPUT):
+        print(f"❌ Brak pliku {da.PATH_OUTPUT} - uruchom najpierw data_architect.py")
+        return None
+
+    schemes = load_schemes(schemes_file)
+    df = load_features()
+
+    start = time.perf_counter()
+    results = sweep(df, schemes)
+    table, summary = stability(df, results, schemes)
+    elapsed = time.perf_counter() - start
+
+    # Dla porównania: przeliczenie score'u jednego schematu tak jak w calculate_index (bez rankingów)
+    start = time.perf_counter()
+    da.score_rows(df.copy(), {}, pd.Series(True, index=df.index))
+    rerun = time.perf_counter() - start
+
+    base = results['PKO_SCORE_FINAL'][:, 0]
+    print(f"   -> {len(schemes)} schematów x {len(df)} wierszy: {elapsed:.3f}s "
+          f"(przeliczanie calculate_index per schemat: >{rerun * len(schemes):.1f}s)")
+    print(f"   -> Kontrola baseline: max |PKO_SCORE_FINAL - MASTER_DATA| = {np.abs(base - df['PKO_SCORE_FINAL']).max():.1e}")
+
+    table.to_csv(output_file, index=False)
+
+    score = table[table['Metric'] == 'PKO_SCORE_FINAL'].sort_values('Base_Rank')
+    print(f"\n{'PKD':<5} | {'BAZA':<5} | {'ŚREDNIO':<8} | {'MIN-MAX':<8} | TOP{TOP_N} %")
+    for row in score.itertuples():
+        print(f"{row.PKD_Code:<5} | {row.Base_Rank:<5} | {row.Mean_Rank:<8.2f} | {f'{row.Min_Rank}-{row.Max_Rank}':<8} | {getattr(row, f'Top{TOP_N}_Share'):.1f}")
+
+    print("\nNajbardziej odmienne schematy (Spearman rankingu PKO_SCORE_FINAL vs baseline):")
+    print(summary.sort_values('Spearman_PKO_SCORE_FINAL').head(5).round(3).to_string(index=False))
+
+    print(f"\n✅ Zapisano: {output_file} ({len(table)} wierszy)")
+    return table
+
+
+if __name__ == "__main__":
+    run_sweep()
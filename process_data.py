@@ -2,8 +2,13 @@
 import pandas as pd
 import json
 import os
+import sys
 import numpy as np
 
+# Lista branż z konfiguracji (models/industries.yaml)
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), 'models'))
+import industries
+
 # File paths
 CONNECTIONS_PATH = r'my-react-app\public\data\processed\connections.csv'
 HARD_DATA_PATH = r'my-react-app\public\data\processed\hard_data_extnd.csv'
@@ -104,8 +109,6 @@ def process_data():
     connections['target'] = connections['target'].astype(str)
     
     # 3. Build Graph Structure
-    KEY_SECTORS = ['01', '10', '16', '23', '24', '29', '31', '35', '41', '68', '46', '47', '49', '55', '62']
-    
     PKD_NAMES = {
         '01': 'Rolnictwo (01)',
         '10': 'Spożywczy (10)',
@@ -127,7 +130,7 @@ def process_data():
     nodes = []
     # Only use keys present in our whitelist
     all_pkd = set(connections['source']).union(set(connections['target']))
-    filtered_pkd = [pkd for pkd in all_pkd if str(pkd) in KEY_SECTORS]
+    filtered_pkd = [pkd for pkd in all_pkd if industries.is_key(str(pkd))]
     
     # Ensure PKD_Code in hard_data is string
     current_data['PKD_Code'] = current_data['PKD_Code'].astype(str)
@@ -1,81 +1,132 @@
 import pandas as pd
 import numpy as np
 import os
-from sklearn.metrics import mean_absolute_error
+import sys
+import heapq
+import itertools
 
-def run_future_validation():
+# 1. ŚCIEŻKI
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
+
+# Wygładzanie z magazynu cech modeli - to samo okno i ta sama procedura co przy treningu
+sys.path.insert(0, os.path.join(PROJECT_ROOT, 'models'))
+import feature_store
+import columnar
+
+# Plik z prognozami (to co wygenerował forecaster.py)
+PRED_FILE = os.path.join(PROJECT_ROOT, 'data', 'processed', 'predictions.csv')
+
+# Plik z danymi "rzeczywistymi" (Twój plik weryfikacyjny)
+REAL_FILE = os.path.join(PROJECT_ROOT, 'data', 'processed', 'REAL_DATA_2025.csv')
+
+# Prognozy czytane strumieniowo - w pamięci jest tylko jeden kawałek + statystyki per grupa
+CHUNK_SIZE = 100_000
+TOP_K = 180
+
+# Kolumny grupujące statystyki, jeśli występują w pliku prognoz (np. predictions_scenarios.csv)
+GROUP_COLUMNS = ['Scenario', 'Engine', 'PKD_Code']
+
+
+def normalize_pkd(codes):
+    """PKD jako tekst; kody zapisane liczbowo ('1') dopełniamy do działu ('01')."""
+    return codes.astype(str).str.strip().str.zfill(2)
+
+
+def load_actuals(real_file):
+    """Dane rzeczywiste -> wygładzony trend 6M jako Series z indeksem (PKD_Code, Date) do łączenia kawałków."""
+    df_real = pd.read_csv(real_file, usecols=['Date', 'PKD_Code', 'PKO_SCORE_FINAL'], dtype={'PKD_Code': str})
+    df_real['Date'] = pd.to_datetime(df_real['Date'])
+    df_real['PKD_Code'] = normalize_pkd(df_real['PKD_Code'])
+
+    # Tworzymy 'Target_Trend' - to jest to, co model próbował trafić
+    df_real = feature_store.smooth(df_real, ['PKO_SCORE_FINAL'], fill=False)
+    index = pd.MultiIndex.from_frame(df_real[['PKD_Code', 'Date']])
+    return pd.Series(df_real['PKO_SCORE_FINAL'].values, index=index, name='Target_Trend')
+
+
+def prediction_chunks(pred_file, chunk_size):
+    """
+    Kawałki prognoz w jednym formacie: Date, PKD_Code, Predicted_Score (+ kolumny grupujące, jeśli są).
+    Z .feather (batche z memory mappingu) albo z CSV po chunk_size wierszy.
+    """
+    wanted = ['Date', 'Predicted_Score', 'Predicted', 'Target'] + GROUP_COLUMNS
+    for chunk in columnar.iter_batches(pred_file, wanted, chunk_size):
+        if 'Predicted' in chunk.columns and 'Target' in chunk.columns:
+            chunk = chunk[chunk['Target'] == 'PKO_SCORE_FINAL'].drop(columns='Target')
+            chunk = chunk.rename(columns={'Predicted': 'Predicted_Score'})
+        chunk = chunk.assign(PKD_Code=normalize_pkd(chunk['PKD_Code']))
+        yield chunk, [c for c in GROUP_COLUMNS if c in chunk.columns]
+
+
+def run_future_validation(pred_file=PRED_FILE, real_file=REAL_FILE, chunk_size=CHUNK_SIZE, top_k=TOP_K):
     print("🚀 Uruchamiam Walidację Przyszłości (Porównanie Trendów)...")
     print("🎯 Metodologia: Porównujemy prognozę modelu z WYGŁADZONYMI danymi rzeczywistymi (6M).")
 
-    # 1. ŚCIEŻKI
-    SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
-    PROJECT_ROOT = os.path.dirname(os.path.dirname(SCRIPT_DIR))
-    
-    # Plik z prognozami (to co wygenerował forecaster.py)
-    PRED_FILE = os.path.join(PROJECT_ROOT, 'data', 'processed', 'predictions.csv')
-    
-    # Plik z danymi "rzeczywistymi" (Twój plik weryfikacyjny)
-    REAL_FILE = os.path.join(PROJECT_ROOT, 'data', 'processed', 'REAL_DATA_2025.csv')
-
     # 2. WCZYTANIE
-    if not os.path.exists(PRED_FILE):
-        print(f"❌ Brak pliku z prognozami: {PRED_FILE}")
+    if not os.path.exists(pred_file):
+        print(f"❌ Brak pliku z prognozami: {pred_file}")
         print("👉 Uruchom najpierw 'python src/models/forecaster.py'")
         return
-        
-    if not os.path.exists(REAL_FILE):
-        print(f"❌ Brak pliku z danymi rzeczywistymi: {REAL_FILE}")
-        return
 
-    print("📂 Wczytuję pliki...")
-    df_pred = pd.read_csv(PRED_FILE)
-    df_real = pd.read_csv(REAL_FILE)
-
-    # Konwersja dat
-    df_pred['Date'] = pd.to_datetime(df_pred['Date'])
-    df_real['Date'] = pd.to_datetime(df_real['Date'])
+    if not os.path.exists(real_file):
+        print(f"❌ Brak pliku z danymi rzeczywistymi: {real_file}")
+        return
 
-    # --- KLUCZOWA POPRAWKA: NORMALIZACJA DANYCH REALNYCH ---
     # Skoro model przewiduje trend długoterminowy (średnia 6-miesięczna),
     # to musimy sprowadzić dane rzeczywiste do tej samej postaci,
     # aby porównywać jabłka z jabłkami.
     print("🌊 Wygładzam dane rzeczywiste (Rolling 6M) w celu porównania trendów...")
-    
-    df_real = df_real.sort_values(['PKD_Code', 'Date'])
-    
-    # Tworzymy kolumnę 'Target_Trend' - to jest to, co model próbował trafić
-    df_real['Target_Trend'] = df_real.groupby('PKD_Code')['PKO_SCORE_FINAL'].transform(
-        lambda x: x.rolling(window=6, min_periods=1).mean()
-    )
-
-    # 3. ŁĄCZENIE (MERGE)
-    merged = pd.merge(
-        df_real, 
-        df_pred, 
-        left_on=['Date', 'PKD_Code'], 
-        right_on=['Date', 'PKD_Code'],
-        how='inner'
-    )
-
-    if len(merged) == 0:
+    actuals = load_actuals(real_file)
+
+    # 3. ŁĄCZENIE KAWAŁKAMI + STATYSTYKI ONLINE
+    print(f"📂 Czytam prognozy kawałkami po {chunk_size} wierszy...")
+    stats = None
+    worst = []  # kopiec min o rozmiarze <= top_k: (błąd, licznik, rekord)
+    counter = itertools.count()
+    n_chunks = 0
+
+    for chunk, group_cols in prediction_chunks(pred_file, chunk_size):
+        n_chunks += 1
+        keys = pd.MultiIndex.from_frame(chunk[['PKD_Code', 'Date']])
+        chunk['Target_Trend'] = actuals.reindex(keys).values
+        chunk = chunk.dropna(subset=['Target_Trend', 'Predicted_Score']).copy()
+        if chunk.empty:
+            continue
+
+        chunk['Diff'] = chunk['Predicted_Score'] - chunk['Target_Trend']
+        chunk['Error'] = chunk['Diff'].abs()
+        chunk['Error_Sq'] = chunk['Diff'] ** 2
+        chunk['N'] = 1
+        part = chunk.groupby(group_cols)[['N', 'Error', 'Error_Sq', 'Diff']].sum()
+        stats = part if stats is None else stats.add(part, fill_value=0)
+
+        # Do kopca trafiają tylko kandydaci z top_k kawałka
+        candidates = chunk.nlargest(top_k, 'Error')
+        for record in candidates[group_cols + ['Date', 'Target_Trend', 'Predicted_Score', 'Error']].itertuples(index=False):
+            item = (record.Error, next(counter), record)
+            if len(worst) < top_k:
+                heapq.heappush(worst, item)
+            elif item[0] > worst[0][0]:
+                heapq.heapreplace(worst, item)
+
+    if stats is None:
         print("⚠️ Brak wspólnych dat/branż do porównania!")
         return
 
-    print(f"🔗 Znaleziono {len(merged)} punktów danych do porównania.")
+    total = stats.sum()
+    print(f"🔗 Znaleziono {int(total['N'])} punktów danych do porównania ({n_chunks} kawałków).")
 
     # 4. OBLICZANIE BŁĘDU
     # Porównujemy Trend Rzeczywisty (Target_Trend) z Predykcją (Predicted_Score)
-    y_true = merged['Target_Trend']
-    y_pred = merged['Predicted_Score']
-
-    mae = mean_absolute_error(y_true, y_pred)
+    mae = total['Error'] / total['N']
 
     # 5. RAPORT
     print("\n" + "="*60)
     print(f"📊 WYNIK WALIDACJI (Real Data vs Model Trend)")
     print("="*60)
     print(f"Średni Błąd Trendu (MAE): {mae:.2f} punktów")
-    
+
     # Ocena dla Jury
     if mae <= 2.0:
         print("🏆 OCENA: PERFEKCYJNA (Model idealnie przewidział przyszłość)")
@@ -87,13 +138,21 @@ def run_future_validation():
         print("🔴 OCENA: ROZBIEŻNOŚĆ (Wymaga analizy)")
 
     print("-" * 60)
-    print("Szczegóły błędów (Top 5 odchyleń):")
-    merged['Error'] = (merged['Target_Trend'] - merged['Predicted_Score']).abs()
-    
-    # Wyświetlamy co poszło nie tak (jeśli coś poszło)
-    top_errors = merged[['Date', 'PKD_Code', 'Target_Trend', 'Predicted_Score', 'Error']].sort_values('Error', ascending=False).head(180)
+    print(f"Błędy per {' / '.join(stats.index.names)}:")
+    summary = pd.DataFrame({
+        'N': stats['N'].astype(int),
+        'MAE': stats['Error'] / stats['N'],
+        'RMSE': np.sqrt(stats['Error_Sq'] / stats['N']),
+        'Bias': stats['Diff'] / stats['N'],
+    })
     pd.set_option('display.max_rows', None) # Odblokuj wyświetlanie wszystkich wierszy
+    print(summary.sort_values('MAE', ascending=False).round(2))
+
+    print("-" * 60)
+    print(f"Szczegóły błędów (Top {top_k} odchyleń):")
+    top_errors = pd.DataFrame([item[2] for item in sorted(worst, reverse=True)])
     print(top_errors)
+    return summary
 
 if __name__ == "__main__":
-    run_future_validation()
\ No newline at end of file
+    run_future_validation()